@@ -0,0 +1,7 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Benchmarks for the switcher, run against fake devices so they work offline.
+
+Run one with e.g. `python -m benchmarks.monitor_wakeups`, or the whole regression suite against the
+stored baseline with `python -m benchmarks.suite`.
+"""
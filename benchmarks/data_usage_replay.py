@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Compares LTE data used against flaps, for fixed switch-back delays and the data-aware policy.
+
+The synthetic trace alternates calm stretches, with an outage every half hour or so, and stormy
+ones (e.g. a tree in the way as the satellites pass) with an outage every minute or two. The
+traffic alternates between idle and streaming. A good policy switches back quickly while it's calm
+or the traffic is heavy, and holds off while it's stormy.
+
+    python -m benchmarks.data_usage_replay --hours 24
+"""
+
+import argparse
+import random
+from bisect import bisect_right
+from typing import Callable, List, Tuple
+
+from benchmarks.policy_replay import score, trace_samples
+from internet_switcher.data_usage import CellularUsage
+from internet_switcher.policies import ConnectedPolicy, DataAwarePolicy
+from internet_switcher.trace import RecordedStatus
+
+FIXED_DELAYS = (5, 15, 30, 60, 120)
+
+
+def clustered_trace(duration: float, interval: float = 0.5, seed: int = 0) -> List[Tuple[float, RecordedStatus]]:
+    rng = random.Random(seed)
+    samples = []
+    now = 0.0
+    while now < duration:
+        stormy = rng.random() < 0.3
+        phase_end = now + rng.expovariate(1 / (600 if stormy else 1800))
+        while now < phase_end:
+            for _ in range(int(rng.expovariate(1 / (60 if stormy else 1800)) / interval)):
+                samples.append((now, RecordedStatus(ping_drop_rate=rng.uniform(0, 0.02), ping_latency=rng.gauss(40, 4))))
+                now += interval
+            for _ in range(int(rng.uniform(2, 20) / interval)):
+                samples.append((now, RecordedStatus(connected=False, ping_drop_rate=1.0, ping_latency=0.0)))
+                now += interval
+    return samples
+
+
+def bursty_traffic(duration: float, seed: int = 0) -> Callable[[float], float]:
+    """Bytes per second over time: mostly idle (20 kB/s), sometimes streaming (1 MB/s)."""
+    rng = random.Random(seed)
+    starts, rates = [], []
+    now = 0.0
+    while now < duration:
+        busy = rng.random() < 0.3
+        starts.append(now)
+        rates.append(1_000_000 if busy else 20_000)
+        now += rng.expovariate(1 / (900 if busy else 1800))
+
+    def rate(timestamp: float) -> float:
+        return rates[max(0, bisect_right(starts, timestamp) - 1)]
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', type=float, default=24, help="Length of the synthetic trace")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace', help="Replay a recorded .jsonl.gz trace instead of a synthetic one")
+    args = parser.parse_args()
+    duration = args.hours * 3600
+    samples = list(trace_samples(args.trace)) if args.trace else clustered_trace(duration, seed=args.seed)
+    traffic = bursty_traffic(samples[-1][0] if samples else duration, seed=args.seed)
+
+    results = {}
+    for delay in FIXED_DELAYS:
+        results[f"fixed {delay}s"] = score(ConnectedPolicy(delay), samples, traffic=traffic)
+    policy = DataAwarePolicy()
+    usage = CellularUsage()
+    policy.use_usage(usage)
+    results['data_aware'] = score(policy, samples, traffic=traffic, usage=usage)
+
+    for name, result in results.items():
+        print(f"{name}:\tlte_megabytes={result['lte_megabytes']:.1f}\tflaps={result['flaps']}"
+              f"\tswitches={result['switches']}\tlte_seconds={result['lte_seconds']:.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures the cost of building Cradlepoint endpoint paths and dispatching calls on them.
+
+`construct` times `api.config.wan.rules2[rule_id].priority`, the path used on every failover.
+`dispatch` also calls it against a router whose `request` returns immediately, so it measures
+everything on our side of the HTTP request.
+
+    python -m benchmarks.endpoint_paths --iterations 100000
+"""
+
+import argparse
+import asyncio
+import time
+
+from cradlepoint.api import CradlepointRouter
+
+RULE_ID = '00000001-mdm'
+
+
+class NullRouter(CradlepointRouter):
+    """A router that answers every request instantly without any I/O."""
+    def __init__(self):
+        pass
+
+    async def request(self, method: str, path, value=None):
+        return value
+
+
+def time_construct(api: CradlepointRouter, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        api.config.wan.rules2[RULE_ID].priority
+    return (time.perf_counter() - started) / iterations
+
+
+async def time_dispatch(api: CradlepointRouter, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await api.config.wan.rules2[RULE_ID].priority(1.0)
+    return (time.perf_counter() - started) / iterations
+
+
+def run(iterations: int) -> dict:
+    api = NullRouter()
+    return {
+        'construct_us': time_construct(api, iterations) * 1e6,
+        'dispatch_us': asyncio.run(time_dispatch(api, iterations)) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100_000)
+    args = parser.parse_args()
+    for key, value in run(args.iterations).items():
+        print(f"{key}:\t{value:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Stand-ins for the Starlink dish and for Internet services, used so benchmarks don't need real hardware."""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+from internet_switcher.trace import RecordedStatus
+
+
+class FakeDish:
+    """A dish that reports outages on a fixed schedule.
+
+    `outages` is a list of `(start, end)` pairs in seconds, relative to the first call to `connect`.
+    """
+    def __init__(self, outages: List[Tuple[float, float]] = (), response_time: float = 0.005):
+        self.outages = list(outages)
+        self.response_time = response_time
+        self.started_at = None
+        self.calls = 0
+
+    async def connect(self):
+        self.started_at = asyncio.get_running_loop().time()
+
+    async def close(self):
+        pass
+
+    def elapsed(self) -> float:
+        return asyncio.get_running_loop().time() - self.started_at
+
+    async def fetch_status(self) -> RecordedStatus:
+        self.calls += 1
+        await asyncio.sleep(self.response_time)
+        now = self.elapsed()
+        for start, end in self.outages:
+            if start <= now < end:
+                return RecordedStatus(connected=False, ping_drop_rate=1.0)
+        return RecordedStatus()
+
+
+class LoopbackTcpServer:
+    """A TCP server on loopback that accepts and closes connections. `down` refuses connections until `up`."""
+    def __init__(self):
+        self.port = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def up(self):
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def down(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.close()
+
+
+class LoopbackDnsServer(asyncio.DatagramProtocol):
+    """A UDP server on loopback that answers every query with an empty response.
+
+    While `blackholed`, queries are silently dropped, like a path that has stopped forwarding."""
+    def __init__(self):
+        self.port = 0
+        self.blackholed = False
+        self.transport = None
+
+    async def up(self):
+        self.transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: self, local_addr=('127.0.0.1', 0))
+        self.port = self.transport.get_extra_info('sockname')[1]
+
+    def close(self):
+        self.transport.close()
+
+    def datagram_received(self, data: bytes, addr):
+        if not self.blackholed and len(data) >= 12:
+            self.transport.sendto(data[:2] + bytes([data[2] | 0x80]) + data[3:], addr)
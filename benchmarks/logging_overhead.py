@@ -0,0 +1,100 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures the CPU cost of logging in the `StarlinkMonitor` loop, with debug logging off and on.
+
+The monitor polls a fake dish as fast as it can, with a short outage every second so the
+policy and dispatcher log too. Logging goes through the queue to a background thread writing
+JSON lines to /dev/null, so the numbers are what the event loop thread pays.
+
+It also times a single `debug` call like the one in `CradlepointRouter.request`, when debug is
+off, when it's on and queued, and when it's on with a plain handler writing from the caller.
+
+    python -m benchmarks.logging_overhead --duration 5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from benchmarks.fakes import FakeDish
+from internet_switcher.starlink_monitor import StarlinkMonitor
+from internet_switcher.util.logging import JsonFormatter, LoggingMixin, setup_logging
+
+RESPONSE = {'_id_': '00000001-mdm', 'priority': 2.1, 'trigger_name': 'Starlink', 'def_conn_state': 'alwayson'}
+
+
+class Logged(LoggingMixin):
+    pass
+
+
+async def measure(duration: float) -> dict:
+    outages = [(second + 0.5, second + 0.6) for second in range(int(duration) + 1)]
+    dish = FakeDish(outages, response_time=0)
+    await dish.connect()
+    monitor = StarlinkMonitor(dish, min_interval=0, max_interval=0, stable_after=0.2)
+
+    async def nothing():
+        pass
+
+    monitor.on_stable(nothing)
+    monitor.on_unstable(nothing)
+    started_cpu = time.process_time()
+    monitor.start()
+    await monitor.wait(duration)
+    monitor.stop()
+    await asyncio.gather(monitor.task, return_exceptions=True)
+    cpu = time.process_time() - started_cpu
+    return {'probes': dish.calls, 'cpu_us_per_probe': cpu / dish.calls * 1e6}
+
+
+def run(level: str, duration: float) -> dict:
+    with open(os.devnull, 'w') as devnull:
+        listener = setup_logging(level, 'json', stream=devnull)
+        try:
+            return asyncio.run(measure(duration))
+        finally:
+            listener.stop()
+
+
+def time_log_call(iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        Logged.debug("Data: %.100r", RESPONSE)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run_calls(level: str, iterations: int, queued: bool = True) -> float:
+    with open(os.devnull, 'w') as devnull:
+        listener = setup_logging(level, 'json', stream=devnull)
+        try:
+            if not queued:
+                root = logging.getLogger()
+                for handler in list(root.handlers):
+                    root.removeHandler(handler)
+                handler = logging.StreamHandler(devnull)
+                handler.setFormatter(JsonFormatter())
+                root.addHandler(handler)
+            return time_log_call(iterations)
+        finally:
+            listener.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--calls', type=int, default=100_000)
+    args = parser.parse_args()
+    for name, level in (('debug_off', 'INFO'), ('debug_on', 'DEBUG')):
+        results = run(level, args.duration)
+        print(f"{name}:\t" + "\t".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                                      for key, value in results.items()))
+
+    for name, level, queued in (('call_debug_off', 'INFO', True), ('call_debug_queued', 'DEBUG', True),
+                                ('call_debug_sync', 'DEBUG', False)):
+        print(f"{name}:\tus_per_call={run_calls(level, args.calls, queued):.3f}")
+
+
+if __name__ == '__main__':
+    main()
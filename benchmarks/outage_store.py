@@ -0,0 +1,75 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures `OutageStore` write throughput and query latency over a year of history.
+
+The store is filled with `--per-day` outages a day for `--days` days, each lasting up to ten
+minutes on cellular, then each summary query is timed over the last week and the whole year.
+
+    python -m benchmarks.outage_store --days 365 --per-day 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from internet_switcher.outage_store import OutageStore
+
+DAY = 86400
+
+
+async def fill(store: OutageStore, days: int, per_day: int, now: float, seed: int = 0) -> float:
+    rng = random.Random(seed)
+    at = now - days * DAY
+    started = time.perf_counter()
+    for _ in range(days * per_day):
+        at += rng.uniform(0, 2 * DAY / per_day)
+        store.record(False, at, connected=False, obstructed=rng.random() < 0.3, drop_rate=1.0,
+                     latency_ms=rng.uniform(20, 80), ack_seconds=rng.uniform(0.05, 0.5))
+        at += rng.uniform(30, 600)
+        store.record(True, at, connected=True, obstructed=False, drop_rate=0.0, latency_ms=rng.uniform(20, 80),
+                     ack_seconds=rng.uniform(0.05, 0.5))
+        if len(store.pending) >= 1000:
+            await store.flush()
+    await store.flush()
+    return time.perf_counter() - started
+
+
+async def time_query(query, repeat: int = 20) -> float:
+    await query()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await query()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+async def run(days: int, per_day: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OutageStore(os.path.join(tmp, 'history.db'))
+        await store.open()
+        now = time.time()
+        elapsed = await fill(store, days, per_day, now)
+        rows = days * per_day * 2
+        print(f"write:\trows={rows}\trows_per_second={rows / elapsed:.0f}\tbytes={os.path.getsize(store.path)}")
+        for name, since in (('week', now - 7 * DAY), ('year', now - days * DAY)):
+            results = {
+                'outage_count_ms': await time_query(lambda: store.outage_count(since)),
+                'mean_time_to_failover_ms': await time_query(lambda: store.mean_time_to_failover(since)),
+                'cellular_seconds_ms': await time_query(lambda: store.cellular_seconds(since, now)),
+            }
+            print(f"{name}:\t" + "\t".join(f"{key}={value:.3f}" for key, value in results.items()))
+        await store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--per-day', type=int, default=50, help="Outages per day")
+    args = parser.parse_args()
+    asyncio.run(run(args.days, args.per_day))
+
+
+if __name__ == '__main__':
+    main()
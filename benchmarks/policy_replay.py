@@ -0,0 +1,134 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Scores decision policies by replaying dish status traces through them.
+
+For each policy this reports how often it switched to LTE, how many of those switches were false
+(no outage happened before switching back), how many were flaps (within `flap_after` seconds of
+switching back), the seconds of connectivity lost while still on Starlink during an outage, and
+the seconds spent on LTE.
+
+    python -m benchmarks.policy_replay --hours 6
+    python -m benchmarks.policy_replay --trace trace.jsonl.gz
+"""
+
+import argparse
+import random
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from internet_switcher.data_usage import CellularUsage
+from internet_switcher.policies import POLICIES, DecisionPolicy
+from internet_switcher.status_history import StatusHistory
+from internet_switcher.trace import RecordedStatus, read_trace
+
+
+def synthetic_trace(duration: float, interval: float = 0.5, seed: int = 0) -> List[Tuple[float, RecordedStatus]]:
+    """Generate a trace with outages (most preceded by rising drop rate) and harmless blips."""
+    rng = random.Random(seed)
+    samples = []
+    now = 0.0
+    while now < duration:
+        # Quiet period
+        for _ in range(int(rng.expovariate(1 / 120) / interval)):
+            samples.append((now, RecordedStatus(ping_drop_rate=rng.uniform(0, 0.02), ping_latency=rng.gauss(40, 4))))
+            now += interval
+        event = rng.random()
+        if event < 0.3:
+            # A blip that recovers on its own
+            for _ in range(rng.randint(1, 3)):
+                samples.append((now, RecordedStatus(ping_drop_rate=rng.uniform(0.1, 0.3), ping_latency=rng.gauss(60, 10))))
+                now += interval
+            continue
+        if event < 0.8:
+            # Degradation before the outage
+            ramp = rng.randint(2, 12)
+            obstructed = rng.random() < 0.5
+            for i in range(ramp):
+                drop_rate = min(1.0, 0.1 + 0.8 * i / ramp + rng.uniform(0, 0.1))
+                samples.append((now, RecordedStatus(obstructed=obstructed, ping_drop_rate=drop_rate,
+                                                    ping_latency=rng.gauss(80, 20))))
+                now += interval
+        for _ in range(int(rng.uniform(2, 30) / interval)):
+            samples.append((now, RecordedStatus(connected=False, ping_drop_rate=1.0, ping_latency=0.0)))
+            now += interval
+    return samples
+
+
+def trace_samples(path: str) -> Iterator[Tuple[float, RecordedStatus]]:
+    for record in read_trace(path):
+        if record['k'] == 'dish':
+            yield record['t'], RecordedStatus.from_record(record)
+
+
+def score(policy: DecisionPolicy, samples: Iterable[Tuple[float, RecordedStatus]], flap_after: float = 60,
+          traffic: Optional[Callable[[float], float]] = None, usage: Optional[CellularUsage] = None) -> dict:
+    """Replay `samples` through `policy`.
+
+    With `traffic`, a function from time to the bytes per second being transferred, also report the
+    megabytes that went over LTE. With `usage` too, it's fed the LTE byte counter every
+    `usage.interval` seconds, as the switcher would read it from the router.
+    """
+    history = StatusHistory()
+    is_stable = True
+    switches = false_switches = flaps = 0
+    lost = lte = lte_bytes = 0.0
+    saw_outage = False
+    previous = returned_at = usage_at = None
+    for now, status in samples:
+        if previous is not None:
+            elapsed = now - previous
+            if not is_stable:
+                lte += elapsed
+                if traffic is not None:
+                    lte_bytes += traffic(now) * elapsed
+            elif not status.connected:
+                lost += elapsed
+        previous = now
+        if usage is not None and (usage_at is None or now - usage_at >= usage.interval):
+            usage.update(now, int(lte_bytes))
+            usage_at = now
+        history.append_status(now, status)
+        if not is_stable and not status.connected:
+            saw_outage = True
+        stable = policy.decide(status, now, history, is_stable)
+        if stable is False and is_stable:
+            is_stable = False
+            switches += 1
+            flaps += 1 if returned_at is not None and now - returned_at < flap_after else 0
+            saw_outage = not status.connected
+        elif stable is True and not is_stable:
+            is_stable = True
+            returned_at = now
+            false_switches += 0 if saw_outage else 1
+    results = {
+        'switches': switches,
+        'false_switches': false_switches,
+        'flaps': flaps,
+        'lost_seconds': lost,
+        'lte_seconds': lte,
+    }
+    if traffic is not None:
+        results['lte_megabytes'] = lte_bytes / 1e6
+    return results
+
+
+def report(results: dict):
+    for name, result in results.items():
+        print(f"{name}:\t" + "\t".join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                                      for key, value in result.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', type=float, default=6, help="Length of the synthetic trace")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace', help="Replay a recorded .jsonl.gz trace instead of a synthetic one")
+    args = parser.parse_args()
+    if args.trace:
+        report({name: score(policy(), trace_samples(args.trace)) for name, policy in POLICIES.items()})
+    else:
+        samples = synthetic_trace(args.hours * 3600, seed=args.seed)
+        report({name: score(policy(), samples) for name, policy in POLICIES.items()})
+
+
+if __name__ == '__main__':
+    main()
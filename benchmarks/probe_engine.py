@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures how fast active probes catch an outage the dish doesn't report.
+
+A fake dish reports itself connected throughout, while the loopback stand-ins for the Internet go
+down for `--outage` seconds: the TCP target refuses connections and the DNS target stops answering.
+The monitor uses the connected policy with probes, so any switch is down to the probes alone.
+
+    python -m benchmarks.probe_engine --interval 0.25 --outage 10
+"""
+
+import argparse
+import asyncio
+
+from benchmarks.fakes import FakeDish, LoopbackDnsServer, LoopbackTcpServer
+from internet_switcher.policies import ConnectedPolicy
+from internet_switcher.probes import ProbeEngine, ProbeTarget
+from internet_switcher.starlink_monitor import StarlinkMonitor
+
+
+async def run(interval: float, timeout: float, window: float, outage: float, stable_after: float) -> dict:
+    tcp, dns = LoopbackTcpServer(), LoopbackDnsServer()
+    await tcp.up()
+    await dns.up()
+    engine = ProbeEngine({'starlink': None}, [ProbeTarget('tcp', '127.0.0.1', tcp.port),
+                                              ProbeTarget('dns', '127.0.0.1', dns.port)],
+                         interval=interval, timeout=timeout, window=window)
+    policy = ConnectedPolicy(stable_after)
+    policy.use_probes(engine.windows['starlink'])
+    monitor = StarlinkMonitor(FakeDish(), policy=policy)
+    loop = asyncio.get_running_loop()
+    changes = []
+
+    async def record(stable: bool):
+        changes.append((stable, loop.time()))
+
+    monitor.on_stable(lambda: record(True))
+    monitor.on_unstable(lambda: record(False))
+    await monitor.starlink.connect()
+    engine.start()
+    monitor.start()
+    try:
+        await asyncio.sleep(window)
+        down_at = loop.time()
+        await tcp.down()
+        dns.blackholed = True
+        await asyncio.sleep(outage)
+        up_at = loop.time()
+        await tcp.up()
+        dns.blackholed = False
+        await asyncio.sleep(window + stable_after + 2)
+    finally:
+        engine.stop()
+        monitor.stop()
+        await asyncio.gather(monitor.task, return_exceptions=True)
+        dns.close()
+        await tcp.down()
+
+    detected = next((at for stable, at in changes if not stable and at >= down_at), None)
+    recovered = next((at for stable, at in changes if stable and at >= up_at), None)
+    return {
+        'detect_seconds': None if detected is None else detected - down_at,
+        'recover_seconds': None if recovered is None else recovered - up_at,
+        'transitions': len(changes),
+        'p50_probe_ms': (engine.windows['starlink'].latency_percentile(50) or 0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interval', type=float, default=0.25, help="Seconds between probe rounds")
+    parser.add_argument('--timeout', type=float, default=0.5, help="Seconds before a probe counts as lost")
+    parser.add_argument('--window', type=float, default=3.0, help="Seconds of probe results to judge loss over")
+    parser.add_argument('--outage', type=float, default=5.0)
+    parser.add_argument('--stable-after', type=float, default=2.0)
+    args = parser.parse_args()
+    results = asyncio.run(run(args.interval, args.timeout, args.window, args.outage, args.stable_after))
+    print('\t'.join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in results.items()))
+
+
+if __name__ == '__main__':
+    main()
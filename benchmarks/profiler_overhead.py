@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures what the profiler costs when it's off and on, and checks that it catches a blocked loop.
+
+- span_ns / wrap_ns: one `PROFILER.span` block, or one `PROFILER.wrap`ped coroutine awaited
+- cpu_us_per_probe: CPU per `StarlinkMonitor` probe of a fake dish answering instantly, with a
+  short outage every second so the dispatcher's action spans run too
+- stall: with profiling on, the loop is blocked by a `time.sleep` for `--stall` seconds;
+  reports the `loop.lag` span recorded for it and whether its stack names the blocking function
+
+    python -m benchmarks.profiler_overhead --duration 3
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.fakes import FakeDish
+from internet_switcher.config import Config
+from internet_switcher.metrics import Instrumentation
+from internet_switcher.profiler import LOOP_LAG, PROFILER
+from internet_switcher.starlink_monitor import StarlinkMonitor
+
+
+async def nothing():
+    pass
+
+
+def time_span(iterations: int) -> float:
+    span = PROFILER.span
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with span('bench.span'):
+            pass
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+async def time_wrap(iterations: int) -> float:
+    wrap = PROFILER.wrap
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await wrap(nothing(), 'bench.wrap')
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+async def measure_monitor(duration: float) -> float:
+    outages = [(second + 0.5, second + 0.6) for second in range(int(duration) + 1)]
+    dish = FakeDish(outages, response_time=0)
+    await dish.connect()
+    monitor = StarlinkMonitor(dish, min_interval=0, max_interval=0, stable_after=0.2)
+    monitor.on_stable(nothing)
+    monitor.on_unstable(nothing)
+    started_cpu = time.process_time()
+    monitor.start()
+    await monitor.wait(duration)
+    monitor.stop()
+    await asyncio.gather(monitor.task, return_exceptions=True)
+    return (time.process_time() - started_cpu) / dish.calls * 1e6
+
+
+def block_the_loop(seconds: float):
+    time.sleep(seconds)
+
+
+async def measure_stall(stall: float) -> dict:
+    config = Config()
+    config.profiling_enabled = True
+    instrumentation = Instrumentation(config)
+    await instrumentation.start()
+    try:
+        await asyncio.sleep(0.2)
+        block_the_loop(stall)
+        await asyncio.sleep(0.2)
+    finally:
+        await instrumentation.stop()
+    lags = [span for span in PROFILER.top() if span.name == LOOP_LAG]
+    return {
+        'stall_lag_ms': lags[0].duration * 1000 if lags else None,
+        'stall_stack_found': bool(lags and lags[0].stack and 'block_the_loop' in lags[0].stack),
+    }
+
+
+def run(duration: float = 3.0, iterations: int = 200_000, stall: float = 0.3) -> dict:
+    results = {}
+    try:
+        for name, enabled in (('off', False), ('on', True)):
+            if enabled:
+                PROFILER.enable()
+            results[f'span_ns_{name}'] = time_span(iterations)
+            results[f'wrap_ns_{name}'] = asyncio.run(time_wrap(iterations))
+            results[f'cpu_us_per_probe_{name}'] = asyncio.run(measure_monitor(duration))
+            PROFILER.reset()
+        results.update(asyncio.run(measure_stall(stall)))
+    finally:
+        PROFILER.disable()
+        PROFILER.reset()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=3.0, help="Seconds to run the monitor for, each way")
+    parser.add_argument('--iterations', type=int, default=200_000)
+    parser.add_argument('--stall', type=float, default=0.3, help="Seconds to block the loop for")
+    args = parser.parse_args()
+    for key, value in run(args.duration, args.iterations, args.stall).items():
+        print(f"{key}:\t{value:.3f}" if isinstance(value, float) else f"{key}:\t{value}")
+
+
+if __name__ == '__main__':
+    main()
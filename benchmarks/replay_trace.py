@@ -0,0 +1,54 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Replays a trace through the full switcher on a virtual clock, once per decision policy.
+
+Without `--trace`, a synthetic trace of `--hours` hours is generated first.
+
+    python -m benchmarks.replay_trace --hours 24
+"""
+
+import argparse
+import os
+import tempfile
+
+from benchmarks.policy_replay import synthetic_trace
+from internet_switcher.config import Config
+from internet_switcher.policies import POLICIES
+from internet_switcher.simulator import simulate
+from internet_switcher.trace import TraceWriter
+
+
+def write_synthetic_trace(path: str, hours: float, seed: int = 0, lead_in: float = 0.0):
+    """Write a synthetic trace, delaying everything after the first sample by `lead_in` seconds.
+
+    The lead-in moves every outage relative to the switcher's probe schedule, which starts with the
+    trace."""
+    with TraceWriter(path) as writer:
+        for n, (timestamp, status) in enumerate(synthetic_trace(hours * 3600, seed=seed)):
+            if n == 0 and lead_in:
+                writer.write_status(status, timestamp)
+            writer.write_status(status, timestamp + lead_in)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trace', help="A recorded .jsonl.gz trace")
+    parser.add_argument('--hours', type=float, default=24, help="Length of the synthetic trace")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        trace = args.trace
+        if trace is None:
+            trace = os.path.join(tmp, 'synthetic.jsonl.gz')
+            write_synthetic_trace(trace, args.hours, args.seed)
+        for name in POLICIES:
+            config = Config()
+            config.decision_policy = name
+            results = simulate(trace, config)
+            print(f"{name}:\t" + "\t".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                                          for key, value in results.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures Cradlepoint request latency with and without a warm connection pool.
+
+Requests are spaced further apart than the keepalive timeout, like failovers after a quiet period.
+Each scenario runs against a local stub router:
+
+- cold: a new connection for every request (`force_close`)
+- pooled: keep-alive, but the connection expires between requests
+- warm: keep-alive with the keep-warm task holding a connection open
+
+    python -m benchmarks.router_pool --requests 30
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.stub_router import StubRouter
+from cradlepoint.api import CradlepointRouter
+from internet_switcher.config import Config
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def measure(stub: StubRouter, requests: int, gap: float, force_close: bool, keep_warm: bool):
+    config = Config()
+    config.cradlepoint_ip_address = '127.0.0.1'
+    config.cradlepoint_port = str(stub.port)
+    config.cradlepoint_force_close = force_close
+    config.cradlepoint_keep_warm = keep_warm
+    config.cradlepoint_keepalive_timeout = gap / 2
+    router = CradlepointRouter(config)
+    latencies = []
+    try:
+        await router.connect()
+        for i in range(requests):
+            await asyncio.sleep(gap)
+            started = time.perf_counter()
+            await router.config.wan.rules2['00000001-mdm'].priority(2.1 + i % 2)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        await router.close()
+    return {
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+    }
+
+
+async def run(requests: int, gap: float):
+    stub = await StubRouter().start()
+    try:
+        for name, force_close, keep_warm in (('cold', True, False), ('pooled', False, False), ('warm', False, True)):
+            results = await measure(stub, requests, gap, force_close, keep_warm)
+            print(f"{name}:\t" + "\t".join(f"{key}={value:.3f}" for key, value in results.items()))
+    finally:
+        await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=30, help="Requests per scenario")
+    parser.add_argument('--gap', type=float, default=0.3, help="Seconds between requests")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.gap))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures how soon after starting the switcher is protecting the connection.
+
+- import: seconds to import the entry point's modules in a fresh interpreter, and whether that
+  pulled in aiohttp (it shouldn't; the router client is imported once monitoring is running)
+- first_probe: seconds from `connect` to the monitor's first decision about the dish
+- ready: seconds from `connect` to the router being connected and its WAN rules loaded
+
+The router answers each request after `--router-latency` seconds, as one that's still booting might.
+
+    python -m benchmarks.startup --router-latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+
+from benchmarks.fakes import FakeDish
+from benchmarks.stub_router import StubRouter
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher
+from internet_switcher.startup import FIRST_PROBE, READY
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import internet_switcher.__main__
+print(json.dumps({'seconds': time.perf_counter() - started, 'aiohttp': 'aiohttp' in sys.modules}))
+"""
+
+
+def measure_import() -> dict:
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], check=True, capture_output=True, text=True)
+    return json.loads(output.stdout)
+
+
+async def measure_startup(router_latency: float) -> dict:
+    stub = await StubRouter(latency=router_latency).start()
+    config = Config()
+    config.cradlepoint_ip_address = '127.0.0.1'
+    config.cradlepoint_port = str(stub.port)
+    config.config_watch_interval = 0
+    # No router is passed in, so the switcher imports and creates its own like `python -m internet_switcher`
+    switcher = InternetSwitcher(config, starlink=FakeDish())
+    try:
+        await switcher.connect()
+        run_task = asyncio.create_task(switcher.run())
+        while READY not in switcher.startup.marks and not run_task.done():
+            await asyncio.sleep(0.01)
+        run_task.cancel()
+        await asyncio.gather(run_task, return_exceptions=True)
+        return dict(switcher.startup.marks)
+    finally:
+        await switcher.close()
+        await stub.stop()
+
+
+def run(router_latency: float = 0.5) -> dict:
+    imported = measure_import()
+    marks = asyncio.run(measure_startup(router_latency))
+    return {
+        'import_ms': imported['seconds'] * 1000,
+        'imports_aiohttp': imported['aiohttp'],
+        'first_probe_ms': marks[FIRST_PROBE] * 1000,
+        'ready_ms': marks[READY] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--router-latency', type=float, default=0.5, help="Seconds for the stub router to answer")
+    args = parser.parse_args()
+    for key, value in run(args.router_latency).items():
+        print(f"{key}:\t{value:.1f}" if isinstance(value, float) else f"{key}:\t{value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# SPDX-License-Identifier: Unlicense
+
+"""A local HTTP server that answers like the Cradlepoint API, for benchmarks."""
+
+import asyncio
+import copy
+import json
+
+from aiohttp import web
+
+from cradlepoint.batch import _slice
+from internet_switcher.simulator import DEFAULT_TREE, apply_put
+
+
+class StubRouter:
+    """Serves `/api/<path>` from an in-memory tree, optionally adding `latency` seconds per request."""
+    def __init__(self, tree=None, latency: float = 0.0):
+        self.tree = copy.deepcopy(tree if tree is not None else DEFAULT_TREE)
+        self.latency = latency
+        self.requests = 0
+        self.runner = None
+        self.port = None
+
+    async def start(self, host: str = '127.0.0.1'):
+        app = web.Application()
+        app.router.add_route('*', '/api/{path:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path = request.match_info['path'].strip('/')
+        try:
+            if request.method == 'PUT':
+                data = json.loads((await request.post())['data'])
+                apply_put(self.tree, path, data)
+            else:
+                data = _slice(self.tree, path)
+        except (KeyError, IndexError, TypeError):
+            return web.json_response({'success': False, 'data': {'reason': 'not found'}})
+        return web.json_response({'success': True, 'data': data})
@@ -0,0 +1,249 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Runs the hot-path benchmarks, writes the results as JSON and compares them against a baseline.
+
+- monitor: `StarlinkMonitor` detection latency and wakeups with the default probe intervals, over
+  60 outages on a virtual clock
+- router: `CradlepointRouter.request` throughput against the local stub router
+- endpoint: `Endpoint` construction and dispatch cost
+- failover: end to end, from the fake dish reporting an outage to the stub router acknowledging
+  the switch to cellular, on the real clock
+- replay: a synthetic trace replayed through the whole switcher on a virtual clock, averaged over
+  four phases of its outages against the probe schedule
+- startup: import time, and time to the first dish decision and to being ready to switch
+- ranking: router writes and batched apply time per reorder of four WANs, on a virtual clock
+
+Every metric is compared against `--baseline`, and the run exits non-zero if any got worse by more
+than its tolerance. Virtual-clock metrics are deterministic and get a tight tolerance; wall-clock
+ones are machine dependent, so regenerate the baseline with `--save-baseline` on new hardware.
+
+    python -m benchmarks.suite --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+from benchmarks import endpoint_paths, monitor_wakeups, startup, wan_ranking
+from benchmarks.fakes import FakeDish
+from benchmarks.replay_trace import write_synthetic_trace
+from benchmarks.stub_router import StubRouter
+from cradlepoint.api import CradlepointRouter
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher
+from internet_switcher.simulator import VirtualClockLoop, simulate
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Whether a bigger value is worse, the relative change tolerated before it counts as a regression,
+# and an absolute slack for metrics so small that scheduling noise dominates them
+LOWER_IS_BETTER = 'lower'
+HIGHER_IS_BETTER = 'higher'
+METRICS = {
+    'monitor.detect_latency_mean': (LOWER_IS_BETTER, 0.05, 0.0),
+    'monitor.detect_latency_max': (LOWER_IS_BETTER, 0.05, 0.0),
+    'monitor.wakeups_per_minute': (LOWER_IS_BETTER, 0.05, 0.0),
+    'router.requests_per_second': (HIGHER_IS_BETTER, 0.5, 0.0),
+    'endpoint.construct_us': (LOWER_IS_BETTER, 0.5, 0.0),
+    'endpoint.dispatch_us': (LOWER_IS_BETTER, 0.5, 0.0),
+    # The outage lands at a fixed point in the probe schedule, so this only moves with machine speed
+    # and with the probe interval itself
+    'failover.outage_to_switch_ms': (LOWER_IS_BETTER, 0.25, 0.0),
+    'failover.report_to_switch_ms': (LOWER_IS_BETTER, 1.0, 10.0),
+    'replay.detect_latency_mean': (LOWER_IS_BETTER, 0.05, 0.0),
+    'replay.router_requests': (LOWER_IS_BETTER, 0.1, 0.0),
+    'replay.wall_seconds': (LOWER_IS_BETTER, 0.5, 0.0),
+    'startup.import_ms': (LOWER_IS_BETTER, 0.5, 10.0),
+    'startup.first_probe_ms': (LOWER_IS_BETTER, 1.0, 20.0),
+    'startup.ready_ms': (LOWER_IS_BETTER, 0.2, 20.0),
+    'ranking.writes': (LOWER_IS_BETTER, 0.05, 0.0),
+    'ranking.apply_ms': (LOWER_IS_BETTER, 0.05, 0.0),
+}
+
+
+class CountingVirtualClockLoop(VirtualClockLoop):
+    wakeups = 0
+
+    def _run_once(self):
+        self.wakeups += 1
+        super()._run_once()
+
+
+def bench_monitor() -> dict:
+    loop = CountingVirtualClockLoop()
+    config = Config()
+    try:
+        # Outages come every 10 s, so the monitor has to be stable again well before the next one
+        results = loop.run_until_complete(monitor_wakeups.measure(
+            600, min_interval=config.starlink_min_interval, max_interval=config.starlink_max_interval,
+            stable_after=2))
+    finally:
+        loop.close()
+    if results['detected'] != results['outages']:
+        raise RuntimeError(f"The monitor only detected {results['detected']} of {results['outages']} outages")
+    return {key: results[key] for key in ('detect_latency_mean', 'detect_latency_max', 'wakeups_per_minute')}
+
+
+def stub_config(stub: StubRouter) -> Config:
+    config = Config()
+    config.cradlepoint_ip_address = '127.0.0.1'
+    config.cradlepoint_port = str(stub.port)
+    return config
+
+
+async def _bench_router(requests: int) -> dict:
+    stub = await StubRouter().start()
+    router = CradlepointRouter(stub_config(stub))
+    try:
+        await router.connect()
+        started = time.perf_counter()
+        await asyncio.gather(*[router.config.wan.rules2['00000001-mdm'].priority() for _ in range(requests)])
+        elapsed = time.perf_counter() - started
+    finally:
+        await router.close()
+        await stub.stop()
+    return {'requests_per_second': requests / elapsed}
+
+
+def bench_router() -> dict:
+    return asyncio.run(_bench_router(1000))
+
+
+def bench_endpoint() -> dict:
+    return endpoint_paths.run(100_000)
+
+
+async def _bench_failover(outage_at: float) -> dict:
+    stub = await StubRouter().start()
+    config = stub_config(stub)
+    switcher = InternetSwitcher(config, starlink=FakeDish([(outage_at, outage_at + 60)]),
+                                cradlepoint=CradlepointRouter(config))
+    try:
+        await switcher.connect()
+        run_task = asyncio.create_task(switcher.run())
+        loop = asyncio.get_running_loop()
+        while switcher.last_switch_latency is None and not run_task.done():
+            await asyncio.sleep(0.01)
+        switched_at = loop.time()
+        run_task.cancel()
+        await asyncio.gather(run_task, return_exceptions=True)
+        dish = switcher.starlink.dish
+        return {
+            'outage_to_switch_ms': (switched_at - dish.started_at - outage_at) * 1000,
+            'report_to_switch_ms': switcher.last_switch_latency * 1000,
+        }
+    finally:
+        await switcher.close()
+        await stub.stop()
+
+
+def bench_failover() -> dict:
+    return asyncio.run(_bench_failover(outage_at=1.0))
+
+
+# Where an outage lands between two probes decides most of its detection latency. A single replay
+# would move with anything that shifts when probing starts, so outages are staggered across the
+# trace's 0.5 s sample interval and the results averaged.
+REPLAY_LEAD_INS = (0.0, 0.125, 0.25, 0.375)
+
+
+def bench_replay() -> dict:
+    keys = ('detect_latency_mean', 'router_requests', 'wall_seconds')
+    totals = dict.fromkeys(keys, 0.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for lead_in in REPLAY_LEAD_INS:
+            trace = os.path.join(tmp, f'synthetic-{lead_in}.jsonl.gz')
+            write_synthetic_trace(trace, 2, lead_in=lead_in)
+            results = simulate(trace, Config())
+            for key in keys:
+                totals[key] += results[key]
+    return {key: total / len(REPLAY_LEAD_INS) for key, total in totals.items()}
+
+
+def bench_startup() -> dict:
+    results = startup.run(router_latency=0.5)
+    return {key: results[key] for key in ('import_ms', 'first_probe_ms', 'ready_ms')}
+
+
+def bench_ranking() -> dict:
+    results = wan_ranking.run(wired=1, sims=2)
+    return {key: results[key] for key in ('writes', 'apply_ms')}
+
+
+BENCHMARKS: Dict[str, Callable[[], dict]] = {
+    'monitor': bench_monitor,
+    'router': bench_router,
+    'endpoint': bench_endpoint,
+    'failover': bench_failover,
+    'replay': bench_replay,
+    'startup': bench_startup,
+    'ranking': bench_ranking,
+}
+
+
+def run(names) -> Dict[str, float]:
+    results = {}
+    for name in names:
+        for key, value in BENCHMARKS[name]().items():
+            results[f"{name}.{key}"] = value
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float]) -> Dict[str, str]:
+    """Describe every metric that regressed past its tolerance."""
+    regressions = {}
+    for key, value in results.items():
+        expected = baseline.get(key)
+        if key not in METRICS or expected is None or value is None:
+            continue
+        direction, tolerance, slack = METRICS[key]
+        if direction == LOWER_IS_BETTER:
+            regressed = value > expected * (1 + tolerance) + slack
+        else:
+            regressed = value < expected * (1 - tolerance) - slack
+        if regressed:
+            regressions[key] = f"{value:.4g} vs baseline {expected:.4g} (tolerance {tolerance:.0%} + {slack:g})"
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmarks', nargs='*', help=f"Which to run, out of {', '.join(BENCHMARKS)} (default all)")
+    parser.add_argument('--output', help="Write the results as JSON here")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="Replace the baseline with these results")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = run(args.benchmarks or list(BENCHMARKS))
+    for key, value in results.items():
+        print(f"{key}:\t{value:.4g}" if value is not None else f"{key}:\tNone")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one", file=sys.stderr)
+        return
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f))
+    for key, description in regressions.items():
+        print(f"REGRESSION {key}: {description}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
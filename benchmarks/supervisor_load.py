@@ -0,0 +1,82 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures per-site memory and CPU when one supervisor runs many simulated sites.
+
+Each site gets a fake dish with an outage every minute and a simulated router. Memory is the
+Python heap allocated per site once the sites are running (measured with tracemalloc); CPU is
+process time per site per wall-clock second, measured separately with tracemalloc off.
+
+    python -m benchmarks.supervisor_load --sites 1 10 100 --duration 10
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeDish
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher
+from internet_switcher.simulator import SimulatedRouter
+from internet_switcher.supervisor import Supervisor
+
+
+class SimulatedSupervisor(Supervisor):
+    def make_switcher(self, name: str, config: Config) -> InternetSwitcher:
+        offset = random.uniform(0, 60)
+        outages = [(offset + minute * 60, offset + minute * 60 + 5) for minute in range(60)]
+        return InternetSwitcher(config, starlink=FakeDish(outages), cradlepoint=SimulatedRouter(latency=0.02))
+
+
+def make_sites(count: int, history_size: int):
+    sites = {}
+    for i in range(count):
+        config = Config()
+        config.history_size = history_size
+        sites[f"site{i}"] = config
+    return sites
+
+
+async def run_for(supervisor: Supervisor, seconds: float):
+    task = asyncio.create_task(supervisor.run())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def measure_memory(count: int, history_size: int, warmup: float) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    supervisor = SimulatedSupervisor(make_sites(count, history_size))
+    task = asyncio.create_task(supervisor.run())
+    await asyncio.sleep(warmup)
+    during = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return (during - before) / count
+
+
+async def measure_cpu(count: int, history_size: int, duration: float) -> float:
+    supervisor = SimulatedSupervisor(make_sites(count, history_size))
+    started_cpu, started_wall = time.process_time(), time.perf_counter()
+    await run_for(supervisor, duration)
+    return (time.process_time() - started_cpu) / (time.perf_counter() - started_wall) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sites', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--duration', type=float, default=10, help="Seconds to measure CPU for")
+    parser.add_argument('--history-size', type=int, default=20_000, help="Status samples kept per site")
+    args = parser.parse_args()
+
+    for count in args.sites:
+        memory = asyncio.run(measure_memory(count, args.history_size, warmup=2))
+        cpu = asyncio.run(measure_cpu(count, args.history_size, args.duration))
+        print(f"{count} sites:\tmemory_per_site_kb={memory / 1024:.1f}\tcpu_per_site_percent={cpu * 100:.3f}")
+
+
+if __name__ == '__main__':
+    main()
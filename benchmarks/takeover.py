@@ -0,0 +1,191 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Kills the leading switcher process and measures how long the standby takes to take over.
+
+Two switcher processes in HA mode share a stub router run by this harness, and each has a fake dish
+that goes down at the same moment. The leader is killed with SIGKILL as the outage starts, so the
+switch to cellular is left to the standby. Reported, in milliseconds after the kill:
+
+- elected_ms: the warm standby holds the lease
+- switch_ms: the router prefers cellular, switched by the warm standby
+- cold_switch_ms: the router prefers cellular, switched by a fresh process started at the kill
+
+Both switch times include the usual time for the dish monitor to notice the outage. In router mode
+the takeover is bounded by `--ttl`: the default config's 30 s TTL takes 20 to 50 s, so the benchmark
+defaults to a short one.
+
+    python -m benchmarks.takeover --mode file
+    python -m benchmarks.takeover --mode router --ttl 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from benchmarks.fakes import FakeDish
+from benchmarks.stub_router import StubRouter
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher
+from internet_switcher.startup import READY
+
+
+class RecordingStubRouter(StubRouter):
+    """Notes the wall time at which the router first preferred cellular."""
+    def __init__(self):
+        super().__init__()
+        self.cellular_at: Optional[float] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        response = await super().handle(request)
+        if request.method == 'PUT' and self.cellular_at is None:
+            priorities = {rule['_id_']: rule['priority'] for rule in self.tree['config']['wan']['rules2']}
+            if priorities['00000001-mdm'] < priorities['00000000-eth']:
+                self.cellular_at = time.time()
+        return response
+
+
+def emit(instance_id: str, event: str):
+    print(json.dumps({'id': instance_id, 'event': event, 't': time.time()}), flush=True)
+
+
+async def worker(args):
+    """One switcher process, reporting when it's ready and when it's elected on stdout."""
+    config = Config()
+    config.cradlepoint_ip_address = '127.0.0.1'
+    config.cradlepoint_port = str(args.port)
+    config.config_watch_interval = 0
+    config.ha_mode = args.mode
+    config.ha_lease_path = args.lease
+    config.ha_instance_id = args.id
+    config.ha_ttl = args.ttl
+    outage_in = args.outage_at - time.time()
+    switcher = InternetSwitcher(config, starlink=FakeDish([(outage_in, outage_in + 60)]))
+    await switcher.connect()
+    run_task = asyncio.create_task(switcher.run())
+    ready = leading = False
+    try:
+        while not run_task.done():
+            if not ready and READY in switcher.startup.marks:
+                ready = True
+                emit(args.id, 'ready')
+            if not leading and switcher.election is not None and switcher.election.leading:
+                leading = True
+                emit(args.id, 'elected')
+            await asyncio.sleep(0.005)
+        await run_task
+    finally:
+        await switcher.close()
+
+
+class Harness:
+    def __init__(self, mode: str, lease: str, port: int, ttl: float):
+        self.mode = mode
+        self.lease = lease
+        self.port = port
+        self.ttl = ttl
+        self.events: Dict[str, Dict[str, float]] = {}
+        self.changed = asyncio.Event()
+        self.processes = []
+
+    async def spawn(self, instance_id: str, outage_at: float) -> asyncio.subprocess.Process:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'benchmarks.takeover', '--worker', '--id', instance_id, '--mode', self.mode,
+            '--lease', self.lease, '--port', str(self.port), '--outage-at', repr(outage_at), '--ttl', repr(self.ttl),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        self.processes.append(process)
+        asyncio.create_task(self._read(process))
+        return process
+
+    async def _read(self, process: asyncio.subprocess.Process):
+        async for line in process.stdout:
+            event = json.loads(line)
+            self.events.setdefault(event['id'], {})[event['event']] = event['t']
+            self.changed.set()
+
+    async def wait_for(self, instance_id: str, event: str) -> float:
+        deadline = time.time() + 10.0 + 2 * self.ttl
+        while event not in self.events.get(instance_id, {}):
+            if time.time() > deadline:
+                raise TimeoutError(f"{instance_id} never got {event}")
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), deadline - time.time())
+            except asyncio.TimeoutError:
+                pass
+        return self.events[instance_id][event]
+
+    async def stop(self):
+        for process in self.processes:
+            if process.returncode is None:
+                process.terminate()
+            await process.wait()
+
+
+async def _trial(mode: str, lease: str, warm: bool, lead_time: float, ttl: float) -> dict:
+    stub = await RecordingStubRouter().start()
+    harness = Harness(mode, lease, stub.port, ttl)
+    try:
+        outage_at = time.time() + lead_time
+        leader = await harness.spawn('leader', outage_at)
+        await harness.wait_for('leader', 'elected')
+        if warm:
+            await harness.spawn('standby', outage_at)
+            await harness.wait_for('standby', 'ready')
+        await asyncio.sleep(max(0.0, outage_at - time.time()))
+        leader.send_signal(signal.SIGKILL)
+        killed_at = time.time()
+        if not warm:
+            await harness.spawn('standby', outage_at)
+        elected_at = await harness.wait_for('standby', 'elected')
+        while stub.cellular_at is None and time.time() - killed_at < 10 + 2 * ttl:
+            await asyncio.sleep(0.005)
+        return {
+            'elected_ms': (elected_at - killed_at) * 1000,
+            'switch_ms': (stub.cellular_at - killed_at) * 1000 if stub.cellular_at else None,
+        }
+    finally:
+        await harness.stop()
+        await stub.stop()
+
+
+def run(mode: str = 'file', lead_time: float = 4.0, ttl: float = 2.0) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        lease = os.path.join(tmp, 'switcher.lock') if mode == 'file' else ''
+        warm = asyncio.run(_trial(mode, lease, warm=True, lead_time=lead_time, ttl=ttl))
+        cold = asyncio.run(_trial(mode, lease, warm=False, lead_time=lead_time, ttl=ttl))
+    return {
+        'elected_ms': warm['elected_ms'],
+        'switch_ms': warm['switch_ms'],
+        'cold_switch_ms': cold['switch_ms'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('file', 'router'), default='file', help="Which lease to coordinate with")
+    parser.add_argument('--lead-time', type=float, default=4.0,
+                        help="Seconds to let the processes start before killing the leader")
+    parser.add_argument('--ttl', type=float, default=2.0, help="Router lease TTL in seconds")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--id', help=argparse.SUPPRESS)
+    parser.add_argument('--lease', default='', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--outage-at', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        asyncio.run(worker(args))
+        return
+    for key, value in run(args.mode, args.lead_time, args.ttl).items():
+        print(f"{key}:\t{value:.0f}" if value is not None else f"{key}:\tNone")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Measures how many router writes and round trips `WanRanking` needs to reorder several WANs.
+
+A router with one Starlink uplink, `--wired` other wired uplinks and `--sims` modems goes through
+`--steps` random health changes (Starlink up or down, WANs connecting and disconnecting, modem
+signal moving), and the ranking reapplies the order after each one. On a virtual clock, with the
+router answering after `--latency` seconds, it reports per reorder that changed anything:
+
+- writes: priority writes `WanRanking` made
+- naive_writes: writes needed to renumber every rule to 1, 2, 3... in the new order
+- apply_ms: time for the writes, sent together in one batch
+- sequential_ms: time for the naive writes, one request at a time
+
+    python -m benchmarks.wan_ranking --wired 1 --sims 2
+"""
+
+import argparse
+import asyncio
+import copy
+import random
+
+from cradlepoint.wan import WanDevice
+from internet_switcher.ranking import WanRanking
+from internet_switcher.simulator import DEFAULT_TREE, SimulatedRouter, VirtualClockLoop
+
+
+def make_tree(wired: int, sims: int) -> dict:
+    tree = copy.deepcopy(DEFAULT_TREE)
+    devices = tree['status']['wan']['devices'] = {}
+    rules = tree['config']['wan']['rules2'] = []
+    names = ['ethernet-wan'] + [f'wan{n + 2}' for n in range(wired)] + [f'mdm-sim{n + 1}' for n in range(sims)]
+    for n, name in enumerate(names):
+        rule_id = f'{n:08d}-wan'
+        if name.startswith('mdm'):
+            info = {'iface': f'wwan{n}', 'sim': name[4:]}
+        else:
+            info = {'iface': f'eth0.{n + 1}', 'port': name}
+        devices[name] = {'config': {'_id_': rule_id}, 'info': info, 'status': {'connection_state': 'connected'},
+                         'diagnostics': {'RSRP': '-100'}}
+        rules.append({'_id_': rule_id, 'priority': 1.0 + n})
+    return tree
+
+
+def naive_writes(before: dict, order: list) -> int:
+    return sum(1 for k, rule in enumerate(order) if before.get(rule) != float(k + 1))
+
+
+async def _run(wired: int, sims: int, steps: int, latency: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    router = SimulatedRouter(make_tree(wired, sims), latency=latency)
+    devices = await WanDevice.from_api(router)
+    starlink = devices.filter_one(iface='eth0.1')
+    ranking = WanRanking(devices, starlink, devices.filter_one(sim='sim1'))
+    others = [name for name in router.tree['status']['wan']['devices'] if name != 'ethernet-wan']
+    await ranking.prioritize(False)
+
+    loop = asyncio.get_running_loop()
+    reorders = writes = naive = 0
+    apply_seconds = 0.0
+    cellular = False
+    for _ in range(steps):
+        if rng.random() < 0.3:
+            cellular = not cellular
+        name = rng.choice(others)
+        if rng.random() < 0.5:
+            state = rng.choice(('connected', 'connected', 'disconnected'))
+            ranking.health.setdefault(name, {})['status'] = {'connection_state': state}
+        else:
+            ranking.health.setdefault(name, {})['diagnostics'] = {'RSRP': str(rng.randint(-120, -80))}
+
+        before = dict(ranking.priorities)
+        order = [device.id for device in ranking.rank(cellular)]
+        written = len(router.writes)
+        started = loop.time()
+        if await ranking.prioritize(cellular):
+            reorders += 1
+            apply_seconds += loop.time() - started
+            writes += len(router.writes) - written
+            # A renumbering would have started from 1, 2, 3...; compare against that from the same order
+            previous = sorted(order, key=before.get)
+            naive += naive_writes({rule: float(k + 1) for k, rule in enumerate(previous)}, order)
+    reorders = max(reorders, 1)
+    return {
+        'reorders': reorders,
+        'writes': writes / reorders,
+        'naive_writes': naive / reorders,
+        'apply_ms': apply_seconds / reorders * 1000,
+        'sequential_ms': naive / reorders * latency * 1000,
+    }
+
+
+def run(wired: int = 1, sims: int = 2, steps: int = 500, latency: float = 0.05, seed: int = 1) -> dict:
+    loop = VirtualClockLoop()
+    try:
+        return loop.run_until_complete(_run(wired, sims, steps, latency, seed))
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wired', type=int, default=1, help="Wired uplinks besides Starlink")
+    parser.add_argument('--sims', type=int, default=2, help="Modems")
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds for the router to answer")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    for key, value in run(args.wired, args.sims, args.steps, args.latency, args.seed).items():
+        print(f"{key}:\t{value:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,19 @@
 # SPDX-License-Identifier: Unlicense
 
+import asyncio
 import json
-from typing import TYPE_CHECKING, Any, Awaitable, Union
+from typing import TYPE_CHECKING, Any, Awaitable, Optional, Union
 
 import aiohttp
 
-import os
 import re
 import logging
+import time
 
+from cradlepoint.batch import RequestBatch
+from cradlepoint.mirror import RouterMirror
+from internet_switcher.metrics import ROUTER_REQUEST_SECONDS
+from internet_switcher.profiler import PROFILER
 from internet_switcher.util.logging import LoggingMixin
 
 if TYPE_CHECKING:
@@ -16,25 +21,83 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+_NUMERIC_ATTR = re.compile(r"\_(\d+)")
+
 
 class CradlepointRouter(LoggingMixin):
-    def __init__(self, config: 'Config'):
+    batch_limit = 4
+
+    warm_path = 'status/product_info/product_name'
+
+    def __init__(self, config: 'Config', connector: Optional[aiohttp.BaseConnector] = None):
+        """Pass a `connector` to share a connection pool between routers. It won't be closed with the router."""
+        connector_owner = connector is None
+        if connector is None:
+            connector = self.make_connector(config)
+        self.timeout = aiohttp.ClientTimeout(
+            connect=config.cradlepoint_connect_timeout,
+            sock_read=config.cradlepoint_read_timeout
+        )
         self.session = aiohttp.ClientSession(
             base_url=f"http://{config.cradlepoint_server}",
-            auth=aiohttp.BasicAuth(config.cradlepoint_username, config.cradlepoint_password)
+            auth=aiohttp.BasicAuth(config.cradlepoint_username, config.cradlepoint_password),
+            connector=connector,
+            connector_owner=connector_owner,
+            timeout=self.timeout
         )
+        self.semaphore = asyncio.Semaphore(config.cradlepoint_pool_size)
+        self.keep_warm = config.cradlepoint_keep_warm and not config.cradlepoint_force_close
+        self.warm_interval = config.cradlepoint_keepalive_timeout / 2
+        self.warm_task = None
+        self.trace = None
+
+    @staticmethod
+    def make_connector(config: 'Config', limit: Optional[int] = None) -> aiohttp.TCPConnector:
+        """Build a connection pool tuned by the config."""
+        if config.cradlepoint_force_close:
+            return aiohttp.TCPConnector(
+                limit=limit or config.cradlepoint_pool_size,
+                ttl_dns_cache=config.cradlepoint_dns_cache_ttl,
+                force_close=True
+            )
+        return aiohttp.TCPConnector(
+            limit=limit or config.cradlepoint_pool_size,
+            ttl_dns_cache=config.cradlepoint_dns_cache_ttl,
+            keepalive_timeout=config.cradlepoint_keepalive_timeout
+        )
+
+    def reconfigure(self, config: 'Config'):
+        """Apply new timeouts, concurrency and keep-warm settings without dropping pooled connections.
+
+        The connector's own settings, the address and the credentials only change on restart."""
+        self.timeout = aiohttp.ClientTimeout(
+            connect=config.cradlepoint_connect_timeout,
+            sock_read=config.cradlepoint_read_timeout
+        )
+        # Requests already waiting keep the old limit; new ones use the new one
+        self.semaphore = asyncio.Semaphore(config.cradlepoint_pool_size)
+        self.keep_warm = config.cradlepoint_keep_warm and not config.cradlepoint_force_close
+        self.warm_interval = config.cradlepoint_keepalive_timeout / 2
+        if not self.keep_warm and self.warm_task is not None:
+            self.warm_task.cancel()
+            self.warm_task = None
+        elif self.keep_warm and self.warm_task is None and not self.session.closed:
+            self.warm_task = asyncio.create_task(self._keep_warm())
 
     async def __aenter__(self):
         return self
 
-    async def __aexit__(self):
+    async def __aexit__(self, *_):
         await self.close()
 
     def __getattr__(self, __name) -> 'Endpoint':
-        num_attr = re.match(r"\_(\d+)", __name)
-        if num_attr:
-            __name = num_attr.group(1)
-        return Endpoint(self, __name)
+        if __name.startswith('__'):
+            raise AttributeError(__name)
+        num_attr = _NUMERIC_ATTR.match(__name)
+        endpoint = Endpoint(self, num_attr.group(1) if num_attr else __name)
+        # Cache it as a plain attribute, so the next lookup doesn't get here
+        setattr(self, __name, endpoint)
+        return endpoint
 
     async def get(self, path):
         return await self.request('GET', path)
@@ -43,18 +106,34 @@ class CradlepointRouter(LoggingMixin):
         return await self.request('PUT', path, value=value)
 
     async def request(self, method: str, path, value=None):
-        self.debug(f"Making {method.upper()} request to path {str(path)}")
+        self.debug("Making %s request to path %s", method, path)
         if value is not None:
             data = {'data': json.dumps(value)}
         else:
             data = None
-        async with self.session.request(method=method, url='/api/' + str(path), data=data) as response:
-            assert response.status == 200
-            json_response = await response.json()
-            assert json_response['success'] == True
-            data = json_response['data']
-            self.debug(f"Data: {json.dumps(data)[:100]}")
-            return data
+        url = path.__url__ if isinstance(path, Endpoint) else '/api/' + str(path)
+        # Includes waiting for a connection from the pool
+        with PROFILER.span('router.request', method, path):
+            async with self.semaphore:
+                started = time.perf_counter()
+                async with self.session.request(method=method, url=url, data=data, timeout=self.timeout) as response:
+                    assert response.status == 200
+                    json_response = await response.json()
+                    assert json_response['success'] == True
+                    data = json_response['data']
+                    ROUTER_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method.upper(), endpoint=str(path))
+        self.debug("Data: %.100r", data)
+        if self.trace is not None:
+            self.trace.write_router(method, str(path), value, data)
+        return data
+
+    def batch(self, limit: Optional[int] = None) -> RequestBatch:
+        """Group several requests together. See `RequestBatch`."""
+        return RequestBatch(self, limit or self.batch_limit)
+
+    def mirror(self, interval: float = 10.0) -> RouterMirror:
+        """Keep local copies of router subtrees that are swept for changes. See `RouterMirror`."""
+        return RouterMirror(self, interval)
 
     async def is_valid(self) -> bool:
         """Check the config by making a request.
@@ -64,10 +143,10 @@ class CradlepointRouter(LoggingMixin):
         try:
             await self.connect()
         except aiohttp.ClientConnectionError:
-            logging.error("Could not connect to Cradlepoint", exc_info=True)
+            self.error("Could not connect to Cradlepoint", exc_info=True)
             return False
         except AssertionError:
-            logging.error("Connected, but got invalid response", exc_info=True)
+            self.error("Connected, but got invalid response", exc_info=True)
             return False
 
     async def connect(self):
@@ -77,9 +156,25 @@ class CradlepointRouter(LoggingMixin):
         will throw an error."""
         product_info = await self.status.product_info()
         product_name = product_info["product_name"]
-        logger.info(f"Connected to: {product_name}")
+        self.info("Connected to: %s", product_name)
+        if self.keep_warm and self.warm_task is None:
+            self.warm_task = asyncio.create_task(self._keep_warm())
+
+    async def _keep_warm(self):
+        """Make a cheap request often enough that a pooled connection never hits its keepalive timeout.
+
+        This way the first request after a quiet period (usually a failover) doesn't pay for TCP setup."""
+        while True:
+            await asyncio.sleep(self.warm_interval)
+            try:
+                await self.get(self.warm_path)
+            except (aiohttp.ClientError, asyncio.TimeoutError, AssertionError):
+                self.debug("Keep-warm request failed", exc_info=True)
 
     async def close(self):
+        if self.warm_task is not None:
+            self.warm_task.cancel()
+            self.warm_task = None
         if not self.session.closed:
             await self.session.close()
 
@@ -101,35 +196,56 @@ class Endpoint:
     ```
     await api.config.lan.schedule.enabled(True)
     ```
+
+    Every other attribute is a child path, so the endpoint's own state only uses dunder names
+    (`__api__`, `__endpoint_path__`, `__url__`, `__children__` and `__child__`), which are never
+    turned into children.
     """
+    __slots__ = ('__api__', '__endpoint_path__', '__url__', '__children__')
+
     def __init__(self, api: 'CradlepointRouter', path: str):
-        self._api = api
-        self._endpoint_path = path
+        self.__api__ = api
+        self.__endpoint_path__ = path
+        self.__url__ = '/api/' + path
+        self.__children__ = {}
+
+    def __child__(self, key: str, name: str) -> 'Endpoint':
+        child = Endpoint(self.__api__, self.__endpoint_path__ + '/' + name)
+        self.__children__[key] = child
+        return child
 
     def __getattr__(self, __name: str) -> 'Endpoint':
-        num_attr = re.match(r"\_(\d+)", __name)
-        if num_attr:
-            __name = num_attr.group(1)
-        return Endpoint(self._api, os.path.join(self._endpoint_path, __name))
+        try:
+            return self.__children__[__name]
+        except KeyError:
+            pass
+        if __name.startswith('__'):
+            raise AttributeError(__name)
+        num_attr = _NUMERIC_ATTR.match(__name)
+        return self.__child__(__name, num_attr.group(1) if num_attr else __name)
 
     def __getitem__(self, __name: Union[str, int]) -> 'Endpoint':
-        return Endpoint(self._api, os.path.join(self._endpoint_path, str(__name)))
+        key = str(__name)
+        try:
+            return self.__children__['[' + key]
+        except KeyError:
+            return self.__child__('[' + key, key)
 
     def __call__(self, *args) -> Awaitable[Any]:
         return self.__acall__(*args)
 
     async def __acall__(self, *args) -> Any:
         if len(args) == 0:
-            return await self._api.get(self)
+            return await self.__api__.get(self)
 
         elif len(args) > 1:
             raise ValueError("More than one arg is not supported yet")
 
         else:
-            return await self._api.put(self, args[0])
+            return await self.__api__.put(self, args[0])
 
     def __repr__(self) -> str:
-        return self._endpoint_path
+        return self.__endpoint_path__
 
     def __str__(self) -> str:
-        return self._endpoint_path
+        return self.__endpoint_path__
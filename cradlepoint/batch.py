@@ -0,0 +1,142 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from cradlepoint.api import CradlepointRouter, Endpoint
+
+
+class RequestBatch(LoggingMixin):
+    """Groups several endpoint requests so they run concurrently when the batch exits.
+
+    ```
+    async with api.batch() as batch:
+        devices = batch.get(api.status.wan.devices)
+        batch.put(api.config.wan.rules2[rule_id].priority, 1.5)
+    print(devices.result())
+    ```
+
+    GETs are deduplicated: if a path and one of its parents are both requested, only the parent is
+    fetched and the child is sliced out of it. All GETs run before any PUT, so they see the state from
+    before the batch. Repeated PUTs to the same path only send the last value. At most `limit`
+    requests are in flight at once.
+    """
+    def __init__(self, api: 'CradlepointRouter', limit: int = 4):
+        self.api = api
+        self.limit = limit
+        self._gets: Dict[str, List[asyncio.Future]] = {}
+        self._puts: Dict[str, Tuple[Any, List[asyncio.Future]]] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        else:
+            await self.run()
+
+    def get(self, path: 'Endpoint') -> asyncio.Future:
+        """Queue a GET, returning a future for its data."""
+        future = asyncio.get_running_loop().create_future()
+        self._gets.setdefault(str(path), []).append(future)
+        return future
+
+    def put(self, path: 'Endpoint', value: Any) -> asyncio.Future:
+        """Queue a PUT, returning a future for the router's response."""
+        future = asyncio.get_running_loop().create_future()
+        _, futures = self._puts.get(str(path), (None, []))
+        self._puts[str(path)] = (value, futures + [future])
+        return future
+
+    def cancel(self):
+        for futures in self._gets.values():
+            for future in futures:
+                future.cancel()
+        for _, futures in self._puts.values():
+            for future in futures:
+                future.cancel()
+        self._gets.clear()
+        self._puts.clear()
+
+    async def run(self):
+        """Send everything queued so far. Raises the first error, if any request failed."""
+        gets, puts = self._gets, self._puts
+        self._gets, self._puts = {}, {}
+        semaphore = asyncio.Semaphore(self.limit)
+
+        async def send(method, path, value=None):
+            async with semaphore:
+                return await self.api.request(method, path, value=value)
+
+        groups = self._group(gets)
+        self.debug("Batch: %d GETs in %d requests, %d PUTs", len(gets), len(groups), len(puts))
+        errors = []
+
+        results = await asyncio.gather(*[send('GET', root) for root in groups], return_exceptions=True)
+        for (root, children), result in zip(groups.items(), results):
+            for path in children:
+                try:
+                    if isinstance(result, BaseException):
+                        raise result
+                    value = _slice(result, path[len(root):].strip('/'))
+                except Exception as e:
+                    errors.append(e)
+                    _settle(gets[path], exception=e)
+                else:
+                    _settle(gets[path], result=value)
+
+        results = await asyncio.gather(*[send('PUT', path, value) for path, (value, _) in puts.items()],
+                                       return_exceptions=True)
+        for (_, futures), result in zip(puts.values(), results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+                _settle(futures, exception=result)
+            else:
+                _settle(futures, result=result)
+
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _group(paths) -> Dict[str, List[str]]:
+        """Map each path that needs fetching to the requested paths it covers."""
+        groups: Dict[str, List[str]] = {}
+        # Sorting puts every parent before its children
+        for path in sorted(paths):
+            root = next((root for root in groups if path.startswith(root + '/')), None)
+            groups.setdefault(root or path, []).append(path)
+        return groups
+
+
+def _slice(data: Any, subpath: str) -> Any:
+    """Pick a child out of a fetched subtree, the same way the router resolves paths."""
+    if not subpath:
+        return data
+    for part in subpath.split('/'):
+        if isinstance(data, list):
+            if part.isdigit():
+                data = data[int(part)]
+            else:
+                matches = [item for item in data if isinstance(item, dict) and item.get('_id_') == part]
+                if not matches:
+                    raise KeyError(part)
+                data = matches[0]
+        else:
+            data = data[part]
+    return data
+
+
+def _settle(futures: List[asyncio.Future], result: Any = None, exception: BaseException = None):
+    for future in futures:
+        if future.done():
+            continue
+        if exception is not None:
+            future.set_exception(exception)
+            # The error is re-raised from `run`, so don't warn if nobody looks at the future
+            future.exception()
+        else:
+            future.set_result(result)
@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional
+
+from cradlepoint.wan import WanDevice, WanDeviceCollection
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from cradlepoint.api import CradlepointRouter
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+Subscriber = Callable[[str, WanDevice], Awaitable[None]]
+
+
+class WanDiscovery(LoggingMixin):
+    """Keeps a `WanDeviceCollection` in step with `status/wan/devices` on the router.
+
+    Each `poll` diffs the router's devices against the ones we know by name. A device whose rule ID,
+    iface, port or sim changed (say after a SIM swap or modem reset) is updated in place and
+    re-indexed, so anything holding it writes to the new rule. Devices whose identity is unchanged
+    are left alone. Subscribers are awaited with `(event, device)` for every add, remove and change.
+    """
+    def __init__(self, cradlepoint: 'CradlepointRouter', interval: float = 30.0):
+        self.api = cradlepoint
+        self.interval = interval
+        self.devices = WanDeviceCollection([])
+        self.by_name: Dict[str, WanDevice] = {}
+        self.subscribers: List[Subscriber] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self, func: Subscriber):
+        self.subscribers.append(func)
+
+    async def poll(self) -> int:
+        """Fetch the devices once and apply the differences. Returns how many events were published."""
+        current = await self.api.status.wan.devices()
+        events = []
+        for name, status in current.items():
+            device = self.by_name.get(name)
+            if device is None:
+                device = self.by_name[name] = WanDevice(self.api, name=name, status=status)
+                self.devices.add(device)
+                events.append((ADDED, device))
+                continue
+            before = device.identity()
+            if WanDevice.status_identity(status) != before:
+                device.update_status(status)
+                self.devices.reindex(device)
+                self.info("WAN device %s changed from %s to %s", name, before, device.identity())
+                events.append((CHANGED, device))
+        for name in [name for name in self.by_name if name not in current]:
+            device = self.by_name.pop(name)
+            self.devices.remove(device)
+            events.append((REMOVED, device))
+        for event, device in events:
+            if event != CHANGED:
+                self.debug("WAN device %s %s", device.name, event)
+            await self._publish(event, device)
+        return len(events)
+
+    async def _publish(self, event: str, device: WanDevice):
+        for func in self.subscribers:
+            try:
+                await func(event, device)
+            except Exception:
+                self.error("WAN discovery subscriber failed on %s %s", event, device.name, exc_info=True)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception:
+                self.warning("Could not poll the WAN devices", exc_info=True)
@@ -0,0 +1,93 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from cradlepoint.api import CradlepointRouter, Endpoint
+
+Callback = Callable[[Any], Awaitable[None]]
+
+
+def digest(value: Any) -> bytes:
+    """A stable fingerprint of a JSON value, so subtrees can be compared without keeping old copies around."""
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+class RouterMirror(LoggingMixin):
+    """A local copy of selected router subtrees, kept fresh by a periodic sweep.
+
+    ```
+    mirror = api.mirror(interval=10)
+    mirror.watch(api.config.wan.rules2, on_rules_changed)
+    await mirror.sweep()
+    mirror.start()
+    rules = mirror.get(api.config.wan.rules2)
+    ```
+
+    Every sweep fetches all watched paths in one batch and hashes each subtree. Callbacks are awaited
+    with the new value only when a subtree's hash changed, so changes made on the router (by hand or
+    by its own failover logic) are noticed within `interval` seconds without anyone re-reading them.
+    """
+    def __init__(self, api: 'CradlepointRouter', interval: float = 10.0):
+        self.api = api
+        self.interval = interval
+        self.values: Dict[str, Any] = {}
+        self.digests: Dict[str, bytes] = {}
+        self.callbacks: Dict[str, List[Callback]] = {}
+        self.sweep_started_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def watch(self, path: 'Endpoint', callback: Optional[Callback] = None):
+        """Mirror `path`, optionally calling `callback` with its value whenever it changes."""
+        callbacks = self.callbacks.setdefault(str(path), [])
+        if callback is not None:
+            callbacks.append(callback)
+
+    def get(self, path: 'Endpoint') -> Any:
+        """The value of a watched path as of the last sweep. Raises KeyError if it hasn't been fetched."""
+        return self.values[str(path)]
+
+    async def sweep(self) -> List[str]:
+        """Fetch every watched path and run the callbacks for those that changed. Returns the changed paths."""
+        self.sweep_started_at = asyncio.get_running_loop().time()
+        async with self.api.batch() as batch:
+            futures = {path: batch.get(path) for path in self.callbacks}
+        changed = []
+        for path, future in futures.items():
+            value = future.result()
+            fingerprint = digest(value)
+            if fingerprint == self.digests.get(path):
+                continue
+            self.values[path] = value
+            self.digests[path] = fingerprint
+            changed.append(path)
+        for path in changed:
+            self.debug("Mirrored %s changed", path)
+            for callback in self.callbacks[path]:
+                try:
+                    await callback(self.values[path])
+                except Exception:
+                    self.error("Mirror callback for %s failed", path, exc_info=True)
+        return changed
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception:
+                self.warning("Could not sweep the mirrored router state", exc_info=True)
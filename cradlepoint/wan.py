@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: Unlicense
 
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from warnings import warn
 
@@ -9,6 +9,8 @@ from cradlepoint.util import asyncproperty
 if TYPE_CHECKING:
     from cradlepoint.api import CradlepointRouter
 
+INDEXED_KEYS = ('iface', 'port', 'sim')
+
 
 class WanDevice:
     def __init__(self, cradlepoint: 'CradlepointRouter', id: str = None, name: Optional[str]=None, status: Optional[dict]=None, config: Optional[dict]=None):
@@ -26,17 +28,43 @@ class WanDevice:
         self._config_ix = None
 
     @classmethod
-    async def from_api(cls, cradlepoint: 'CradlepointRouter') -> List['WanDevice']:
+    async def from_api(cls, cradlepoint: 'CradlepointRouter') -> 'WanDeviceCollection':
         devices = []
         wan_devices = await cradlepoint.status.wan.devices()
         for name, status in wan_devices.items():
             devices.append(cls(cradlepoint, name=name, status=status))
         return WanDeviceCollection(devices)
 
+    @property
+    def name(self) -> Optional[str]:
+        return self._name
+
+    @property
+    def info(self) -> dict:
+        """The `info` section of the last loaded status."""
+        return self._status['info'] if self._status else {}
+
+    def identity(self) -> Tuple[str, Any, Any, Any]:
+        """The rule ID and the indexed info, which change when the modem re-enumerates."""
+        info = self.info
+        return (self.id,) + tuple(info.get(key) for key in INDEXED_KEYS)
+
+    @staticmethod
+    def status_identity(status: dict) -> Tuple[str, Any, Any, Any]:
+        """`identity` for a device status fetched from the router."""
+        info = status.get('info', {})
+        return (status['config']['_id_'],) + tuple(info.get(key) for key in INDEXED_KEYS)
+
+    def update_status(self, status: dict):
+        self._status = status
+        self.id = status['config']['_id_']
+
     async def matches_filter(self, **kwargs):
+        info = None
         for key, val in kwargs.items():
-            if key in ('iface', 'port', 'sim'):
-                info = (await self.status())['info']
+            if key in INDEXED_KEYS:
+                if info is None:
+                    info = (await self.status())['info']
                 if key not in info:
                     return False
                 if info[key] != val:
@@ -66,22 +94,57 @@ class WanDevice:
         
 
 class WanDeviceCollection:
+    """WAN devices, indexed by the `iface`, `port` and `sim` in their status info.
+
+    Filtering on those keys is a dictionary lookup rather than a scan. Every device must have its
+    status loaded; call `reindex` after a device's status changes.
+    """
     def __init__(self, wans):
-        self.wans = wans
+        self.wans = []
+        self._index: Dict[Tuple[str, Any], List[WanDevice]] = {}
+        self._keys: Dict[WanDevice, List[Tuple[str, Any]]] = {}
+        for wan in wans:
+            self.add(wan)
 
     @property
     def all(self):
         return self.wans
 
-    async def filter(self, **kwargs):
-        results = []
-        for wan in self.wans:
-            if await wan.matches_filter(**kwargs):
-                results.append(wan)
-        return results
+    def add(self, wan: WanDevice):
+        self.wans.append(wan)
+        self._index_device(wan)
+
+    def remove(self, wan: WanDevice):
+        self.wans.remove(wan)
+        self._unindex_device(wan)
+
+    def reindex(self, wan: WanDevice):
+        self._unindex_device(wan)
+        self._index_device(wan)
+
+    def _index_device(self, wan: WanDevice):
+        info = wan.info
+        keys = self._keys[wan] = [(key, info[key]) for key in INDEXED_KEYS if key in info]
+        for key in keys:
+            self._index.setdefault(key, []).append(wan)
+
+    def _unindex_device(self, wan: WanDevice):
+        for key in self._keys.pop(wan, []):
+            self._index[key].remove(wan)
+            if not self._index[key]:
+                del self._index[key]
+
+    def filter(self, **kwargs) -> List[WanDevice]:
+        results = None
+        for key, val in kwargs.items():
+            if key not in INDEXED_KEYS:
+                continue
+            matches = self._index.get((key, val), [])
+            results = matches if results is None else [wan for wan in results if wan in matches]
+        return list(self.wans if results is None else results)
 
-    async def filter_one(self, on_multiple='warn', **kwargs):
-        results = await self.filter(**kwargs)
+    def filter_one(self, on_multiple='warn', **kwargs) -> Optional[WanDevice]:
+        results = self.filter(**kwargs)
         if len(results) > 1:
             if on_multiple == 'raise':
                 raise ValueError(f"Expected 1 or 0 results, got {len(results)}")
@@ -90,5 +153,3 @@ class WanDeviceCollection:
         elif len(results) == 0:
             return None
         return results[0]
- 
-    
\ No newline at end of file
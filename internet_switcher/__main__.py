@@ -1,14 +1,36 @@
 # SPDX-License-Identifier: Unlicense
 
+# Imported first, so startup is timed from as early as possible
+from internet_switcher.startup import PROCESS_STARTED  # noqa: F401
+
+import argparse
 import asyncio
+import os
 
 from internet_switcher.core import InternetSwitcher
-
-import logging
+from internet_switcher.util.logging import setup_logging
 
 
 if __name__ == '__main__':
-    logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-    logging.basicConfig()
-    asyncio.run(InternetSwitcher.main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(prog='internet_switcher')
+    parser.add_argument('--site', dest='sites', metavar='CONFIG', action='append',
+                        help="Supervise the site configured in this file. Repeat for more sites.")
+    parser.add_argument('--log-level', default=os.getenv('LOG_LEVEL', 'INFO'),
+                        help="Root log level, e.g. DEBUG or WARNING (default $LOG_LEVEL or INFO)")
+    parser.add_argument('--log-format', choices=('json', 'text'), default=os.getenv('LOG_FORMAT', 'json'),
+                        help="Write logs as JSON lines or plain text (default $LOG_FORMAT or json)")
+    args = parser.parse_args()
+
+    listener = setup_logging(args.log_level, args.log_format)
+    try:
+        if args.sites:
+            # Only multi-site supervision needs the router client up front
+            from internet_switcher.supervisor import Supervisor
+            asyncio.run(Supervisor.main(args.sites))
+        else:
+            asyncio.run(InternetSwitcher.main())
+    except asyncio.CancelledError:
+        # Stopped by SIGTERM, after cleaning up
+        pass
+    finally:
+        listener.stop()
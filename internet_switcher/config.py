@@ -16,9 +16,74 @@ class Config:
         'cradlepoint_port',
         'cradlepoint_username',
         'cradlepoint_password',
+        'cradlepoint_pool_size',
+        'cradlepoint_keepalive_timeout',
+        'cradlepoint_dns_cache_ttl',
+        'cradlepoint_force_close',
+        'cradlepoint_connect_timeout',
+        'cradlepoint_read_timeout',
+        'cradlepoint_keep_warm',
         'starlink_ip_address',
         'starlink_port',
-        'ignore_errors'
+        'starlink_timeout',
+        'starlink_reconnect_after',
+        'starlink_max_backoff',
+        'starlink_unreachable_after',
+        'starlink_min_interval',
+        'starlink_max_interval',
+        'starlink_backoff',
+        'starlink_degraded_drop_rate',
+        'starlink_stable_after',
+        'predictive_window',
+        'predictive_enter_drop_rate',
+        'predictive_exit_drop_rate',
+        'predictive_obstructed_drop_rate',
+        'predictive_latency_factor',
+        'predictive_baseline_window',
+        'data_aware_min_stable_after',
+        'data_aware_max_stable_after',
+        'data_aware_flap_window',
+        'data_aware_expensive_rate',
+        'data_aware_usage_window',
+        'data_aware_usage_interval',
+        'ignore_errors',
+        'rule_refresh_interval',
+        'discovery_interval',
+        'stats_interval',
+        'retry_delay',
+        'max_retry_delay',
+        'max_retries',
+        'config_watch_interval',
+        'history_size',
+        'decision_policy',
+        'trace_path',
+        'history_db',
+        'history_flush_interval',
+        'ha_mode',
+        'ha_lease_path',
+        'ha_interval',
+        'ha_ttl',
+        'ha_instance_id',
+        'wan_starlink',
+        'wan_cellular',
+        'wan_ranking',
+        'wan_preference',
+        'wan_max_loss',
+        'probe_targets',
+        'probe_paths',
+        'probe_interval',
+        'probe_timeout',
+        'probe_window',
+        'probe_loss',
+        'probe_recover_loss',
+        'profiling_enabled',
+        'profiling_lag_threshold',
+        'profiling_keep',
+        'profiling_signal',
+        'metrics_host',
+        'metrics_port',
+        'config_path',
+        'env_loaded'
     )
 
     def __init__(self):
@@ -26,9 +91,82 @@ class Config:
         self.cradlepoint_port = '80'
         self.cradlepoint_username = 'admin'
         self.cradlepoint_password = 'admin'
+        self.cradlepoint_pool_size = 4
+        self.cradlepoint_keepalive_timeout = 60.0
+        self.cradlepoint_dns_cache_ttl = 300
+        self.cradlepoint_force_close = False
+        self.cradlepoint_connect_timeout = 2.0
+        self.cradlepoint_read_timeout = 5.0
+        self.cradlepoint_keep_warm = True
         self.starlink_ip_address = '192.168.100.1'
         self.starlink_port = '9200'
+        self.starlink_timeout = 1.0
+        self.starlink_reconnect_after = 3
+        self.starlink_max_backoff = 30.0
+        self.starlink_unreachable_after = 2.0
+        self.starlink_min_interval = 0.25
+        # Probing backs off to this while the dish is steady; an outage takes up to this long to notice.
+        # 0.5 costs about 40 ms of mean detection for a quarter fewer wakeups than a fixed 0.25 (see
+        # benchmarks/monitor_wakeups.py); set it to starlink_min_interval to always probe at the fastest rate
+        self.starlink_max_interval = 0.5
+        self.starlink_backoff = 1.5
+        self.starlink_degraded_drop_rate = 0.05
+        self.starlink_stable_after = 15.0
+        self.predictive_window = 3.0
+        self.predictive_enter_drop_rate = 0.25
+        self.predictive_exit_drop_rate = 0.05
+        self.predictive_obstructed_drop_rate = 0.1
+        self.predictive_latency_factor = 3.0
+        self.predictive_baseline_window = 300.0
+        self.data_aware_min_stable_after = 5.0
+        self.data_aware_max_stable_after = 240.0
+        self.data_aware_flap_window = 900.0
+        self.data_aware_expensive_rate = 125_000.0
+        self.data_aware_usage_window = 120.0
+        self.data_aware_usage_interval = 10.0
         self.ignore_errors = True
+        self.rule_refresh_interval = 10.0
+        self.discovery_interval = 30.0
+        self.stats_interval = 30.0
+        self.retry_delay = 1.0
+        self.max_retry_delay = 30.0
+        # Failed switches in a row before the switcher gives up and stops (to be restarted); 0 retries forever
+        self.max_retries = 10
+        self.config_watch_interval = 5.0
+        self.history_size = 200_000
+        self.decision_policy = 'connected'
+        self.trace_path = ''
+        self.history_db = ''
+        self.history_flush_interval = 5.0
+        self.ha_mode = ''
+        self.ha_lease_path = ''
+        self.ha_interval = 0.1
+        # Router mode only: the lease is renewed every ttl / 3 with a config write, and a standby takes
+        # over between 2/3 and 5/3 of ttl after the leader dies
+        self.ha_ttl = 30.0
+        self.ha_instance_id = ''
+        self.wan_starlink = 'iface=eth0.1'
+        self.wan_cellular = 'sim=sim1'
+        self.wan_ranking = False
+        self.wan_preference = ''
+        self.wan_max_loss = 0.5
+        self.probe_targets = ''
+        # No default: without a source address bound to the Starlink WAN, probes would go out over
+        # whichever WAN the router prefers, i.e. cellular after a failover
+        self.probe_paths = ''
+        self.probe_interval = 1.0
+        self.probe_timeout = 1.0
+        self.probe_window = 10.0
+        self.probe_loss = 0.5
+        self.probe_recover_loss = 0.1
+        self.profiling_enabled = False
+        self.profiling_lag_threshold = 0.1
+        self.profiling_keep = 50
+        self.profiling_signal = 'SIGUSR1'
+        self.metrics_host = '127.0.0.1'
+        self.metrics_port = 0
+        self.config_path = None
+        self.env_loaded = False
 
     @classmethod
     def load(cls):
@@ -40,6 +178,15 @@ class Config:
         config.set_from_env()
         return config
 
+    def reload(self) -> 'Config':
+        """Load a fresh copy of this config from the same sources it was loaded from."""
+        config = type(self)()
+        if self.config_path is not None:
+            config.set_from_config(self.config_path)
+        if self.env_loaded:
+            config.set_from_env()
+        return config
+
     @classmethod
     def from_env(cls):
         config = cls()
@@ -51,9 +198,73 @@ class Config:
         self.cradlepoint_port = os.getenv('CRADLEPOINT_PORT', self.cradlepoint_port)
         self.cradlepoint_username = os.getenv('CRADLEPOINT_USERNAME', self.cradlepoint_username)
         self.cradlepoint_password = os.getenv('CRADLEPOINT_PASSWORD', self.cradlepoint_password)
+        self.cradlepoint_pool_size = int(os.getenv('CRADLEPOINT_POOL_SIZE', self.cradlepoint_pool_size))
+        self.cradlepoint_keepalive_timeout = float(os.getenv('CRADLEPOINT_KEEPALIVE_TIMEOUT', self.cradlepoint_keepalive_timeout))
+        self.cradlepoint_dns_cache_ttl = int(os.getenv('CRADLEPOINT_DNS_CACHE_TTL', self.cradlepoint_dns_cache_ttl))
+        self.cradlepoint_force_close = try_bool(os.getenv('CRADLEPOINT_FORCE_CLOSE', self.cradlepoint_force_close), self.cradlepoint_force_close)
+        self.cradlepoint_connect_timeout = float(os.getenv('CRADLEPOINT_CONNECT_TIMEOUT', self.cradlepoint_connect_timeout))
+        self.cradlepoint_read_timeout = float(os.getenv('CRADLEPOINT_READ_TIMEOUT', self.cradlepoint_read_timeout))
+        self.cradlepoint_keep_warm = try_bool(os.getenv('CRADLEPOINT_KEEP_WARM', self.cradlepoint_keep_warm), self.cradlepoint_keep_warm)
         self.starlink_ip_address = os.getenv('STARLINK_IP_ADDRESS', self.starlink_ip_address)
         self.starlink_port = os.getenv('STARLINK_PORT', self.starlink_port)
+        self.starlink_timeout = float(os.getenv('STARLINK_TIMEOUT', self.starlink_timeout))
+        self.starlink_reconnect_after = int(os.getenv('STARLINK_RECONNECT_AFTER', self.starlink_reconnect_after))
+        self.starlink_max_backoff = float(os.getenv('STARLINK_MAX_BACKOFF', self.starlink_max_backoff))
+        self.starlink_unreachable_after = float(os.getenv('STARLINK_UNREACHABLE_AFTER', self.starlink_unreachable_after))
+        self.starlink_min_interval = float(os.getenv('STARLINK_MIN_INTERVAL', self.starlink_min_interval))
+        self.starlink_max_interval = float(os.getenv('STARLINK_MAX_INTERVAL', self.starlink_max_interval))
+        self.starlink_backoff = float(os.getenv('STARLINK_BACKOFF', self.starlink_backoff))
+        self.starlink_degraded_drop_rate = float(os.getenv('STARLINK_DEGRADED_DROP_RATE', self.starlink_degraded_drop_rate))
+        self.starlink_stable_after = float(os.getenv('STARLINK_STABLE_AFTER', self.starlink_stable_after))
+        self.predictive_window = float(os.getenv('PREDICTIVE_WINDOW', self.predictive_window))
+        self.predictive_enter_drop_rate = float(os.getenv('PREDICTIVE_ENTER_DROP_RATE', self.predictive_enter_drop_rate))
+        self.predictive_exit_drop_rate = float(os.getenv('PREDICTIVE_EXIT_DROP_RATE', self.predictive_exit_drop_rate))
+        self.predictive_obstructed_drop_rate = float(os.getenv('PREDICTIVE_OBSTRUCTED_DROP_RATE', self.predictive_obstructed_drop_rate))
+        self.predictive_latency_factor = float(os.getenv('PREDICTIVE_LATENCY_FACTOR', self.predictive_latency_factor))
+        self.predictive_baseline_window = float(os.getenv('PREDICTIVE_BASELINE_WINDOW', self.predictive_baseline_window))
+        self.data_aware_min_stable_after = float(os.getenv('DATA_AWARE_MIN_STABLE_AFTER', self.data_aware_min_stable_after))
+        self.data_aware_max_stable_after = float(os.getenv('DATA_AWARE_MAX_STABLE_AFTER', self.data_aware_max_stable_after))
+        self.data_aware_flap_window = float(os.getenv('DATA_AWARE_FLAP_WINDOW', self.data_aware_flap_window))
+        self.data_aware_expensive_rate = float(os.getenv('DATA_AWARE_EXPENSIVE_RATE', self.data_aware_expensive_rate))
+        self.data_aware_usage_window = float(os.getenv('DATA_AWARE_USAGE_WINDOW', self.data_aware_usage_window))
+        self.data_aware_usage_interval = float(os.getenv('DATA_AWARE_USAGE_INTERVAL', self.data_aware_usage_interval))
         self.ignore_errors = try_bool(os.getenv('IGNORE_ERRORS', self.ignore_errors), self.ignore_errors)
+        self.rule_refresh_interval = float(os.getenv('RULE_REFRESH_INTERVAL', self.rule_refresh_interval))
+        self.discovery_interval = float(os.getenv('DISCOVERY_INTERVAL', self.discovery_interval))
+        self.stats_interval = float(os.getenv('STATS_INTERVAL', self.stats_interval))
+        self.retry_delay = float(os.getenv('RETRY_DELAY', self.retry_delay))
+        self.max_retry_delay = float(os.getenv('MAX_RETRY_DELAY', self.max_retry_delay))
+        self.max_retries = int(os.getenv('MAX_RETRIES', self.max_retries))
+        self.config_watch_interval = float(os.getenv('CONFIG_WATCH_INTERVAL', self.config_watch_interval))
+        self.history_size = int(os.getenv('HISTORY_SIZE', self.history_size))
+        self.decision_policy = os.getenv('DECISION_POLICY', self.decision_policy)
+        self.trace_path = os.getenv('TRACE_PATH', self.trace_path)
+        self.history_db = os.getenv('HISTORY_DB', self.history_db)
+        self.history_flush_interval = float(os.getenv('HISTORY_FLUSH_INTERVAL', self.history_flush_interval))
+        self.ha_mode = os.getenv('HA_MODE', self.ha_mode)
+        self.ha_lease_path = os.getenv('HA_LEASE_PATH', self.ha_lease_path)
+        self.ha_interval = float(os.getenv('HA_INTERVAL', self.ha_interval))
+        self.ha_ttl = float(os.getenv('HA_TTL', self.ha_ttl))
+        self.ha_instance_id = os.getenv('HA_INSTANCE_ID', self.ha_instance_id)
+        self.wan_starlink = os.getenv('WAN_STARLINK', self.wan_starlink)
+        self.wan_cellular = os.getenv('WAN_CELLULAR', self.wan_cellular)
+        self.wan_ranking = try_bool(os.getenv('WAN_RANKING', self.wan_ranking), self.wan_ranking)
+        self.wan_preference = os.getenv('WAN_PREFERENCE', self.wan_preference)
+        self.wan_max_loss = float(os.getenv('WAN_MAX_LOSS', self.wan_max_loss))
+        self.probe_targets = os.getenv('PROBE_TARGETS', self.probe_targets)
+        self.probe_paths = os.getenv('PROBE_PATHS', self.probe_paths)
+        self.probe_interval = float(os.getenv('PROBE_INTERVAL', self.probe_interval))
+        self.probe_timeout = float(os.getenv('PROBE_TIMEOUT', self.probe_timeout))
+        self.probe_window = float(os.getenv('PROBE_WINDOW', self.probe_window))
+        self.probe_loss = float(os.getenv('PROBE_LOSS', self.probe_loss))
+        self.probe_recover_loss = float(os.getenv('PROBE_RECOVER_LOSS', self.probe_recover_loss))
+        self.profiling_enabled = try_bool(os.getenv('PROFILING_ENABLED', self.profiling_enabled), self.profiling_enabled)
+        self.profiling_lag_threshold = float(os.getenv('PROFILING_LAG_THRESHOLD', self.profiling_lag_threshold))
+        self.profiling_keep = int(os.getenv('PROFILING_KEEP', self.profiling_keep))
+        self.profiling_signal = os.getenv('PROFILING_SIGNAL', self.profiling_signal)
+        self.metrics_host = os.getenv('METRICS_HOST', self.metrics_host)
+        self.metrics_port = int(os.getenv('METRICS_PORT', self.metrics_port))
+        self.env_loaded = True
 
         return self
 
@@ -67,6 +278,7 @@ class Config:
         parser = configparser.ConfigParser()
         with open(config_path, 'r') as f:
             parser.read_file(f)
+        self.config_path = config_path
 
         if 'cradlepoint' in parser:
             cradlepoint_config = parser['cradlepoint']
@@ -74,15 +286,99 @@ class Config:
             self.cradlepoint_port = cradlepoint_config.get('port', self.cradlepoint_port)
             self.cradlepoint_username = cradlepoint_config.get('username', self.cradlepoint_username)
             self.cradlepoint_password = cradlepoint_config.get('password', self.cradlepoint_password)
+            self.cradlepoint_pool_size = cradlepoint_config.getint('pool_size', self.cradlepoint_pool_size)
+            self.cradlepoint_keepalive_timeout = cradlepoint_config.getfloat('keepalive_timeout', self.cradlepoint_keepalive_timeout)
+            self.cradlepoint_dns_cache_ttl = cradlepoint_config.getint('dns_cache_ttl', self.cradlepoint_dns_cache_ttl)
+            self.cradlepoint_force_close = cradlepoint_config.getboolean('force_close', self.cradlepoint_force_close)
+            self.cradlepoint_connect_timeout = cradlepoint_config.getfloat('connect_timeout', self.cradlepoint_connect_timeout)
+            self.cradlepoint_read_timeout = cradlepoint_config.getfloat('read_timeout', self.cradlepoint_read_timeout)
+            self.cradlepoint_keep_warm = cradlepoint_config.getboolean('keep_warm', self.cradlepoint_keep_warm)
 
         if 'starlink' in parser:
             starlink_config = parser['starlink']
             self.starlink_ip_address = starlink_config.get('ip_address', self.starlink_ip_address)
             self.starlink_port = starlink_config.get('port', self.starlink_port)
+            self.starlink_timeout = starlink_config.getfloat('timeout', self.starlink_timeout)
+            self.starlink_reconnect_after = starlink_config.getint('reconnect_after', self.starlink_reconnect_after)
+            self.starlink_max_backoff = starlink_config.getfloat('max_backoff', self.starlink_max_backoff)
+            self.starlink_unreachable_after = starlink_config.getfloat('unreachable_after', self.starlink_unreachable_after)
+            self.starlink_min_interval = starlink_config.getfloat('min_interval', self.starlink_min_interval)
+            self.starlink_max_interval = starlink_config.getfloat('max_interval', self.starlink_max_interval)
+            self.starlink_backoff = starlink_config.getfloat('backoff', self.starlink_backoff)
+            self.starlink_degraded_drop_rate = starlink_config.getfloat('degraded_drop_rate', self.starlink_degraded_drop_rate)
+            self.starlink_stable_after = starlink_config.getfloat('stable_after', self.starlink_stable_after)
+
+        if 'predictive' in parser:
+            predictive_config = parser['predictive']
+            self.predictive_window = predictive_config.getfloat('window', self.predictive_window)
+            self.predictive_enter_drop_rate = predictive_config.getfloat('enter_drop_rate', self.predictive_enter_drop_rate)
+            self.predictive_exit_drop_rate = predictive_config.getfloat('exit_drop_rate', self.predictive_exit_drop_rate)
+            self.predictive_obstructed_drop_rate = predictive_config.getfloat('obstructed_drop_rate', self.predictive_obstructed_drop_rate)
+            self.predictive_latency_factor = predictive_config.getfloat('latency_factor', self.predictive_latency_factor)
+            self.predictive_baseline_window = predictive_config.getfloat('baseline_window', self.predictive_baseline_window)
+
+        if 'data_aware' in parser:
+            data_aware_config = parser['data_aware']
+            self.data_aware_min_stable_after = data_aware_config.getfloat('min_stable_after', self.data_aware_min_stable_after)
+            self.data_aware_max_stable_after = data_aware_config.getfloat('max_stable_after', self.data_aware_max_stable_after)
+            self.data_aware_flap_window = data_aware_config.getfloat('flap_window', self.data_aware_flap_window)
+            self.data_aware_expensive_rate = data_aware_config.getfloat('expensive_rate', self.data_aware_expensive_rate)
+            self.data_aware_usage_window = data_aware_config.getfloat('usage_window', self.data_aware_usage_window)
+            self.data_aware_usage_interval = data_aware_config.getfloat('usage_interval', self.data_aware_usage_interval)
+
+        if 'probes' in parser:
+            probes_config = parser['probes']
+            self.probe_targets = probes_config.get('targets', self.probe_targets)
+            self.probe_paths = probes_config.get('paths', self.probe_paths)
+            self.probe_interval = probes_config.getfloat('interval', self.probe_interval)
+            self.probe_timeout = probes_config.getfloat('timeout', self.probe_timeout)
+            self.probe_window = probes_config.getfloat('window', self.probe_window)
+            self.probe_loss = probes_config.getfloat('loss', self.probe_loss)
+            self.probe_recover_loss = probes_config.getfloat('recover_loss', self.probe_recover_loss)
+
+        if 'ha' in parser:
+            ha_config = parser['ha']
+            self.ha_mode = ha_config.get('mode', self.ha_mode)
+            self.ha_lease_path = ha_config.get('lease_path', self.ha_lease_path)
+            self.ha_interval = ha_config.getfloat('interval', self.ha_interval)
+            self.ha_ttl = ha_config.getfloat('ttl', self.ha_ttl)
+            self.ha_instance_id = ha_config.get('instance_id', self.ha_instance_id)
+
+        if 'wan' in parser:
+            wan_config = parser['wan']
+            self.wan_starlink = wan_config.get('starlink', self.wan_starlink)
+            self.wan_cellular = wan_config.get('cellular', self.wan_cellular)
+            self.wan_ranking = wan_config.getboolean('ranking', self.wan_ranking)
+            self.wan_preference = wan_config.get('preference', self.wan_preference)
+            self.wan_max_loss = wan_config.getfloat('max_loss', self.wan_max_loss)
+
+        if 'profiling' in parser:
+            profiling_config = parser['profiling']
+            self.profiling_enabled = profiling_config.getboolean('enabled', self.profiling_enabled)
+            self.profiling_lag_threshold = profiling_config.getfloat('lag_threshold', self.profiling_lag_threshold)
+            self.profiling_keep = profiling_config.getint('keep', self.profiling_keep)
+            self.profiling_signal = profiling_config.get('signal', self.profiling_signal)
+
+        if 'metrics' in parser:
+            metrics_config = parser['metrics']
+            self.metrics_host = metrics_config.get('host', self.metrics_host)
+            self.metrics_port = metrics_config.getint('port', self.metrics_port)
 
         if 'core' in parser:
             core_config = parser['core']
             self.ignore_errors = core_config.getboolean('ignore_errors', self.ignore_errors)
+            self.rule_refresh_interval = core_config.getfloat('rule_refresh_interval', self.rule_refresh_interval)
+            self.discovery_interval = core_config.getfloat('discovery_interval', self.discovery_interval)
+            self.stats_interval = core_config.getfloat('stats_interval', self.stats_interval)
+            self.retry_delay = core_config.getfloat('retry_delay', self.retry_delay)
+            self.max_retry_delay = core_config.getfloat('max_retry_delay', self.max_retry_delay)
+            self.max_retries = core_config.getint('max_retries', self.max_retries)
+            self.config_watch_interval = core_config.getfloat('config_watch_interval', self.config_watch_interval)
+            self.history_size = core_config.getint('history_size', self.history_size)
+            self.decision_policy = core_config.get('decision_policy', self.decision_policy)
+            self.trace_path = core_config.get('trace_path', self.trace_path)
+            self.history_db = core_config.get('history_db', self.history_db)
+            self.history_flush_interval = core_config.getfloat('history_flush_interval', self.history_flush_interval)
 
         return self
 
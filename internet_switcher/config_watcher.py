@@ -0,0 +1,64 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+import configparser
+import os
+from typing import Awaitable, Callable, Optional, Tuple
+
+from internet_switcher.config import Config
+from internet_switcher.util.logging import LoggingMixin
+
+
+class ConfigWatcher(LoggingMixin):
+    """Polls the config file every `interval` seconds and passes a reloaded `Config` to `on_change`.
+
+    Polling is a single `stat` per interval, so it's cheap enough to leave running. A file that
+    fails to parse is logged and ignored; the running config stays in place until it's fixed.
+    """
+    def __init__(self, config: Config, on_change: Callable[[Config], Awaitable[None]], interval: float = 5.0):
+        self.config = config
+        self.on_change = on_change
+        self.interval = interval
+        self.signature = self._stat()
+        self.task: Optional[asyncio.Task] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        if self.config.config_path is None:
+            return None
+        try:
+            stat = os.stat(self.config.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def check(self) -> bool:
+        """Reload the config if the file changed. Returns whether a new config was applied."""
+        signature = self._stat()
+        if signature is None or signature == self.signature:
+            return False
+        self.signature = signature
+        try:
+            config = self.config.reload()
+        except (OSError, ValueError, configparser.Error):
+            self.error("Could not reload %s; keeping the running config", self.config.config_path, exc_info=True)
+            return False
+        self.info("Reloaded %s", self.config.config_path)
+        self.config = config
+        await self.on_change(config)
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception:
+                self.error("Failed to apply the reloaded config", exc_info=True)
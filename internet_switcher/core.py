@@ -1,108 +1,569 @@
 # SPDX-License-Identifier: Unlicense
 
 import asyncio
-from spacex.starlink.aio import AsyncStarlinkDish
+import logging
+import signal
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from cradlepoint.discovery import CHANGED, WanDiscovery
 from cradlepoint.wan import WanDevice
 
 from internet_switcher.config import Config
+from internet_switcher.config_watcher import ConfigWatcher
+from internet_switcher.data_usage import CellularUsage
+from internet_switcher.leader import FileLease, LeaderElection, RouterLease, default_lock_path
+from internet_switcher.dish_connection import ManagedDish
+from internet_switcher.metrics import FAILOVER_SECONDS, ROUTER_DRIFT, SITE, SWITCHES, Instrumentation
+from internet_switcher.outage_store import OutageStore
+from internet_switcher.policies import POLICIES, POLICY_FIELDS, DataAwarePolicy
+from internet_switcher.probes import ProbeEngine, parse_paths, parse_targets
+from internet_switcher.ranking import WanRanking, parse_selector
 from internet_switcher.starlink_monitor import StarlinkMonitor
+from internet_switcher.startup import FIRST_PROBE, PROCESS_STARTED, READY, StartupTimer
+from internet_switcher.util.imports import import_module
 from internet_switcher.util.logging import LoggingMixin
-from cradlepoint.api import CradlepointRouter
+from internet_switcher.wan_rules import WanRuleSnapshot
+from internet_switcher.trace import RecordingDish, TraceWriter
+
+if TYPE_CHECKING:
+    from spacex.starlink.aio import AsyncStarlinkDish
+
+    from cradlepoint.api import CradlepointRouter
+
+# Settings that are only read at startup; changing them in a reloaded config needs a restart
+RESTART_FIELDS = (
+    'cradlepoint_ip_address',
+    'cradlepoint_port',
+    'cradlepoint_username',
+    'cradlepoint_password',
+    'cradlepoint_keepalive_timeout',
+    'cradlepoint_dns_cache_ttl',
+    'cradlepoint_force_close',
+    'starlink_ip_address',
+    'starlink_port',
+    'history_size',
+    'trace_path',
+    'history_db',
+    'ha_mode',
+    'ha_lease_path',
+    'ha_interval',
+    'ha_ttl',
+    'ha_instance_id',
+    'probe_paths',
+    'wan_starlink',
+    'wan_cellular',
+    'wan_ranking',
+    'wan_preference',
+    'wan_max_loss',
+    'profiling_enabled',
+    'profiling_lag_threshold',
+    'profiling_keep',
+    'profiling_signal',
+    'metrics_host',
+    'metrics_port',
+)
+
+# Intervals and timeouts a reloaded config applies to running loops; at zero, those loops would spin
+RELOADED_INTERVALS = (
+    'starlink_timeout',
+    'starlink_max_backoff',
+    'starlink_min_interval',
+    'starlink_max_interval',
+    'retry_delay',
+    'max_retry_delay',
+    'rule_refresh_interval',
+    'discovery_interval',
+    'history_flush_interval',
+    'probe_interval',
+    'probe_timeout',
+)
+# Other durations a reloaded config applies, which can be zero: the watcher and the usage tracking
+# stop at zero, the same as they wouldn't start with it
+RELOADED_DURATIONS = (
+    'starlink_unreachable_after',
+    'config_watch_interval',
+    'data_aware_usage_window',
+    'data_aware_usage_interval',
+    'probe_window',
+)
+
+
+def stop_on_sigterm():
+    """Cancel the current task on SIGTERM, so its cleanup runs (closing the trace, the router session...)."""
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
 
 
 class InternetSwitcher(LoggingMixin):
-    def __init__(self, config: Config):
+    """Keeps the router on Starlink while it's stable and on cellular while it isn't.
+
+    Startup is ordered for the case where the gateway has just come back from a power cut: `connect`
+    only connects to the dish, and `run` starts monitoring it straight away. Without a `cradlepoint`,
+    the router client (and aiohttp with it) is only imported and connected afterwards, retrying
+    until the router answers. Decisions made meanwhile wait in the dispatcher and are applied as
+    soon as the WAN rules are loaded.
+
+    With `ha_mode` set, several instances can run at once and only the elected leader writes to the
+    router. The others keep monitoring the dish and mirroring the router, so when the leader dies,
+    the one that takes over only has to refresh the rules and apply its own latest decision.
+    """
+    def __init__(self, config: Config, starlink: Optional['AsyncStarlinkDish'] = None,
+                 cradlepoint: Optional['CradlepointRouter'] = None):
         self.config = config
-        self.starlink = AsyncStarlinkDish(address=f"{config.starlink_ip_address}:{config.starlink_port}")
-        self.cradlepoint = CradlepointRouter(config)
+        if starlink is None:
+            from spacex.starlink.aio import AsyncStarlinkDish
+            starlink = AsyncStarlinkDish(address=f"{config.starlink_ip_address}:{config.starlink_port}")
+        self.dish = self.starlink = ManagedDish(starlink, timeout=config.starlink_timeout,
+                                                reconnect_after=config.starlink_reconnect_after,
+                                                max_backoff=config.starlink_max_backoff)
+        self.trace = None
+        if config.trace_path:
+            self.trace = TraceWriter(config.trace_path)
+            self.starlink = RecordingDish(self.starlink, self.trace)
         self.running = False
+        self.monitor = None
+        self.rules = None
+        self.cradlepoint = None
+        self.discovery = None
+        self.mirror = None
+        if cradlepoint is not None:
+            self.attach_router(cradlepoint)
+        self.probes = None
+        paths = self.probe_paths(config)
+        if config.probe_targets and paths:
+            self.probes = ProbeEngine(paths, parse_targets(config.probe_targets),
+                                      interval=config.probe_interval, timeout=config.probe_timeout,
+                                      window=config.probe_window)
+        elif config.probe_targets:
+            self.warning("probe_targets is set but no probe path has a source address, so probing is off")
+        self.usage = CellularUsage(config.data_aware_usage_window, config.data_aware_usage_interval)
+        self.outages = None
+        self.epoch = None
+        if config.history_db:
+            self.outages = OutageStore(config.history_db, config.history_flush_interval)
+        self.watcher = ConfigWatcher(config, self.apply_config, config.config_watch_interval)
+        self.startup = StartupTimer()
+        self.election = None
+        self.last_switch_latency = None
+        # The dish change the last write was timed against, so reapplying it isn't timed again
+        self.switched_for: Optional[float] = None
 
     @classmethod
     async def main(cls):
         cls.info("Loading config and initializing")
         config = Config.load()
         switcher = cls(config)
+        switcher.startup.origin = PROCESS_STARTED
+        instrumentation = Instrumentation(config)
+        stop_on_sigterm()
 
         try:
-            cls.info("Testing connections")
-            await switcher.connect()
+            cls.info("Connecting to the dish")
+            await asyncio.gather(instrumentation.start(), switcher.connect())
 
             cls.info("Starting")
             await switcher.run()
         finally:
             cls.info("Closing connections")
             await switcher.close()
+            await instrumentation.stop()
+
+    def attach_router(self, cradlepoint: 'CradlepointRouter'):
+        self.cradlepoint = cradlepoint
+        if self.trace is not None:
+            cradlepoint.trace = self.trace
+        self.discovery = WanDiscovery(cradlepoint, self.config.discovery_interval)
+        self.mirror = cradlepoint.mirror(self.config.rule_refresh_interval)
 
     async def connect(self):
-        """Initiate connections needed to switch Internet connections"""
-        await asyncio.gather(
-            self.starlink.connect(),
-            self.cradlepoint.connect()
-        )
+        """Connect to the dish. The router is connected by `run`, once monitoring has started."""
+        if self.startup.origin is None:
+            self.startup.origin = asyncio.get_running_loop().time()
+        await self.starlink.connect()
+        if self.outages is not None:
+            await self.outages.open()
+        # Maps the event loop clock to wall clock time, for anything that outlives the process
+        self.epoch = time.time() - asyncio.get_running_loop().time()
         self.running = True
 
     async def run(self):
         monitoring_task = asyncio.create_task(self.monitor_starlink())
         self.connections = asyncio.create_task(self.fetch_connections())
-        await monitoring_task
+        if self.config.config_watch_interval > 0:
+            self.watcher.start()
+        if self.outages is not None:
+            self.outages.start()
+        try:
+            await monitoring_task
+        finally:
+            self.connections.cancel()
+            if self.election is not None:
+                # Releasing the lease lets a standby take over straight away
+                await self.election.stop()
+            self.watcher.stop()
+            if self.cradlepoint is not None:
+                self.mirror.stop()
+                self.discovery.stop()
+            self.usage.stop()
+
+    async def connect_router(self):
+        """Create the router client if there isn't one yet, and connect it, retrying until it answers."""
+        if self.cradlepoint is None:
+            api = await import_module('cradlepoint.api')
+            self.attach_router(api.CradlepointRouter(self.config))
+        delay = self.config.retry_delay
+        while True:
+            try:
+                await self.cradlepoint.connect()
+                return
+            except Exception as e:
+                self.warning("Could not connect to the router (%r); retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.config.max_retry_delay)
+
+    @property
+    def leading(self) -> bool:
+        """Whether this instance may write to the router: always, unless it's standing by in HA mode."""
+        return self.election is None or self.election.leading
+
+    def make_election(self) -> Optional[LeaderElection]:
+        config = self.config
+        if not config.ha_mode:
+            return None
+        instance_id = config.ha_instance_id or None
+        if config.ha_mode == 'file':
+            lease = FileLease(config.ha_lease_path or default_lock_path(SITE.get()), instance_id)
+            interval = config.ha_interval
+        elif config.ha_mode == 'router':
+            lease = RouterLease(self.cradlepoint, config.ha_lease_path or None, config.ha_ttl, instance_id)
+            # Each renewal is a persistent router write; see `leader` for what that costs in takeover time
+            interval = max(config.ha_interval, config.ha_ttl / 3)
+        else:
+            raise ValueError(f"Unknown ha_mode {config.ha_mode!r}")
+        return LeaderElection(lease, interval, self.handle_elected)
+
+    async def handle_elected(self):
+        """Take over from the previous leader: refresh the rules, then apply our latest decision."""
+        if self.monitor is None:
+            return
+        try:
+            await self.mirror.sweep()
+        finally:
+            self.monitor.dispatcher.reassert()
 
     async def close(self):
         """Closes the connections"""
         self.running = False
-        await asyncio.gather(
-            self.starlink.close(),
-            self.cradlepoint.close()
-        )
+        await self.starlink.close()
+        if self.cradlepoint is not None:
+            await self.cradlepoint.close()
+        if self.trace is not None:
+            self.trace.close()
+        if self.outages is not None:
+            await self.outages.close()
 
     async def monitor_starlink(self):
-        monitor = StarlinkMonitor(self.starlink)
+        config = self.config
+        monitor = self.monitor = StarlinkMonitor(
+            self.starlink, min_interval=config.starlink_min_interval, max_interval=config.starlink_max_interval,
+            backoff=config.starlink_backoff, degraded_drop_rate=config.starlink_degraded_drop_rate,
+            history_size=config.history_size, policy=self.make_policy(config),
+            unreachable_after=config.starlink_unreachable_after
+        )
+        monitor.dispatcher.retry_delay = config.retry_delay
+        monitor.dispatcher.max_retry_delay = config.max_retry_delay
+        monitor.dispatcher.max_retries = config.max_retries
+        if self.probes is not None:
+            self.probes.start()
         monitor.on_stable(self.handle_stable_connection)
         monitor.on_unstable(self.handle_unstable_connection)
         self.info("Starting Dishy monitoring")
         monitor.start()
+        first_probe = asyncio.create_task(self.time_first_probe(monitor))
         try:
             while self.running:
-                await monitor.wait(30)  # TODO: Set from config
+                await monitor.wait(self.config.stats_interval)
                 stats = monitor.flush_stats()
                 if stats['attempts'] == 0:
                     self.error("The Starlink monitor process does not appear to be attempting status checks.")
                     if not self.config.ignore_errors:
                         raise ConnectionError("The Starlink monitor process does not appear to be attempting status checks.")
-                self.debug(f"Starlink stats:\n\tAttempts:\t{stats['attempts']}\n\tResponses:\t{stats['responses']}\n\tConnected:\t{stats['connected']}")
+                if not self.isEnabledFor(logging.DEBUG):
+                    # The hour-long summaries below sort thousands of samples; skip them unless they're logged
+                    continue
+                self.debug("Starlink stats", **stats)
+                history = monitor.history
+                self.debug("Starlink last hour", uptime=history.uptime(3600), outages=history.outage_count(3600),
+                           latency_p50=history.latency_percentile(50, 3600),
+                           latency_p95=history.latency_percentile(95, 3600))
+                if self.probes is not None:
+                    for name, window in self.probes.windows.items():
+                        self.debug("Probes via %s", name, path=name, loss=window.loss_rate,
+                                   latency_p50=window.latency_percentile(50))
         finally:
             self.debug("Stopping Dishy monitoring")
+            first_probe.cancel()
+            if self.probes is not None:
+                self.probes.stop()
             monitor.stop()
+            await monitor.dispatcher.drain()
+
+    async def time_first_probe(self, monitor: StarlinkMonitor):
+        await monitor.first_check.wait()
+        self.startup.mark(FIRST_PROBE, asyncio.get_running_loop().time())
+
+    def probe_paths(self, config: Config) -> Dict[str, Optional[str]]:
+        """The configured probe paths that are bound to a WAN by their source address."""
+        paths = parse_paths(config.probe_paths)
+        for name in [name for name, source in paths.items() if source is None]:
+            # The default route is whichever WAN the router prefers, so it says nothing about this one
+            self.warning("Probe path %s has no source address; ignoring it", name, path=name)
+            del paths[name]
+        return paths
+
+    def make_policy(self, config: Config):
+        policy = POLICIES[config.decision_policy].from_config(config)
+        if self.probes is not None:
+            if 'starlink' in self.probes.windows:
+                policy.use_probes(self.probes.windows['starlink'], loss=config.probe_loss,
+                                  recover_loss=config.probe_recover_loss)
+            else:
+                self.warning("No 'starlink' probe path is configured, so probes won't affect switching")
+        if isinstance(policy, DataAwarePolicy):
+            policy.use_usage(self.usage)
+        return policy
+
+    def track_usage(self):
+        """Read the cellular data usage only while the policy needs it and the cellular device is known."""
+        needed = (self.usage.device is not None and self.monitor is not None
+                  and isinstance(self.monitor.policy, DataAwarePolicy) and self.usage.interval > 0)
+        if needed and self.usage.task is None:
+            self.usage.start()
+        elif not needed:
+            self.usage.stop()
+
+    async def apply_config(self, config: Config):
+        """Apply a reloaded config to the running switcher, keeping the dish and router connections.
+
+        Everything that can be rejected is built from the new config before anything is changed, so
+        an invalid config is logged and the running one kept as a whole."""
+        old = self.config
+        monitor = self.monitor
+        policy_changed = any(getattr(old, field) != getattr(config, field)
+                             for field in POLICY_FIELDS + ('probe_loss', 'probe_recover_loss'))
+        try:
+            invalid = [field for field in RELOADED_INTERVALS if getattr(config, field) <= 0]
+            if invalid:
+                raise ValueError(f"{', '.join(invalid)} must be positive")
+            negative = [field for field in RELOADED_DURATIONS if getattr(config, field) < 0]
+            if negative:
+                raise ValueError(f"{', '.join(negative)} can't be negative")
+            if config.starlink_min_interval > config.starlink_max_interval:
+                raise ValueError("starlink_min_interval is above starlink_max_interval")
+            if config.starlink_backoff < 1:
+                raise ValueError("starlink_backoff must be at least 1")
+            if config.max_retries < 0:
+                raise ValueError("max_retries can't be negative")
+            if config.decision_policy not in POLICIES:
+                raise ValueError(f"Unknown decision_policy {config.decision_policy!r}")
+            targets = parse_targets(config.probe_targets)
+            policy = self.make_policy(config) if monitor is not None and policy_changed else None
+        except ValueError as e:
+            self.error("Not applying the reloaded config, keeping the running one: %s", e)
+            return
+
+        for field in RESTART_FIELDS:
+            if getattr(old, field) != getattr(config, field):
+                self.warning("%s changed; it will take effect when the switcher restarts", field)
+        self.config = config
+
+        dish = self.dish
+        dish.timeout = config.starlink_timeout
+        dish.reconnect_after = config.starlink_reconnect_after
+        dish.max_backoff = config.starlink_max_backoff
+        if self.cradlepoint is not None:
+            self.cradlepoint.reconfigure(config)
+            self.mirror.interval = config.rule_refresh_interval
+            self.discovery.interval = config.discovery_interval
+        self.watcher.interval = config.config_watch_interval
+        if config.config_watch_interval == 0:
+            self.info("config_watch_interval is 0; no longer watching the config file")
+            self.watcher.stop()
+        self.usage.window = config.data_aware_usage_window
+        self.usage.interval = config.data_aware_usage_interval
+        if self.outages is not None:
+            self.outages.flush_interval = config.history_flush_interval
+        if self.probes is not None:
+            self.probes.targets = targets
+            self.probes.interval = config.probe_interval
+            self.probes.timeout = config.probe_timeout
+            for window in self.probes.windows.values():
+                window.window = config.probe_window
+                if not self.probes.targets:
+                    window.results.clear()
+        elif config.probe_targets:
+            self.warning("probe_targets is now set; probing will start when the switcher restarts")
+
+        if monitor is not None:
+            monitor.min_interval = config.starlink_min_interval
+            monitor.max_interval = config.starlink_max_interval
+            monitor.backoff = config.starlink_backoff
+            monitor.degraded_drop_rate = config.starlink_degraded_drop_rate
+            monitor.unreachable_after = config.starlink_unreachable_after
+            monitor.dispatcher.retry_delay = config.retry_delay
+            monitor.dispatcher.max_retry_delay = config.max_retry_delay
+            monitor.dispatcher.max_retries = config.max_retries
+            if policy is not None:
+                # A new policy starts its stability window over, so only replace it when it changed
+                self.info("Switching to the reconfigured %s policy", config.decision_policy)
+                monitor.policy = policy
+            self.track_usage()
 
     async def fetch_connections(self):
+        """Set up everything that needs the router, starting over with backoff until all of it succeeds.
+
+        Actions wait for this, so it must not finish with an error while the switcher is running."""
+        delay = self.config.retry_delay
+        while True:
+            try:
+                return await self.setup_connections()
+            except Exception as e:
+                self.warning("Could not set up the router connections (%r); retrying in %.1fs", e, delay,
+                             exc_info=True)
+                await self.reset_connections()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.config.max_retry_delay)
+
+    async def reset_connections(self):
+        """Undo a partly finished `setup_connections`, keeping the router client."""
+        if self.election is not None:
+            await self.election.stop()
+            self.election = None
+        if self.cradlepoint is None:
+            return
+        self.mirror.stop()
+        self.discovery.stop()
+        self.usage.stop()
+        self.usage.device = None
+        self.rules = None
+        # Fresh ones, without the watches and subscriptions of the failed attempt
+        self.attach_router(self.cradlepoint)
+
+    async def setup_connections(self):
+        await self.connect_router()
         self.debug("Fetching Ethernet and Cellular connections")
-        devices = await WanDevice.from_api(self.cradlepoint)
-        ethernet, cellular = await asyncio.gather(
-            devices.filter_one(iface='eth0.1'),
-            devices.filter_one(sim='sim1')
-        )
-        self.debug("Connections are ready!")
+        await self.discovery.poll()
+        ethernet, cellular = self.find_connections()
         assert ethernet is not None
         assert  cellular is not None
+        self.rules = self.make_rules(ethernet, cellular)
+        self.rules.follow(self.mirror)
+        self.mirror.watch(self.cradlepoint.config.wan.rules2, self.check_drift)
+        await self.mirror.sweep()
+        self.mirror.start()
+        self.discovery.subscribe(self.handle_wan_change)
+        self.discovery.start()
+        self.usage.device = cellular
+        self.track_usage()
+        self.election = self.make_election()
+        if self.election is not None:
+            await self.election.check()
+            self.election.start()
+            if not self.leading:
+                self.info("Standing by while another instance leads")
+        self.debug("Connections are ready!")
+        self.startup.mark(READY, asyncio.get_running_loop().time())
         return ethernet, cellular
 
+    def find_connections(self) -> Tuple[Optional[WanDevice], Optional[WanDevice]]:
+        devices = self.discovery.devices
+        return (devices.filter_one(**parse_selector(self.config.wan_starlink)),
+                devices.filter_one(**parse_selector(self.config.wan_cellular)))
+
+    def make_rules(self, ethernet: WanDevice, cellular: WanDevice):
+        config = self.config
+        if not config.wan_ranking:
+            return WanRuleSnapshot(ethernet, cellular)
+        preference = [name.strip() for name in config.wan_preference.split(',') if name.strip()]
+        rules = WanRanking(self.discovery.devices, ethernet, cellular, preference=preference,
+                           max_loss=config.wan_max_loss, probes=self.probes.windows if self.probes else None)
+        rules.on_reorder = self.handle_reorder
+        return rules
+
+    async def handle_wan_change(self, event: str, device: WanDevice):
+        """Re-resolve the ethernet and cellular devices after the router's WAN devices change."""
+        ethernet, cellular = self.find_connections()
+        if ethernet is None or cellular is None:
+            self.error("Lost a WAN connection after %s was %s: ethernet=%s, cellular=%s", device.name, event, ethernet, cellular)
+            return
+        current = (self.rules.ethernet, self.rules.cellular)
+        if (ethernet, cellular) != current or (event == CHANGED and device in current):
+            self.info("WAN device %s was %s; reloading the WAN rules", device.name, event)
+            self.rules.retarget(ethernet, cellular)
+            self.usage.device = cellular
+            await self.rules.refresh()
+        if isinstance(self.rules, WanRanking):
+            # Any WAN coming or going can change the best order
+            await self.handle_reorder()
+
+    async def handle_reorder(self):
+        """Apply a new WAN order because the other WANs' health changed, not Starlink's."""
+        if self.leading and self.monitor is not None:
+            self.monitor.dispatcher.reassert()
+
+    async def check_drift(self, rules: list):
+        """Put our preferred WAN back if the router's rules moved away from it."""
+        if not self.leading or not self.rules.drifted:
+            return
+        ROUTER_DRIFT.inc()
+        self.warning("The router prefers %s, but we last asked for %s; reapplying",
+                     'cellular' if self.rules.cellular_preferred else 'ethernet',
+                     'cellular' if self.rules.desired_cellular else 'ethernet')
+        self.monitor.dispatcher.reassert()
+
     async def handle_stable_connection(self):
         self.debug("Handling stabalized connection")
-        ethernet, cellular = await self.connections
-        eth_priority = await ethernet.priority()
-        cell_priority = await cellular.priority()
-        self.debug(f"Priority: eth={eth_priority}, cell={cell_priority}")
-        if eth_priority < cell_priority:
-            self.debug("Doing nothing - ethernet is already prioritized!")
-        self.info("Prioritizing ethernet")
-        await cellular.priority(eth_priority + 1.1)
+        await self.prioritize(cellular=False)
 
     async def handle_unstable_connection(self):
         self.debug("Handling unstable connection")
-        ethernet, cellular = await self.connections
-        eth_priority = await ethernet.priority()
-        cell_priority = await cellular.priority()
-        self.debug(f"Priority: eth={eth_priority}, cell={cell_priority}")
-        if eth_priority > cell_priority:
-            self.debug("Doing nothing - cell is already prioritized!")
-        self.info("Prioritizing cellular")
-        await cellular.priority(eth_priority - 1.1)
+        await self.prioritize(cellular=True)
+
+    def record_transition(self, cellular: bool, reported_at: Optional[float], ack_seconds: Optional[float]):
+        """Add a switch to the outage history, along with the dish state that caused it."""
+        if self.outages is None:
+            return
+        if reported_at is None:
+            reported_at = asyncio.get_running_loop().time()
+        at = self.epoch + reported_at
+        latest = self.monitor.history.latest()
+        if latest is None:
+            self.outages.record(not cellular, at, ack_seconds=ack_seconds)
+            return
+        _, connected, latency, drop_rate, obstructed = latest
+        self.outages.record(not cellular, at, connected=connected, obstructed=obstructed, drop_rate=drop_rate,
+                            latency_ms=latency, ack_seconds=ack_seconds)
+
+    async def prioritize(self, cellular: bool):
+        """Switch to the given WAN, and log how long it took since the dish reported the change."""
+        reported_at = self.monitor.changed_at
+        name = 'cellular' if cellular else 'ethernet'
+        await self.connections
+        if not self.leading:
+            self.debug("Standing by - leaving %s to the leader", name)
+            return
+        if not await self.rules.prioritize(cellular):
+            self.debug("Doing nothing - %s is already prioritized!", name)
+            self.record_transition(cellular, reported_at, None)
+            return
+        SWITCHES.inc(target=name)
+        if reported_at is not None and reported_at != self.switched_for:
+            self.switched_for = reported_at
+            self.last_switch_latency = asyncio.get_running_loop().time() - reported_at
+            self.record_transition(cellular, reported_at, self.last_switch_latency)
+            FAILOVER_SECONDS.observe(self.last_switch_latency, target=name)
+            self.info("Prioritized %s %.0f ms after the dish reported the change", name, self.last_switch_latency * 1000,
+                      target=name, latency=self.last_switch_latency)
+        else:
+            self.record_transition(cellular, reported_at, None)
+            self.info("Prioritized %s", name, target=name)
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Tracks how fast the cellular WAN is using data, from the router's own byte counters."""
+
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Optional, Tuple
+
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from cradlepoint.wan import WanDevice
+
+
+class CellularUsage(LoggingMixin):
+    """Samples the `in` and `out` byte counters in `status/wan/devices/<device>/stats`.
+
+    The counters reset when the modem reconnects, so `total` only ever adds the increase since the
+    last sample. `rate` is the bytes per second over the last `window` seconds, on the event loop
+    clock, or None until there are two samples to compare.
+    """
+    def __init__(self, window: float = 120.0, interval: float = 10.0):
+        self.window = window
+        self.interval = interval
+        self.device: Optional['WanDevice'] = None
+        self.samples: Deque[Tuple[float, int]] = deque()
+        self.total = 0
+        self.last_counter: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def update(self, now: float, counter: int):
+        """Record the device's byte counter as read at `now`."""
+        if self.last_counter is not None:
+            # A counter that went backwards was reset, so all of it is new
+            self.total += counter - self.last_counter if counter >= self.last_counter else counter
+        self.last_counter = counter
+        self.samples.append((now, self.total))
+        cutoff = now - self.window
+        while len(self.samples) > 2 and self.samples[1][0] <= cutoff:
+            self.samples.popleft()
+
+    @property
+    def rate(self) -> Optional[float]:
+        if len(self.samples) < 2:
+            return None
+        (started, first), (ended, last) = self.samples[0], self.samples[-1]
+        return (last - first) / (ended - started) if ended > started else None
+
+    async def poll(self):
+        """Read the counters of `device` once."""
+        if self.device is None:
+            return
+        stats = await self.device.api.status.wan.devices[self.device.name].stats()
+        self.update(asyncio.get_running_loop().time(), int(stats.get('in', 0)) + int(stats.get('out', 0)))
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                self.warning("Could not read the cellular data usage", exc_info=True)
+            await asyncio.sleep(self.interval)
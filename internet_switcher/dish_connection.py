@@ -0,0 +1,99 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+import random
+from typing import TYPE_CHECKING, Optional
+
+from spacex.starlink import CommunicationError, DishStatus
+
+from internet_switcher.metrics import DISH_RECONNECTS
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from spacex.starlink.aio import AsyncStarlinkDish
+
+
+class DishUnreachableError(CommunicationError):
+    """The dish didn't answer in time, or the channel to it is being rebuilt."""
+
+
+class ManagedDish(LoggingMixin):
+    """Wraps the dish client with per-call deadlines and automatic reconnection.
+
+    Any failed or late status request raises `DishUnreachableError`. If the first `connect` fails, or
+    after `reconnect_after` consecutive failures, the gRPC channel is (re)built in the background,
+    retrying with jittered exponential backoff (up to `max_backoff` seconds); requests made
+    meanwhile fail fast.
+    """
+    def __init__(self, dish: 'AsyncStarlinkDish', timeout: float = 1.0, reconnect_after: int = 3,
+                 base_backoff: float = 0.5, max_backoff: float = 30.0):
+        self.dish = dish
+        self.timeout = timeout
+        self.reconnect_after = reconnect_after
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.consecutive_failures = 0
+        self.reconnects = 0
+        self.reconnect_task: Optional[asyncio.Task] = None
+
+    @property
+    def reconnecting(self) -> bool:
+        return self.reconnect_task is not None and not self.reconnect_task.done()
+
+    async def connect(self):
+        """Connect to the dish, waiting at most `timeout` before leaving it to the background.
+
+        Never raises: a dish that's unreachable from the start is an outage like any other, so
+        monitoring has to start anyway and let `StarlinkMonitor` switch to cellular.
+        """
+        self.reconnect_task = asyncio.create_task(self._reconnect(initial=True))
+        try:
+            await asyncio.wait_for(asyncio.shield(self.reconnect_task), self.timeout)
+        except asyncio.TimeoutError:
+            self.warning("The dish isn't answering; monitoring it anyway while connecting in the background")
+
+    async def close(self):
+        if self.reconnect_task is not None:
+            self.reconnect_task.cancel()
+            self.reconnect_task = None
+        await self.dish.close()
+
+    async def fetch_status(self) -> DishStatus:
+        if self.reconnecting:
+            raise DishUnreachableError("Reconnecting to the dish")
+        try:
+            status = await asyncio.wait_for(self.dish.fetch_status(), self.timeout)
+        except Exception as e:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.reconnect_after:
+                self.warning("%d failed requests to the dish; reconnecting", self.consecutive_failures)
+                self.reconnect_task = asyncio.create_task(self._reconnect())
+            raise DishUnreachableError(f"Status request failed: {e!r}") from e
+        self.consecutive_failures = 0
+        return status
+
+    async def _reconnect(self, initial: bool = False):
+        backoff = self.base_backoff
+        close_first = not initial
+        while True:
+            if close_first:
+                try:
+                    await self.dish.close()
+                except Exception:
+                    self.debug("Error closing the old dish channel", exc_info=True)
+            try:
+                await asyncio.wait_for(self.dish.connect(), self.timeout * 5)
+            except Exception:
+                # Full jitter, so many instances don't retry in lockstep
+                wait = random.uniform(0, backoff)
+                self.debug("Reconnect failed; retrying in %.2fs", wait, exc_info=True)
+                await asyncio.sleep(wait)
+                backoff = min(backoff * 2, self.max_backoff)
+                close_first = True
+            else:
+                self.consecutive_failures = 0
+                if not initial:
+                    self.reconnects += 1
+                    DISH_RECONNECTS.inc()
+                self.info("%s to the dish", "Connected" if initial else "Reconnected")
+                return
@@ -0,0 +1,163 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from internet_switcher.metrics import TRANSITION_SECONDS
+from internet_switcher.profiler import PROFILER
+from internet_switcher.util.logging import LoggingMixin
+
+
+def _state_name(stable: bool) -> str:
+    return 'stable' if stable else 'unstable'
+
+
+_ACTION_SPANS = {True: 'action.stable', False: 'action.unstable'}
+
+
+class TransitionTrace:
+    """Timings for one run of the stable or unstable actions, on the event loop clock."""
+    __slots__ = ('stable', 'requested_at', 'started_at', 'finished_at', 'coalesced', 'error')
+
+    def __init__(self, stable: bool, requested_at: float, started_at: float, coalesced: int):
+        self.stable = stable
+        self.requested_at = requested_at
+        self.started_at = started_at
+        self.finished_at = None
+        self.coalesced = coalesced
+        self.error = None
+
+    @property
+    def queued(self) -> float:
+        return self.started_at - self.requested_at
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+    def __repr__(self) -> str:
+        outcome = f"failed with {self.error!r}" if self.error is not None else "done"
+        return (f"<Transition to {_state_name(self.stable)}: queued {self.queued * 1000:.0f} ms, "
+                f"ran {self.duration * 1000:.0f} ms, coalesced {self.coalesced} requests, {outcome}>")
+
+
+class ActionDispatcher(LoggingMixin):
+    """Runs the stable/unstable actions one transition at a time, always towards the latest state.
+
+    `request` only records the desired state, so a burst of transitions while actions are running
+    collapses into (at most) one more run towards whatever was requested last. Running actions are
+    never cancelled by a new request, so a router write is never interrupted halfway. If an action
+    fails, the applied state becomes unknown and the transition is retried with exponential backoff
+    until it succeeds or a different state is requested. After `max_retries` failures in a row (0
+    for no limit), the dispatcher gives up and its task ends with the last error, for whoever is
+    watching it to restart things.
+
+    A `reassert` made while the actions for that same state are running isn't lost: they run once
+    more after they finish.
+    """
+    def __init__(self, retry_delay: float = 1.0, max_retry_delay: float = 30.0, max_retries: int = 10,
+                 history: int = 100):
+        self.actions: Dict[bool, List[Callable[[], Awaitable[None]]]] = {True: [], False: []}
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_retries = max_retries
+        self.failures = 0
+        self.reasserts = 0
+        self.desired: Optional[bool] = None
+        self.applied: Optional[bool] = None
+        self.requested_at: Optional[float] = None
+        self.coalesced = 0
+        self.traces: Deque[TransitionTrace] = deque(maxlen=history)
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.inflight: Optional[asyncio.Future] = None
+
+    def add_action(self, stable: bool, func: Callable[[], Awaitable[None]]):
+        self.actions[stable].append(func)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def request(self, stable: bool):
+        """Ask for the actions for `stable` to be run, unless they're already the last ones applied."""
+        if self.requested_at is None:
+            self.requested_at = asyncio.get_running_loop().time()
+        else:
+            self.coalesced += 1
+        self.desired = stable
+        self.wakeup.set()
+
+    def reassert(self):
+        """Run the actions for the desired state again, e.g. because something else undid them."""
+        if self.desired is None:
+            return
+        # Counted, so a run that was already in flight doesn't mark the state as applied
+        self.reasserts += 1
+        self.applied = None
+        self.request(self.desired)
+
+    def stop(self):
+        """Stop taking new transitions. Anything in flight keeps running; see `drain`."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def drain(self, timeout: float = 5.0):
+        """Wait for the in-flight transition to finish, cancelling it after `timeout` seconds."""
+        if self.inflight is None or self.inflight.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self.inflight), timeout)
+        except asyncio.TimeoutError:
+            self.warning("Gave up waiting for the in-flight transition")
+            self.inflight.cancel()
+        except Exception:
+            pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        delay = self.retry_delay
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.desired is not None and self.desired != self.applied:
+                target = self.desired
+                reasserts = self.reasserts
+                trace = TransitionTrace(target, self.requested_at or loop.time(), loop.time(), self.coalesced)
+                self.requested_at = None
+                self.coalesced = 0
+                actions = self.actions[target]
+                self.debug("Running %d %s actions", len(actions), _state_name(target))
+                span = _ACTION_SPANS[target]
+                self.inflight = asyncio.ensure_future(asyncio.gather(
+                    *[PROFILER.wrap(action(), span, action.__qualname__) for action in actions]))
+                try:
+                    # Shielded so that stopping the dispatcher doesn't interrupt a half-done switch
+                    await asyncio.shield(self.inflight)
+                except Exception as e:
+                    trace.error = e
+                    self.applied = None
+                    self.failures += 1
+                    if self.max_retries and self.failures > self.max_retries:
+                        self.error("%s actions failed %d times in a row; giving up", _state_name(target).capitalize(),
+                                   self.failures, exc_info=True)
+                        raise
+                    self.error("%s actions failed; retrying in %.1fs", _state_name(target).capitalize(), delay,
+                               exc_info=True)
+                else:
+                    if self.reasserts == reasserts:
+                        self.applied = target
+                    self.failures = 0
+                    delay = self.retry_delay
+                finally:
+                    trace.finished_at = loop.time()
+                    self.traces.append(trace)
+                    TRANSITION_SECONDS.observe(trace.finished_at - trace.requested_at, state=_state_name(target))
+                    self.debug("%r", trace)
+                if trace.error is not None:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+            if self.desired == self.applied:
+                self.requested_at = None
+                self.coalesced = 0
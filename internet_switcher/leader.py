@@ -0,0 +1,208 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Leader election between switcher instances, so only one of them writes the WAN priorities.
+
+Two kinds of lease are supported:
+
+- `FileLease`: an exclusive `flock` on a file, for instances on the same machine (or sharing a
+  local filesystem). The kernel drops the lock the moment the holder dies, so a standby polling
+  every 100 ms takes over within about that.
+- `RouterLease`: a heartbeat stored on the Cradlepoint, for instances on different machines. The
+  holder bumps a counter every `interval`; a standby takes over once the value has stopped changing
+  for `ttl` seconds by its own clock, so the instances' clocks don't need to agree.
+
+Every router lease renewal is a write to the router's config store, which the router persists, so
+the switcher renews every `ttl / 3` (10 s with the default 30 s TTL, about 8,600 writes a day) and
+keeps the heartbeat in its own SDK app data entry rather than in any setting the router acts on.
+The price is takeover time: a standby polls at the same interval and takes over `ttl` after it last
+saw the heartbeat change, so between `ttl` minus one interval and `ttl` plus two after the leader
+dies, i.e. 20 to 50 s by default (4.3 s measured with a 6 s TTL), plus the dish monitor's own
+detection time. Lower `ttl` only where that write rate is acceptable.
+"""
+
+import asyncio
+import fcntl
+import os
+import socket
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Tuple
+
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from cradlepoint.api import CradlepointRouter
+
+DEFAULT_LOCK_PATH = '/run/lock/internet-switcher.lock'
+# The router's list of SDK app name/value pairs; without a lease path, the router lease is one of them
+APPDATA_PATH = 'config/system/sdk/appdata'
+APPDATA_NAME = 'internet-switcher-leader'
+
+
+def default_lock_path(site: Optional[str] = None) -> str:
+    """The default file lease, one per site when a supervisor runs several, so each elects its own leader."""
+    if site is None:
+        return DEFAULT_LOCK_PATH
+    base, ext = os.path.splitext(DEFAULT_LOCK_PATH)
+    return f"{base}-{site}{ext}"
+
+
+def default_instance_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease(LoggingMixin):
+    """Something at most one instance can hold at a time."""
+    async def acquire(self) -> bool:
+        """Take or renew the lease, returning whether we hold it now. Called every election interval."""
+        raise NotImplementedError
+
+    async def release(self):
+        """Give the lease up, so a standby can take over without waiting for it to expire."""
+
+
+class FileLease(Lease):
+    def __init__(self, path: str, instance_id: Optional[str] = None):
+        self.path = path
+        self.instance_id = instance_id or default_instance_id()
+        self.fd: Optional[int] = None
+
+    async def acquire(self) -> bool:
+        if self.fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        # Only informational: the lock is what counts
+        os.ftruncate(fd, 0)
+        os.write(fd, self.instance_id.encode() + b'\n')
+        self.fd = fd
+        return True
+
+    async def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class RouterLease(Lease):
+    """A `holder:counter` heartbeat on the router, at `path` or else in the `APPDATA_NAME` app data entry.
+
+    The app data entry is created on first use, and looked up by name on every read, so it doesn't
+    matter if other apps add or remove theirs. The router has no compare-and-swap, so after writing,
+    the value is read back to check no other instance wrote over it. Two instances starting at the
+    same moment can both think they lead for one interval; after that the last writer wins.
+    """
+    def __init__(self, api: 'CradlepointRouter', path: Optional[str] = None, ttl: float = 30.0,
+                 instance_id: Optional[str] = None):
+        self.api = api
+        self.path = path
+        self.ttl = ttl
+        self.instance_id = instance_id or default_instance_id()
+        self.beat = 0
+        self.held = False
+        self.seen: Optional[str] = None
+        self.seen_at: Optional[float] = None
+        self.written_path: Optional[str] = None
+
+    @staticmethod
+    def parse(value) -> Optional[Tuple[str, str]]:
+        holder, sep, beat = str(value or '').rpartition(':')
+        return (holder, beat) if sep else None
+
+    async def read(self) -> Tuple[Optional[str], str]:
+        """The lease's current value, and the path to write it at."""
+        if self.path:
+            return await self.api.get(self.path), self.path
+        entries = await self.api.get(APPDATA_PATH) or []
+        for index, entry in enumerate(entries):
+            if entry.get('name') == APPDATA_NAME:
+                return entry.get('value'), f"{APPDATA_PATH}/{index}/value"
+        self.info("Creating the %s app data entry for the router lease", APPDATA_NAME)
+        await self.api.put(APPDATA_PATH, entries + [{'name': APPDATA_NAME, 'value': ''}])
+        return '', f"{APPDATA_PATH}/{len(entries)}/value"
+
+    async def acquire(self) -> bool:
+        now = asyncio.get_running_loop().time()
+        value, path = await self.read()
+        if value != self.seen:
+            self.seen, self.seen_at = value, now
+        current = self.parse(value)
+        mine = current is not None and current[0] == self.instance_id
+        if self.held and not mine:
+            self.warning("Lost the router lease to %s", current[0] if current else None)
+            self.held = False
+            return False
+        if not mine and current is not None and now - self.seen_at < self.ttl:
+            return False
+
+        self.beat += 1
+        ours = f"{self.instance_id}:{self.beat}"
+        await self.api.put(path, ours)
+        self.written_path = path
+        if not self.held and (await self.read())[0] != ours:
+            return False
+        self.seen, self.seen_at = ours, now
+        self.held = True
+        return True
+
+    async def release(self):
+        if self.held:
+            self.held = False
+            await self.api.put(self.written_path, '')
+
+
+class LeaderElection(LoggingMixin):
+    """Tries to take or renew `lease` every `interval` seconds, and reports when leadership changes.
+
+    `on_elected` is awaited when this instance becomes the leader, and `on_deposed` (if given) when it
+    stops being one, e.g. the router lease was taken over while we couldn't reach the router.
+    """
+    def __init__(self, lease: Lease, interval: float, on_elected: Callable[[], Awaitable[None]],
+                 on_deposed: Optional[Callable[[], Awaitable[None]]] = None):
+        self.lease = lease
+        self.interval = interval
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.leading = False
+        self.task: Optional[asyncio.Task] = None
+
+    async def check(self) -> bool:
+        """Try the lease once, firing the callbacks if leadership changed. Returns whether we lead."""
+        try:
+            held = await self.lease.acquire()
+        except Exception:
+            self.warning("Could not check the leader lease", exc_info=True)
+            held = False
+        callback = None
+        if held and not self.leading:
+            self.leading = True
+            self.info("Elected leader")
+            callback = self.on_elected
+        elif not held and self.leading:
+            self.leading = False
+            self.warning("No longer the leader; standing by")
+            callback = self.on_deposed
+        if callback is not None:
+            try:
+                await callback()
+            except Exception:
+                self.error("Leadership change handler failed", exc_info=True)
+        return self.leading
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.leading:
+            self.leading = False
+            await self.lease.release()
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,253 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Counters, gauges and histograms, exported in the Prometheus text format.
+
+Recording a value is a dictionary lookup and a few additions, so it's cheap enough for the hot
+paths. Under the supervisor, every series also gets a `site` label, taken from the `SITE` context
+variable that each site's tasks inherit. The exporter is an aiohttp server on the switcher's own event loop, so no threads are
+involved. aiohttp is only imported when the server starts, so recording metrics stays cheap to import.
+"""
+
+import asyncio
+import signal
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from internet_switcher.profiler import PROFILER
+from internet_switcher.util.imports import import_module
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+    from internet_switcher.config import Config
+
+
+# The site whose switcher is recording, when running under the supervisor
+SITE: ContextVar[Optional[str]] = ContextVar('site', default=None)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Optional[str], ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values) if value is not None]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.keynames = self.labelnames + ('site',)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[Optional[str], ...]:
+        return tuple(str(labels[name]) for name in self.labelnames) + (SITE.get(),)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + list(self.samples())
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.keynames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (with +Inf last), sum]
+        self.values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = entry
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels) -> int:
+        entry = self.values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.keynames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.keynames, key)} {_format_value(total[0])}"
+            yield f"{self.name}_count{_format_labels(self.keynames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+DISH_FETCH_SECONDS = REGISTRY.register(Histogram(
+    'starlink_fetch_status_seconds', "Time taken to fetch the dish status"))
+ROUTER_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'cradlepoint_request_seconds', "Time taken by Cradlepoint API requests", ('method', 'endpoint')))
+FAILOVER_SECONDS = REGISTRY.register(Histogram(
+    'switcher_failover_seconds', "Time from the dish reporting a change to the router acknowledging the switch",
+    ('target',), buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)))
+TRANSITION_SECONDS = REGISTRY.register(Histogram(
+    'switcher_transition_seconds', "Time from a stability change being requested to its actions finishing",
+    ('state',), buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)))
+SWITCHES = REGISTRY.register(Counter(
+    'switcher_switches_total', "Number of times the preferred WAN was switched", ('target',)))
+ROUTER_DRIFT = REGISTRY.register(Counter(
+    'cradlepoint_drift_total', "Number of times the router's WAN preference was found to differ from ours"))
+DISH_RECONNECTS = REGISTRY.register(Counter(
+    'starlink_reconnects_total', "Number of times the channel to the dish was rebuilt"))
+PROBE_SECONDS = REGISTRY.register(Histogram(
+    'switcher_probe_seconds', "Time taken by successful connectivity probes", ('path', 'kind')))
+PROBE_FAILURES = REGISTRY.register(Counter(
+    'switcher_probe_failures_total', "Number of connectivity probes that failed or timed out", ('path', 'kind')))
+LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    'switcher_loop_lag_seconds', "How late the event loop ran a scheduled callback"))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    'switcher_startup_seconds', "Time from the process starting to each startup milestone", ('phase',)))
+
+
+class LoopLagMonitor:
+    """Measures event loop lag by checking how late a periodic sleep wakes up.
+
+    `on_tick`, if given, is called with the lag after every wakeup.
+    """
+    def __init__(self, interval: float = 1.0, histogram: Histogram = LOOP_LAG_SECONDS,
+                 on_tick: Optional[Callable[[float], None]] = None):
+        self.interval = interval
+        self.histogram = histogram
+        self.on_tick = on_tick
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.histogram.observe(lag)
+            if self.on_tick is not None:
+                self.on_tick(lag)
+
+
+class MetricsServer(LoggingMixin):
+    """Serves `/metrics` from the running event loop."""
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.runner = None
+        self.web = None
+
+    async def start(self):
+        web = self.web = await import_module('aiohttp.web')
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        self.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle(self, request: 'web.Request') -> 'web.Response':
+        return self.web.Response(body=self.registry.render().encode('utf-8'),
+                                 headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+
+class Instrumentation:
+    """The process-wide instrumentation: the loop lag monitor, plus the metrics server if a port is configured.
+
+    With profiling enabled, it also turns on `PROFILER`, ticks the lag monitor often enough for its
+    watchdog, and dumps the slowest spans on `profiling_signal`.
+    """
+    def __init__(self, config: 'Config'):
+        self.profiling = config.profiling_enabled
+        self.signal = getattr(signal, config.profiling_signal) if self.profiling else None
+        if self.profiling:
+            PROFILER.enable(config.profiling_keep, config.profiling_lag_threshold)
+            self.lag_monitor = LoopLagMonitor(config.profiling_lag_threshold / 2, on_tick=PROFILER.observe_lag)
+        else:
+            self.lag_monitor = LoopLagMonitor()
+        self.server = MetricsServer(config.metrics_host, config.metrics_port) if config.metrics_port else None
+
+    async def start(self):
+        self.lag_monitor.start()
+        if self.profiling:
+            PROFILER.start_watchdog(self.lag_monitor.interval)
+            asyncio.get_running_loop().add_signal_handler(self.signal, PROFILER.dump)
+        if self.server is not None:
+            await self.server.start()
+
+    async def stop(self):
+        self.lag_monitor.stop()
+        if self.profiling:
+            asyncio.get_running_loop().remove_signal_handler(self.signal)
+            PROFILER.stop_watchdog()
+        if self.server is not None:
+            await self.server.stop()
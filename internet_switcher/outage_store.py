@@ -0,0 +1,140 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+from internet_switcher.util.logging import LoggingMixin
+
+T = TypeVar('T')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY,
+    at REAL NOT NULL,
+    stable INTEGER NOT NULL,
+    connected INTEGER,
+    obstructed INTEGER,
+    drop_rate REAL,
+    latency_ms REAL,
+    ack_seconds REAL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS transitions_by_state ON transitions (stable, at, ack_seconds, duration);
+"""
+
+INSERT = """
+INSERT INTO transitions (at, stable, connected, obstructed, drop_rate, latency_ms, ack_seconds, duration)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+Row = Tuple[float, int, Optional[int], Optional[int], Optional[float], Optional[float], Optional[float], Optional[float]]
+
+
+class OutageStore(LoggingMixin):
+    """An append-only SQLite log of every switch between Starlink and cellular.
+
+    Each row is one transition: when the dish reported it (wall clock), whether the connection
+    became stable (back to Starlink) or not (to cellular), the dish state at the time, how long the
+    router took to acknowledge the switch, and how long the previous state lasted.
+
+    `record` only queues the row; a background task writes queued rows every `flush_interval`
+    seconds in one transaction. All database work runs on a single worker thread, so neither writes
+    nor queries block the event loop. The database is in WAL mode, so it can be read by other
+    processes (e.g. `sqlite3`) while the switcher is writing to it.
+    """
+    def __init__(self, path: str, flush_interval: float = 5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.pending: List[Row] = []
+        self.last_state: Optional[bool] = None
+        self.last_at: Optional[float] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outage-store')
+        self.db: Optional[sqlite3.Connection] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def _run_in_db(self, func: Callable[[], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func)
+
+    def _open(self):
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        return self.db.execute('SELECT stable, at FROM transitions ORDER BY id DESC LIMIT 1').fetchone()
+
+    async def open(self):
+        last = await self._run_in_db(self._open)
+        if last is not None:
+            self.last_state, self.last_at = bool(last[0]), last[1]
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.db is not None:
+            await self.flush()
+            await self._run_in_db(self.db.close)
+            self.db = None
+        self.executor.shutdown(wait=False)
+
+    def record(self, stable: bool, at: Optional[float] = None, connected: Optional[bool] = None,
+               obstructed: Optional[bool] = None, drop_rate: Optional[float] = None,
+               latency_ms: Optional[float] = None, ack_seconds: Optional[float] = None):
+        """Queue a transition. Repeats of the last recorded state (e.g. a re-applied switch) are ignored."""
+        if stable == self.last_state:
+            return
+        at = at if at is not None else time.time()
+        duration = at - self.last_at if self.last_at is not None else None
+        self.pending.append((at, int(stable), connected, obstructed, drop_rate, latency_ms, ack_seconds, duration))
+        self.last_state, self.last_at = stable, at
+
+    async def flush(self):
+        if not self.pending or self.db is None:
+            return
+        rows, self.pending = self.pending, []
+
+        def write():
+            with self.db:
+                self.db.executemany(INSERT, rows)
+
+        await self._run_in_db(write)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except sqlite3.Error:
+                self.error("Could not write to the outage history", exc_info=True)
+
+    async def _query(self, sql: str, *params):
+        await self.flush()
+        return await self._run_in_db(lambda: self.db.execute(sql, params).fetchone())
+
+    async def outage_count(self, since: float) -> int:
+        """How many times we switched to cellular since `since` (a Unix time)."""
+        row = await self._query('SELECT COUNT(*) FROM transitions WHERE stable = 0 AND at >= ?', since)
+        return row[0]
+
+    async def mean_time_to_failover(self, since: float) -> Optional[float]:
+        """The mean seconds from the dish reporting an outage to the router acknowledging the switch."""
+        row = await self._query('SELECT AVG(ack_seconds) FROM transitions WHERE stable = 0 AND at >= ?', since)
+        return row[0]
+
+    async def cellular_seconds(self, since: float, now: Optional[float] = None) -> float:
+        """Seconds spent on cellular since `since`, including the current period if we're on it now."""
+        now = now if now is not None else time.time()
+        # A switch back to Starlink ends a cellular period of `duration` seconds; clip periods that
+        # started before `since`
+        row = await self._query('SELECT TOTAL(MIN(duration, at - ?)) FROM transitions WHERE stable = 1 AND at >= ?',
+                                since, since)
+        total = row[0]
+        if self.last_state is False:
+            total += now - max(self.last_at, since)
+        return total
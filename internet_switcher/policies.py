@@ -0,0 +1,227 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Policies that decide, from each dish status, whether the Starlink connection is stable."""
+
+from typing import TYPE_CHECKING, Optional
+
+from spacex.starlink import DishStatus
+
+from internet_switcher.status_history import StatusHistory
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from internet_switcher.config import Config
+    from internet_switcher.data_usage import CellularUsage
+    from internet_switcher.probes import ProbeWindow
+
+# The config fields that policies are built from; a policy is rebuilt when any of these change
+POLICY_FIELDS = (
+    'decision_policy',
+    'starlink_stable_after',
+    'predictive_window',
+    'predictive_enter_drop_rate',
+    'predictive_exit_drop_rate',
+    'predictive_obstructed_drop_rate',
+    'predictive_latency_factor',
+    'predictive_baseline_window',
+    'data_aware_min_stable_after',
+    'data_aware_max_stable_after',
+    'data_aware_flap_window',
+    'data_aware_expensive_rate',
+)
+
+
+class DecisionPolicy(LoggingMixin):
+    """Base class for decision policies.
+
+    `StarlinkMonitor` calls `decide` with every status it fetches once the initial state is known.
+    """
+    def decide(self, status: DishStatus, now: float, history: StatusHistory, is_stable: bool) -> Optional[bool]:
+        """Return whether the connection should now be treated as stable, or None to keep the current state."""
+        raise NotImplementedError
+
+    def reset(self):
+        """Forget any state, e.g. when the monitor restarts."""
+
+    @classmethod
+    def from_config(cls, config: 'Config') -> 'DecisionPolicy':
+        return cls()
+
+
+class ConnectedPolicy(DecisionPolicy):
+    """Switch away as soon as the dish reports an outage, and back after `stable_after` seconds connected.
+
+    With `use_probes`, active probes through the Starlink path count too: a majority of the targets
+    losing `loss` of their probes is an outage even if the dish says it's connected, and switching
+    back also needs a majority at or below `recover_loss` (see `ProbeWindow.quorum_loss`).
+    """
+    def __init__(self, stable_after: float = 15):
+        self.stable_after = stable_after
+        self.healthy_since = None
+        self.probes: Optional['ProbeWindow'] = None
+        self.probe_loss = 0.5
+        self.probe_recover_loss = 0.1
+        self.min_probes = 3
+
+    @classmethod
+    def from_config(cls, config: 'Config') -> 'ConnectedPolicy':
+        return cls(config.starlink_stable_after)
+
+    def use_probes(self, probes: 'ProbeWindow', loss: float = 0.5, recover_loss: float = 0.1, min_probes: int = 3):
+        self.probes = probes
+        self.probe_loss = loss
+        self.probe_recover_loss = recover_loss
+        self.min_probes = min_probes
+
+    def reset(self):
+        self.healthy_since = None
+
+    def _probe_loss(self) -> Optional[float]:
+        if self.probes is None or len(self.probes) < self.min_probes:
+            return None
+        return self.probes.quorum_loss
+
+    def is_unhealthy(self, status: DishStatus, now: float, history: StatusHistory) -> bool:
+        return not status.connected
+
+    def is_healthy(self, status: DishStatus, now: float, history: StatusHistory) -> bool:
+        return status.connected
+
+    def stable_delay(self, now: float, history: StatusHistory) -> float:
+        """How long the connection must stay healthy before switching back; asked again with every status."""
+        return self.stable_after
+
+    def decide(self, status: DishStatus, now: float, history: StatusHistory, is_stable: bool) -> Optional[bool]:
+        loss = self._probe_loss()
+        if is_stable:
+            if self.is_unhealthy(status, now, history) or (loss is not None and loss >= self.probe_loss):
+                if loss is not None:
+                    self.debug("Probe loss is %.2f", loss)
+                self.healthy_since = None
+                return False
+            return None
+
+        if not self.is_healthy(status, now, history) or (loss is not None and loss > self.probe_recover_loss):
+            self.healthy_since = None
+        elif self.healthy_since is None:
+            self.debug("Got first healthy response")
+            self.healthy_since = now
+        elif now - self.healthy_since >= self.stable_delay(now, history):
+            self.healthy_since = None
+            return True
+        return None
+
+
+class PredictivePolicy(ConnectedPolicy):
+    """Switch away when the dish looks about to drop, not only once it has.
+
+    The connection is treated as unstable when the dish reports an outage, or when over the last
+    `window` seconds the mean pop ping drop rate reaches `enter_drop_rate`, or the dish is obstructed
+    while dropping at least `obstructed_drop_rate`, or the median latency is `latency_factor` times
+    its usual (`baseline_window`) median.
+
+    To avoid flapping, switching back needs a lower drop rate (`exit_drop_rate`), no obstruction and
+    normal latency, held for `stable_after` seconds.
+    """
+    def __init__(self, stable_after: float = 15, window: float = 3, enter_drop_rate: float = 0.25,
+                 exit_drop_rate: float = 0.05, obstructed_drop_rate: float = 0.1, latency_factor: float = 3,
+                 baseline_window: float = 300, min_samples: int = 3):
+        super().__init__(stable_after)
+        self.window = window
+        self.enter_drop_rate = enter_drop_rate
+        self.exit_drop_rate = exit_drop_rate
+        self.obstructed_drop_rate = obstructed_drop_rate
+        self.latency_factor = latency_factor
+        self.baseline_window = baseline_window
+        self.min_samples = min_samples
+
+    @classmethod
+    def from_config(cls, config: 'Config') -> 'PredictivePolicy':
+        return cls(
+            config.starlink_stable_after,
+            window=config.predictive_window,
+            enter_drop_rate=config.predictive_enter_drop_rate,
+            exit_drop_rate=config.predictive_exit_drop_rate,
+            obstructed_drop_rate=config.predictive_obstructed_drop_rate,
+            latency_factor=config.predictive_latency_factor,
+            baseline_window=config.predictive_baseline_window
+        )
+
+    def _latency_spiking(self, history: StatusHistory) -> bool:
+        if history.count(self.baseline_window) < 10 * self.min_samples:
+            return False
+        recent = history.latency_percentile(50, self.window)
+        baseline = history.latency_percentile(50, self.baseline_window)
+        return recent is not None and baseline and recent >= self.latency_factor * baseline
+
+    def is_unhealthy(self, status: DishStatus, now: float, history: StatusHistory) -> bool:
+        if not status.connected:
+            return True
+        if history.count(self.window) < self.min_samples:
+            return False
+        drop_rate = history.mean_drop_rate(self.window)
+        if drop_rate >= self.enter_drop_rate:
+            self.debug("Drop rate is %.2f", drop_rate)
+            return True
+        if status.obstructed and drop_rate >= self.obstructed_drop_rate:
+            self.debug("Obstructed with drop rate %.2f", drop_rate)
+            return True
+        if self._latency_spiking(history):
+            self.debug("Latency is spiking")
+            return True
+        return False
+
+    def is_healthy(self, status: DishStatus, now: float, history: StatusHistory) -> bool:
+        return (
+            status.connected
+            and not status.obstructed
+            and status.ping_drop_rate <= self.exit_drop_rate
+            and not self._latency_spiking(history)
+        )
+
+
+class DataAwarePolicy(ConnectedPolicy):
+    """Switch back sooner when cellular data is being used fast, and later when Starlink keeps dropping.
+
+    The wait before switching back starts at `stable_after` and doubles for every other outage in the
+    last `flap_window` seconds, since returning to a flapping dish just means switching away again.
+    It is then divided by how many times over `expensive_rate` (bytes per second) the cellular WAN is
+    currently transferring, as measured by `use_usage`, since each second there costs that much. The
+    result is kept between `min_stable_after` and `max_stable_after`.
+    """
+    def __init__(self, stable_after: float = 15, min_stable_after: float = 5, max_stable_after: float = 240,
+                 flap_window: float = 900, expensive_rate: float = 125_000):
+        super().__init__(stable_after)
+        self.min_stable_after = min_stable_after
+        self.max_stable_after = max_stable_after
+        self.flap_window = flap_window
+        self.expensive_rate = expensive_rate
+        self.usage: Optional['CellularUsage'] = None
+
+    @classmethod
+    def from_config(cls, config: 'Config') -> 'DataAwarePolicy':
+        return cls(
+            config.starlink_stable_after,
+            min_stable_after=config.data_aware_min_stable_after,
+            max_stable_after=config.data_aware_max_stable_after,
+            flap_window=config.data_aware_flap_window,
+            expensive_rate=config.data_aware_expensive_rate
+        )
+
+    def use_usage(self, usage: 'CellularUsage'):
+        self.usage = usage
+
+    def stable_delay(self, now: float, history: StatusHistory) -> float:
+        outages = history.outage_count(self.flap_window)
+        delay = self.stable_after * 2 ** min(max(outages - 1, 0), 16)
+        rate = self.usage.rate if self.usage is not None else None
+        if rate is not None and self.expensive_rate > 0:
+            delay /= max(1.0, rate / self.expensive_rate)
+        return min(self.max_stable_after, max(self.min_stable_after, delay))
+
+
+POLICIES = {
+    'connected': ConnectedPolicy,
+    'predictive': PredictivePolicy,
+    'data_aware': DataAwarePolicy,
+}
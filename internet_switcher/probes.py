@@ -0,0 +1,207 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Active probes of real connectivity through each WAN path, to complement the dish's own status."""
+
+import asyncio
+import random
+import struct
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from internet_switcher.metrics import PROBE_FAILURES, PROBE_SECONDS
+from internet_switcher.util.logging import LoggingMixin
+
+
+class ProbeTarget:
+    """Something to probe: a TCP connect to `host:port`, or a DNS query for `name` to `host:port`."""
+    __slots__ = ('kind', 'host', 'port', 'name')
+
+    def __init__(self, kind: str, host: str, port: int, name: str = 'example.com'):
+        if kind not in ('tcp', 'dns'):
+            raise ValueError(f"Unknown probe kind {kind!r}")
+        self.kind = kind
+        self.host = host
+        self.port = port
+        self.name = name
+
+    @classmethod
+    def parse(cls, spec: str) -> 'ProbeTarget':
+        """Parse `tcp:host:port` or `dns:host[:port[:name]]`."""
+        kind, host, *rest = spec.strip().split(':')
+        if kind == 'tcp':
+            return cls(kind, host, int(rest[0]) if rest else 443)
+        return cls(kind, host, int(rest[0]) if rest else 53, *rest[1:2])
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{self.host}:{self.port}"
+
+
+def parse_targets(spec: str) -> List[ProbeTarget]:
+    """Parse a comma separated list of targets, e.g. `tcp:1.1.1.1:443,dns:8.8.8.8`."""
+    return [ProbeTarget.parse(item) for item in spec.split(',') if item.strip()]
+
+
+def parse_paths(spec: str) -> Dict[str, Optional[str]]:
+    """Parse a comma separated list of `name=source_address` WAN paths. An empty address uses the default route."""
+    paths = {}
+    for item in spec.split(','):
+        if item.strip():
+            name, _, address = item.partition('=')
+            paths[name.strip()] = address.strip() or None
+    return paths
+
+
+class ProbeWindow:
+    """Probe results from the last `window` seconds, on the event loop clock, per target."""
+    def __init__(self, window: float = 10.0):
+        self.window = window
+        self.results: Deque[Tuple[float, Optional[float], Optional[str]]] = deque()
+
+    def record(self, timestamp: float, latency: Optional[float], target: Optional[str] = None):
+        """Record a probe result of `target`; `latency` is None if it failed."""
+        self.results.append((timestamp, latency, target))
+        cutoff = timestamp - self.window
+        while self.results and self.results[0][0] < cutoff:
+            self.results.popleft()
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    @property
+    def loss_rate(self) -> Optional[float]:
+        """The share of all probes that failed, across every target."""
+        if not self.results:
+            return None
+        return sum(1 for _, latency, _ in self.results if latency is None) / len(self.results)
+
+    def target_loss_rates(self) -> Dict[Optional[str], float]:
+        counts: Dict[Optional[str], List[int]] = {}
+        for _, latency, target in self.results:
+            lost_sent = counts.setdefault(target, [0, 0])
+            lost_sent[0] += latency is None
+            lost_sent[1] += 1
+        return {target: lost / sent for target, (lost, sent) in counts.items()}
+
+    @property
+    def quorum_loss(self) -> Optional[float]:
+        """The loss rate that more than half of the targets are at or above.
+
+        Unlike `loss_rate`, one dead target (say, a blocked resolver) among healthy ones doesn't
+        make the path look lossy: it takes a majority of the targets losing probes.
+        """
+        rates = sorted(self.target_loss_rates().values(), reverse=True)
+        if not rates:
+            return None
+        return rates[len(rates) // 2]
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        latencies = sorted(latency for _, latency, _ in self.results if latency is not None)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, query_id: int):
+        self.query_id = query_id
+        self.answered = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data: bytes, addr):
+        # Any well-formed response to our query counts: even NXDOMAIN proves the path works
+        if len(data) >= 12 and struct.unpack('!H', data[:2])[0] == self.query_id and data[2] & 0x80:
+            if not self.answered.done():
+                self.answered.set_result(None)
+
+    def error_received(self, exc: Exception):
+        if not self.answered.done():
+            self.answered.set_exception(exc)
+
+
+def dns_query(query_id: int, name: str) -> bytes:
+    """An A record query for `name`, with recursion desired."""
+    header = struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    question = b''.join(bytes([len(label)]) + label.encode() for label in name.split('.') if label)
+    return header + question + b'\x00' + struct.pack('!HH', 1, 1)
+
+
+async def probe_tcp(target: ProbeTarget, source: Optional[str] = None):
+    _, writer = await asyncio.open_connection(target.host, target.port,
+                                              local_addr=(source, 0) if source else None)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+
+
+async def probe_dns(target: ProbeTarget, source: Optional[str] = None):
+    loop = asyncio.get_running_loop()
+    query_id = random.getrandbits(16)
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: _DnsProtocol(query_id), remote_addr=(target.host, target.port),
+        local_addr=(source, 0) if source else None)
+    try:
+        transport.sendto(dns_query(query_id, target.name))
+        await protocol.answered
+    finally:
+        transport.close()
+
+
+PROBES = {
+    'tcp': probe_tcp,
+    'dns': probe_dns,
+}
+
+
+class ProbeEngine(LoggingMixin):
+    """Probes every target through every WAN path, `interval` seconds apart.
+
+    Each path is a name and the local address to send from, which the router uses to pick the WAN.
+    All probes in a round run concurrently and each has `timeout` seconds to finish. Results are kept
+    per path in a `ProbeWindow` covering the last `window` seconds.
+    """
+    def __init__(self, paths: Dict[str, Optional[str]], targets: List[ProbeTarget], interval: float = 1.0,
+                 timeout: float = 1.0, window: float = 10.0):
+        self.paths = paths
+        self.targets = targets
+        self.interval = interval
+        self.timeout = timeout
+        self.windows = {name: ProbeWindow(window) for name in paths}
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def probe_round(self):
+        """Run one probe of every target through every path."""
+        await asyncio.gather(*[self._probe(name, source, target)
+                               for name, source in self.paths.items() for target in self.targets])
+
+    async def _probe(self, path: str, source: Optional[str], target: ProbeTarget):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(PROBES[target.kind](target, source), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.debug("Probe %r via %s failed: %r", target, path, e)
+            PROBE_FAILURES.inc(path=path, kind=target.kind)
+            latency = None
+        else:
+            latency = time.perf_counter() - started
+            PROBE_SECONDS.observe(latency, path=path, kind=target.kind)
+        self.windows[path].record(asyncio.get_running_loop().time(), latency, repr(target))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            try:
+                await self.probe_round()
+            except Exception:
+                self.warning("Could not run a round of probes", exc_info=True)
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
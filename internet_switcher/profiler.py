@@ -0,0 +1,198 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Opt-in timing spans and a blocked event loop watchdog, for finding out what made a failover slow.
+
+Everything goes through the process-wide `PROFILER`. While it's disabled (the default), `span`
+returns a shared do-nothing context manager and `wrap` returns its argument, so the instrumented
+hot paths pay one method call. Once `Instrumentation` enables it:
+
+- `span(name, *detail)` times a block in the current task; totals per name and the slowest spans
+  are kept
+- `LoopLagMonitor` ticks every `threshold / 2` seconds, and every lag of at least `threshold` is
+  kept as a `loop.lag` span
+- a watchdog thread samples the event loop thread's stack when the loop has been stuck for
+  `threshold`, and attaches it to that `loop.lag` span, so it says what was blocking
+- `dump` logs the totals and the slowest spans; `Instrumentation` calls it on SIGUSR1
+"""
+
+import asyncio
+import heapq
+import itertools
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+from internet_switcher.util.logging import LoggingMixin
+
+LOOP_LAG = 'loop.lag'
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed block, in seconds on the `perf_counter` clock."""
+    __slots__ = ('profiler', 'name', 'detail', 'task', 'started', 'duration', 'stack')
+
+    def __init__(self, profiler: 'Profiler', name: str, detail: Tuple[Any, ...]):
+        self.profiler = profiler
+        self.name = name
+        self.detail = detail
+        self.task: Optional[str] = None
+        self.started = 0.0
+        self.duration = 0.0
+        self.stack: Optional[str] = None
+
+    def __enter__(self):
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        self.task = task.get_name() if task is not None else None
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter() - self.started
+        self.profiler.record(self)
+        return False
+
+    def __repr__(self) -> str:
+        detail = ' '.join(str(item) for item in self.detail)
+        return f"<{self.name}{' ' + detail if detail else ''}: {self.duration * 1000:.1f} ms in {self.task or 'loop'}>"
+
+
+class Profiler(LoggingMixin):
+    """Records spans while `enabled`, keeping per-name totals and the `keep` slowest spans."""
+    def __init__(self, keep: int = 50, threshold: float = 0.1):
+        self.enabled = False
+        self.keep = keep
+        self.threshold = threshold
+        self.totals: Dict[str, List[float]] = {}
+        self.slowest: List[Tuple[float, int, Span]] = []
+        self.order = itertools.count()
+        self.watchdog: Optional['StallWatchdog'] = None
+        # Written by the watchdog thread, taken by the next lag span on the loop thread
+        self.blocked_stack: Optional[str] = None
+
+    def enable(self, keep: Optional[int] = None, threshold: Optional[float] = None):
+        if keep is not None:
+            self.keep = keep
+        if threshold is not None:
+            self.threshold = threshold
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.stop_watchdog()
+
+    def reset(self):
+        self.totals = {}
+        self.slowest = []
+
+    def span(self, name: str, *detail):
+        """Time a block: `with PROFILER.span('router.request', method, path): ...`"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, detail)
+
+    def wrap(self, awaitable: Awaitable, name: str, *detail) -> Awaitable:
+        """Time an awaitable until it finishes, e.g. a coroutine about to be gathered."""
+        if not self.enabled:
+            return awaitable
+        return self._timed(awaitable, Span(self, name, detail))
+
+    @staticmethod
+    async def _timed(awaitable: Awaitable, span: Span):
+        with span:
+            return await awaitable
+
+    def record(self, span: Span):
+        totals = self.totals.get(span.name)
+        if totals is None:
+            totals = self.totals[span.name] = [0, 0.0, 0.0]
+        totals[0] += 1
+        totals[1] += span.duration
+        totals[2] = max(totals[2], span.duration)
+        entry = (span.duration, next(self.order), span)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and span.duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def top(self, count: Optional[int] = None) -> List[Span]:
+        """The slowest spans, slowest first."""
+        return [span for _, _, span in sorted(self.slowest, key=lambda entry: entry[:2], reverse=True)[:count]]
+
+    def observe_lag(self, lag: float):
+        """Called by `LoopLagMonitor` on every tick with how late it woke up."""
+        if self.watchdog is not None:
+            self.watchdog.beat = time.monotonic()
+        if not self.enabled or lag < self.threshold:
+            return
+        span = Span(self, LOOP_LAG, ())
+        span.duration = lag
+        span.stack, self.blocked_stack = self.blocked_stack, None
+        self.record(span)
+
+    def start_watchdog(self, interval: float):
+        """Sample the current thread's stack whenever it doesn't tick for `interval` plus the threshold."""
+        self.stop_watchdog()
+        self.watchdog = StallWatchdog(self, threading.get_ident(), interval + self.threshold)
+        self.watchdog.start()
+
+    def stop_watchdog(self):
+        if self.watchdog is not None:
+            self.watchdog.stopped.set()
+            self.watchdog = None
+
+    def dump(self, count: int = 20):
+        """Log the totals per span name and the `count` slowest spans."""
+        if not self.enabled:
+            self.info("Profiling is disabled; set [profiling] enabled = true to record spans")
+            return
+        for name, (calls, total, longest) in sorted(self.totals.items(), key=lambda item: -item[1][1]):
+            self.info("Span %s: %d calls, %.1f ms total, %.1f ms max", name, calls, total * 1000, longest * 1000,
+                      span=name, calls=calls, total_ms=total * 1000, max_ms=longest * 1000)
+        for rank, span in enumerate(self.top(count), 1):
+            self.info("Slowest #%d: %r", rank, span, span=span.name, duration_ms=span.duration * 1000,
+                      task=span.task, detail=' '.join(str(item) for item in span.detail))
+            if span.stack is not None:
+                self.info("The loop was blocked in:\n%s", span.stack.rstrip())
+
+
+class StallWatchdog(threading.Thread):
+    """Samples `thread_id`'s stack once per stall, when `beat` is more than `stale_after` seconds old."""
+    def __init__(self, profiler: Profiler, thread_id: int, stale_after: float):
+        super().__init__(name='loop-watchdog', daemon=True)
+        self.profiler = profiler
+        self.thread_id = thread_id
+        self.stale_after = stale_after
+        self.beat = time.monotonic()
+        self.stopped = threading.Event()
+
+    def run(self):
+        sampled = None
+        while not self.stopped.wait(self.stale_after / 2):
+            beat = self.beat
+            if beat == sampled or time.monotonic() - beat < self.stale_after:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                sampled = beat
+                self.profiler.blocked_stack = ''.join(traceback.format_stack(frame))
+
+
+PROFILER = Profiler()
@@ -0,0 +1,263 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Ranks every WAN on the router by health, and reorders their rules with as few writes as possible."""
+
+import asyncio
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from cradlepoint.wan import INDEXED_KEYS
+
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from cradlepoint.mirror import RouterMirror
+    from cradlepoint.wan import WanDevice, WanDeviceCollection
+    from internet_switcher.probes import ProbeWindow
+
+
+def parse_selector(spec: str) -> Dict[str, str]:
+    """Parse a comma separated list of `key=value` filters for `WanDeviceCollection.filter_one`, e.g. `sim=sim1`."""
+    selector = {}
+    for item in spec.split(','):
+        if item.strip():
+            key, sep, value = item.partition('=')
+            if not sep or key.strip() not in INDEXED_KEYS:
+                raise ValueError(f"Expected {'/'.join(INDEXED_KEYS)}=value in WAN selector {spec!r}")
+            selector[key.strip()] = value.strip()
+    return selector
+
+
+def plan_priorities(current: Dict[str, Optional[float]], order: Sequence[str], anchor: Optional[str] = None,
+                    step: float = 1.1) -> Dict[str, float]:
+    """The fewest rule priority changes that make the router prefer the rules in `order` (best first).
+
+    Cradlepoint prefers lower priorities. The rules whose current priorities already increase along
+    `order` the most are kept (a longest increasing subsequence, preferring one that keeps `anchor`),
+    and the rest are slotted in between them, or `step` beyond them at either end. Returns the new
+    priority of every rule that has to change.
+    """
+    values = [current.get(rule) for rule in order]
+    weights = [0.0 if value is None else 1.5 if rule == anchor else 1.0 for rule, value in zip(order, values)]
+    best = list(weights)
+    previous = [-1] * len(order)
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        for j in range(i):
+            if values[j] is not None and values[j] < value and best[j] + weights[i] > best[i]:
+                best[i] = best[j] + weights[i]
+                previous[i] = j
+    kept = set()
+    if any(best):
+        i = max(range(len(order)), key=lambda k: best[k])
+        while i != -1:
+            kept.add(i)
+            i = previous[i]
+
+    writes = {}
+    i = 0
+    while i < len(order):
+        if i in kept:
+            i += 1
+            continue
+        end = i
+        while end < len(order) and end not in kept:
+            end += 1
+        low = values[i - 1] if i > 0 else None
+        high = values[end] if end < len(order) else None
+        count = end - i
+        for k in range(count):
+            if low is None and high is None:
+                value = step * (k + 1)
+            elif low is None:
+                value = high - step * (count - k)
+            elif high is None:
+                value = low + step * (k + 1)
+            else:
+                value = low + (high - low) * (k + 1) / (count + 1)
+            writes[order[i + k]] = round(value, 6)
+        i = end
+
+    final = [writes.get(rule, value) for rule, value in zip(order, values)]
+    if any(a >= b for a, b in zip(final, final[1:])):
+        # The gaps have been halved too often to slot anything else in; start over from whole steps
+        renumbered = {rule: round(step * (k + 1), 6) for k, rule in enumerate(order)}
+        return {rule: value for rule, value in renumbered.items() if current.get(rule) != value}
+    return writes
+
+
+class WanRanking(LoggingMixin):
+    """Keeps the router's WAN rules in order of health, across any number of WANs.
+
+    Every device in `devices` gets a score. Healthy devices always outrank unhealthy ones; among
+    those, a lower `preference` wins (Starlink first, then the names listed in `preference`, then
+    wired, then cellular WANs), and modem signal strength breaks ties. Starlink is healthy while the
+    dish monitor says it's stable; other WANs while the router reports them connected and, if they
+    have a probe path of the same name, a majority of its targets lose less than `max_loss`.
+
+    It's a drop-in for `WanRuleSnapshot`: `prioritize(cellular)` says whether Starlink is usable,
+    and the whole order is recomputed and applied with the fewest writes, all in one batch. With
+    `follow`, the rules and device health come from a `RouterMirror`, and `on_reorder` is awaited
+    when a health change alone calls for a different order.
+    """
+    def __init__(self, devices: 'WanDeviceCollection', ethernet: 'WanDevice', cellular: 'WanDevice',
+                 preference: Sequence[str] = (), step: float = 1.1, max_loss: float = 0.5,
+                 probes: Optional[Dict[str, 'ProbeWindow']] = None):
+        self.devices = devices
+        self.ethernet = ethernet
+        self.cellular = cellular
+        self.preference = list(preference)
+        self.step = step
+        self.max_loss = max_loss
+        self.probes = probes or {}
+        self.priorities: Dict[str, Optional[float]] = {}
+        self.health: Dict[str, dict] = {}
+        self.version = 0
+        self.desired_cellular: Optional[bool] = None
+        self.applied_order: Optional[List[str]] = None
+        self.written_at: Optional[float] = None
+        self.mirror: Optional['RouterMirror'] = None
+        self.on_reorder: Optional[Callable[[], Awaitable[None]]] = None
+
+    @property
+    def api(self):
+        return self.ethernet.api
+
+    @property
+    def loaded(self) -> bool:
+        return all(self.priorities.get(device.id) is not None for device in self.devices.all)
+
+    @property
+    def eth_priority(self) -> Optional[float]:
+        return self.priorities.get(self.ethernet.id)
+
+    def router_order(self, rules: Sequence[str]) -> List[str]:
+        """`rules` in the order the router currently prefers them."""
+        return sorted(rules, key=lambda rule: self.priorities.get(rule, float('inf')))
+
+    @property
+    def cellular_preferred(self) -> bool:
+        """Whether the router currently prefers some other WAN over Starlink."""
+        order = self.router_order([device.id for device in self.devices.all])
+        return bool(order) and order[0] != self.ethernet.id
+
+    @property
+    def drifted(self) -> bool:
+        """Whether the router's order differs from the one we last applied."""
+        if self.applied_order is None or not self.loaded:
+            return False
+        present = {device.id for device in self.devices.all}
+        applied = [rule for rule in self.applied_order if rule in present]
+        return self.router_order(applied) != applied
+
+    def _status(self, device: 'WanDevice') -> dict:
+        return self.health.get(device.name) or device._status or {}
+
+    def _preference(self, device: 'WanDevice') -> int:
+        if device is self.ethernet:
+            return 0
+        if device.name in self.preference:
+            return 1 + self.preference.index(device.name)
+        return 1 + len(self.preference) + (1 if device.info.get('sim') else 0)
+
+    def _healthy(self, device: 'WanDevice', cellular: bool) -> bool:
+        if device is self.ethernet:
+            return not cellular
+        state = self._status(device).get('status', {}).get('connection_state')
+        if state is not None and state != 'connected':
+            return False
+        window = self.probes.get(device.name)
+        loss = window.quorum_loss if window is not None else None
+        return loss is None or loss < self.max_loss
+
+    def _signal(self, device: 'WanDevice') -> float:
+        """0 to 5 for modems, from the RSRP between -120 and -80 dBm."""
+        try:
+            rsrp = float(self._status(device).get('diagnostics', {})['RSRP'])
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+        return 5.0 * min(1.0, max(0.0, (rsrp + 120) / 40))
+
+    def score(self, device: 'WanDevice', cellular: bool) -> float:
+        return (1000.0 if self._healthy(device, cellular) else 0.0) - 10.0 * self._preference(device) + self._signal(device)
+
+    def rank(self, cellular: bool) -> List['WanDevice']:
+        """Every device, best first."""
+        return sorted(self.devices.all, key=lambda device: (-self.score(device, cellular), device.name or ''))
+
+    def retarget(self, ethernet: 'WanDevice', cellular: 'WanDevice'):
+        """Point at (possibly re-enumerated) devices and forget the cached priorities."""
+        self.ethernet = ethernet
+        self.cellular = cellular
+        self.priorities = {}
+        self.version += 1
+
+    def follow(self, mirror: 'RouterMirror'):
+        """Take the priorities and device health from `mirror` whenever they change."""
+        self.mirror = mirror
+        mirror.watch(self.api.config.wan.rules2, self.apply_rules)
+        mirror.watch(self.api.status.wan.devices, self.apply_health)
+
+    async def apply_rules(self, rules: List[dict]):
+        if self.written_at is not None and self.mirror.sweep_started_at < self.written_at:
+            # The sweep may have read the rules before our own writes landed
+            self.debug("Discarding mirrored WAN rules that raced a local write")
+            return
+        self._update({rule.get('_id_'): rule.get('priority') for rule in rules})
+
+    async def apply_health(self, devices: Dict[str, dict]):
+        """Re-rank with a freshly fetched `status/wan/devices`."""
+        self.health = devices
+        if self.desired_cellular is None or self.on_reorder is None:
+            return
+        order = [device.id for device in self.rank(self.desired_cellular)]
+        if order != self.applied_order:
+            self.info("WAN health changed; reordering")
+            await self.on_reorder()
+
+    async def refresh(self) -> bool:
+        """Re-read every rule's priority, in one request.
+
+        Returns False if the result was discarded because of a concurrent local write."""
+        version = self.version
+        rules = await self.api.config.wan.rules2()
+        if version != self.version:
+            self.debug("Discarding WAN rule refresh that raced a local write")
+            return False
+        self._update({rule.get('_id_'): rule.get('priority') for rule in rules})
+        return True
+
+    def _update(self, priorities: Dict[str, Optional[float]]):
+        if priorities != self.priorities:
+            if self.priorities:
+                self.warning("WAN rules changed on the router: %s", priorities)
+            self.priorities = priorities
+            self.version += 1
+
+    async def prioritize(self, cellular: bool) -> bool:
+        """Apply the best order given whether Starlink is usable. Returns whether any write was needed."""
+        self.desired_cellular = cellular
+        if not self.loaded:
+            await self.refresh()
+        order = [device.id for device in self.rank(cellular)]
+        self.applied_order = order
+        writes = plan_priorities(self.priorities, order, anchor=self.ethernet.id, step=self.step)
+        if not writes:
+            return False
+
+        self.debug("Writing %d of %d WAN priorities: %s", len(writes), len(order), writes)
+        api = self.api
+        self.version += 1
+        try:
+            async with api.batch(limit=len(writes)) as batch:
+                for rule, priority in writes.items():
+                    batch.put(api.config.wan.rules2[rule].priority, priority)
+        except BaseException:
+            # Some writes may have landed; reload before the next reorder
+            self.priorities = {}
+            raise
+        finally:
+            self.version += 1
+            self.written_at = asyncio.get_running_loop().time()
+        self.priorities.update(writes)
+        return True
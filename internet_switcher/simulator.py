@@ -0,0 +1,278 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Replays a recorded trace through the switcher against a simulated dish and router.
+
+The simulation runs on an event loop with a virtual clock: whenever nothing is ready to run, the
+clock jumps straight to the next scheduled callback instead of sleeping, so a day-long trace
+replays in seconds.
+
+    python -m internet_switcher.simulator trace.jsonl.gz --policy predictive
+"""
+
+import argparse
+import asyncio
+import copy
+import selectors
+import statistics
+import time
+from typing import Any, Optional
+
+from spacex.starlink import CommunicationError
+
+from cradlepoint.api import CradlepointRouter
+from cradlepoint.batch import _slice
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher
+from internet_switcher.trace import RecordedStatus, read_trace
+from internet_switcher.util.logging import LoggingMixin
+
+
+DEFAULT_TREE = {
+    'status': {
+        'product_info': {'product_name': 'IBR600C-simulated'},
+        'wan': {
+            'devices': {
+                'ethernet-wan': {'config': {'_id_': '00000000-eth'}, 'info': {'iface': 'eth0.1', 'port': 'wan'}},
+                'mdm-sim1': {'config': {'_id_': '00000001-mdm'}, 'info': {'iface': 'wwan0', 'sim': 'sim1'},
+                             'stats': {'in': 0, 'out': 0}},
+            },
+        },
+    },
+    'config': {
+        'system': {'sdk': {'appdata': []}},
+        'wan': {
+            'rules2': [
+                {'_id_': '00000000-eth', 'priority': 1.0},
+                {'_id_': '00000001-mdm', 'priority': 2.1},
+            ],
+        },
+    },
+}
+
+
+def apply_put(tree: dict, path: str, value: Any, create: bool = False):
+    """Set `path` in a router tree the way a PUT would, optionally creating missing parents."""
+    parts = path.strip('/').split('/')
+    node = tree
+    for part in parts[:-1]:
+        if isinstance(node, list):
+            node = _slice(node, part)
+        else:
+            if create and part not in node:
+                node[part] = {}
+            node = node[part]
+    if isinstance(node, list):
+        _slice(node, parts[-1]).update(value)
+    else:
+        node[parts[-1]] = value
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    def __init__(self):
+        super().__init__()
+        self.loop = None
+
+    def select(self, timeout=None):
+        if timeout is None:
+            return super().select(timeout)
+        events = super().select(0)
+        if not events and timeout > 0:
+            self.loop.advance(timeout)
+        return events
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """An event loop whose clock jumps ahead instead of sleeping while it's idle."""
+    def __init__(self):
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self._virtual_time = 0.0
+
+    def time(self) -> float:
+        return self._virtual_time
+
+    def advance(self, seconds: float):
+        self._virtual_time += seconds
+
+
+class SimulatedDish:
+    """Answers status requests with whatever the trace says the dish reported at that time."""
+    def __init__(self, trace_path: str, response_time: float = 0.02):
+        self.trace_path = trace_path
+        self.response_time = response_time
+        self.records = None
+        self.current = None
+        self.upcoming = None
+        self.started_at = None
+        self.offset = 0.0
+        self.outages = []
+        self.finished = asyncio.Event()
+
+    async def connect(self):
+        self.records = (record for record in read_trace(self.trace_path) if record['k'] in ('dish', 'dish_error'))
+        self.upcoming = next(self.records, None)
+        self.offset = self.upcoming['t'] if self.upcoming is not None else 0.0
+        self.started_at = asyncio.get_running_loop().time()
+
+    async def close(self):
+        pass
+
+    def loop_time(self, trace_time: float) -> float:
+        return self.started_at + trace_time - self.offset
+
+    def _advance(self):
+        previous, self.current = self.current, self.upcoming
+        if (
+            self.current['k'] == 'dish' and not self.current['c']
+            and (previous is None or previous['k'] != 'dish' or previous['c'])
+        ):
+            self.outages.append(self.loop_time(self.current['t']))
+        self.upcoming = next(self.records, None)
+
+    async def fetch_status(self) -> RecordedStatus:
+        await asyncio.sleep(self.response_time)
+        now = asyncio.get_running_loop().time() - self.started_at + self.offset
+        while self.upcoming is not None and self.upcoming['t'] <= now:
+            self._advance()
+        if self.upcoming is None:
+            self.finished.set()
+        if self.current is None or self.current['k'] == 'dish_error':
+            raise CommunicationError("Simulated communication failure")
+        return RecordedStatus.from_record(self.current)
+
+
+class SimulatedRouter(CradlepointRouter):
+    """A router that serves requests from an in-memory tree after `latency` seconds.
+
+    While the cellular rule is preferred, the cellular device's `stats` count `cellular_rate` bytes a
+    second of downloads.
+    """
+    def __init__(self, tree: Optional[dict] = None, latency: float = 0.05, cellular_rate: float = 250_000):
+        self.tree = copy.deepcopy(tree if tree is not None else DEFAULT_TREE)
+        self.latency = latency
+        self.cellular_rate = cellular_rate
+        self.cellular_bytes = 0.0
+        self.counted_at = None
+        self.writes = []
+        self.requests = 0
+        self.trace = None
+        self.keep_warm = False
+        self.warm_task = None
+
+    def seed_from_trace(self, trace_path: str):
+        """Load the router state recorded in a trace, i.e. the GET responses before the first PUT."""
+        for record in read_trace(trace_path):
+            if record['k'] != 'router':
+                continue
+            if record['m'] != 'GET':
+                break
+            apply_put(self.tree, record['p'], record['r'], create=True)
+
+    def _count_usage(self, now: float):
+        if self.counted_at is not None:
+            priorities = {rule['_id_']: rule['priority'] for rule in self.tree['config']['wan']['rules2']}
+            if priorities.get('00000001-mdm', 0) < priorities.get('00000000-eth', 0):
+                self.cellular_bytes += self.cellular_rate * (now - self.counted_at)
+        self.counted_at = now
+        stats = self.tree['status']['wan']['devices'].get('mdm-sim1', {}).setdefault('stats', {'in': 0, 'out': 0})
+        stats['in'] = int(self.cellular_bytes)
+
+    async def request(self, method: str, path, value=None):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        self._count_usage(asyncio.get_running_loop().time())
+        path = str(path).strip('/')
+        if method.upper() == 'PUT':
+            apply_put(self.tree, path, value)
+            self.writes.append((asyncio.get_running_loop().time(), path, value))
+            return value
+        return copy.deepcopy(_slice(self.tree, path))
+
+    def reconfigure(self, config: Config):
+        """There's no connection to tune."""
+
+    async def close(self):
+        pass
+
+
+class Simulation(LoggingMixin):
+    """Runs an `InternetSwitcher` over a trace and reports how quickly and how often it switched."""
+    def __init__(self, trace_path: str, config: Optional[Config] = None, router_latency: float = 0.05,
+                 cellular_rate: float = 250_000):
+        self.trace_path = trace_path
+        self.config = config if config is not None else Config()
+        self.router_latency = router_latency
+        self.cellular_rate = cellular_rate
+
+    async def run(self) -> dict:
+        dish = SimulatedDish(self.trace_path)
+        router = SimulatedRouter(latency=self.router_latency, cellular_rate=self.cellular_rate)
+        router.seed_from_trace(self.trace_path)
+        switcher = InternetSwitcher(self.config, starlink=dish, cradlepoint=router)
+        await switcher.connect()
+        run_task = asyncio.create_task(switcher.run())
+        finished_task = asyncio.create_task(dish.finished.wait())
+        try:
+            await asyncio.wait({run_task, finished_task}, return_when=asyncio.FIRST_COMPLETED)
+            if run_task.done():
+                # Raise whatever stopped the switcher early
+                await run_task
+        finally:
+            run_task.cancel()
+            finished_task.cancel()
+            await asyncio.gather(run_task, finished_task, return_exceptions=True)
+            await switcher.close()
+        router._count_usage(asyncio.get_running_loop().time())
+        return self.results(dish, router, switcher.rules.eth_priority)
+
+    @staticmethod
+    def results(dish: SimulatedDish, router: SimulatedRouter, eth_priority: float) -> dict:
+        to_cellular = [(t, value < eth_priority) for t, _, value in router.writes]
+        latencies = []
+        for outage in dish.outages:
+            before = [cellular for t, cellular in to_cellular if t <= outage]
+            if before and before[-1]:
+                latencies.append(0.0)
+                continue
+            after = [t for t, cellular in to_cellular if t > outage and cellular]
+            if after:
+                latencies.append(after[0] - outage)
+        return {
+            'virtual_seconds': asyncio.get_running_loop().time() - dish.started_at,
+            'outages': len(dish.outages),
+            'switches_to_cellular': sum(1 for _, cellular in to_cellular if cellular),
+            'switches_to_ethernet': sum(1 for _, cellular in to_cellular if not cellular),
+            'router_requests': router.requests,
+            'cellular_megabytes': router.cellular_bytes / 1e6,
+            'detect_latency_mean': statistics.mean(latencies) if latencies else None,
+            'detect_latency_max': max(latencies) if latencies else None,
+        }
+
+
+def simulate(trace_path: str, config: Optional[Config] = None, router_latency: float = 0.05) -> dict:
+    """Replay a trace on a virtual clock, returning the results and how long it took in real time."""
+    loop = VirtualClockLoop()
+    started = time.perf_counter()
+    try:
+        results = loop.run_until_complete(Simulation(trace_path, config, router_latency).run())
+    finally:
+        loop.close()
+    results['wall_seconds'] = time.perf_counter() - started
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace', help="Path to a .jsonl.gz trace")
+    parser.add_argument('--policy', default='connected', help="Decision policy to simulate")
+    parser.add_argument('--router-latency', type=float, default=0.05, help="Seconds per simulated router request")
+    args = parser.parse_args()
+    config = Config()
+    config.decision_policy = args.policy
+    for key, value in simulate(args.trace, config, args.router_latency).items():
+        print(f"{key}:\t{value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,19 @@
 import asyncio
-from datetime import datetime, timedelta
 
-from typing import Awaitable, Callable, Coroutine, Optional
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
 
-from spacex.starlink.aio import AsyncStarlinkDish
 from spacex.starlink import DishStatus, CommunicationError
 
+from internet_switcher.dispatcher import ActionDispatcher
+from internet_switcher.metrics import DISH_FETCH_SECONDS
+from internet_switcher.policies import ConnectedPolicy, DecisionPolicy
+from internet_switcher.profiler import PROFILER
+from internet_switcher.status_history import StatusHistory
 from internet_switcher.util.logging import LoggingMixin
 
+if TYPE_CHECKING:
+    from spacex.starlink.aio import AsyncStarlinkDish
+
 
 class StarlinkStateTrigger:
     def __init__(self, monitor: 'StarlinkMonitor', name: str, func: Callable[[Optional[DishStatus]], None]):
@@ -15,25 +21,51 @@ class StarlinkStateTrigger:
 
 
 class StarlinkMonitor(LoggingMixin):
-    """Checks for changes in connection stability to Starlink, and fires events when it changes."""
-    def __init__(self, starlink: AsyncStarlinkDish):
+    """Checks for changes in connection stability to Starlink, and fires events when it changes.
+
+    The dish is probed on an adaptive interval: every `min_interval` seconds while the connection is
+    unstable or degraded, backing off by `backoff` per healthy probe up to `max_interval` while it is
+    steady. An outage that starts while steady is only seen at the next probe, so `max_interval` is
+    also what detection can take: about half of it on average, all of it at worst.
+
+    Whether a status means the connection is stable is up to the `policy`, which defaults to a
+    `ConnectedPolicy` that waits `stable_after` seconds before switching back. Independently of the
+    policy, a dish that hasn't answered for `unreachable_after` seconds is treated as an outage.
+
+    The first decision (from the first status, or from the dish not answering at all) is dispatched
+    too, so the router is put in the right state on startup. `first_check` is set once it's made.
+    """
+    def __init__(self, starlink: 'AsyncStarlinkDish', min_interval: float = 0.25, max_interval: float = 0.5,
+                 backoff: float = 1.5, stable_after: float = 15, degraded_drop_rate: float = 0.05,
+                 history_size: int = 200_000, policy: Optional[DecisionPolicy] = None,
+                 unreachable_after: float = 2.0):
         self.starlink = starlink
+        self.history = StatusHistory(history_size)
+        self.policy = policy if policy is not None else ConnectedPolicy(stable_after)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.degraded_drop_rate = degraded_drop_rate
+        self.unreachable_after = unreachable_after
+        self.last_response_at = None
+        self.started_at = None
+        self.interval = min_interval
         self.task = None
         self.running = False
         self.is_stable = None
-        self.unstable_actions = []
-        self.stable_actions = []
+        self.dispatcher = ActionDispatcher()
         self._reset_stats()
-        self.pending = None
-        self.connected_since = None
+        self.changed_at = None
+        self.state_changed = asyncio.Event()
+        self.first_check = asyncio.Event()
 
     def on_stable(self, func: Callable[[], Awaitable[None]]):
         """Call a method whenever the connection becomes stable."""
-        self.stable_actions.append(func)
+        self.dispatcher.add_action(True, func)
 
     def on_unstable(self, func: Callable[[], Awaitable[None]]):
         """Call a method when the connection becomes unstable."""
-        self.unstable_actions.append(func)
+        self.dispatcher.add_action(False, func)
 
     def flush_stats(self):
         """Fetch and reset the statistics for the running monitor."""
@@ -51,86 +83,125 @@ class StarlinkMonitor(LoggingMixin):
     def start(self):
         """Start the loop that checks whether the connection is stable or unstable."""
         self.running = True
+        self.started_at = self._now()
         self.debug("Creating the loop task")
         self.task = asyncio.create_task(self._loop())
+        self.dispatcher.start()
 
     def stop(self):
+        """Stop monitoring. An action that's already running is left to finish; see `ActionDispatcher.drain`."""
         self.running = False
         self.is_stable = None
+        self.policy.reset()
+        self.dispatcher.stop()
+        if self.task is not None:
+            self.task.cancel()
 
     async def wait(self, seconds: float):
-        """Similar to asyncio.sleep, but immediately raises exceptions if one is thrown."""
-        stop_time = datetime.now() + timedelta(seconds=seconds)
-        while True:
-            if self.task.done():
-                # Raise exceptions
-                await self.task
-            if datetime.now() < stop_time:
-                # Yield to other tasks
-                await asyncio.sleep(0.05)
-            else:
-                break
+        """Similar to asyncio.sleep, but immediately raises the error if the loop or the dispatcher fails."""
+        tasks = [task for task in (self.task, self.dispatcher.task) if task is not None]
+        if not tasks:
+            await asyncio.sleep(seconds)
+            return
+        done, _ = await asyncio.wait(tasks, timeout=seconds, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled():
+                task.result()
+
+    async def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        """Sleep until the connection changes between stable and unstable.
+
+        Returns False if `timeout` seconds pass without a change."""
+        self.state_changed.clear()
+        try:
+            await asyncio.wait_for(self.state_changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def _next_interval(self, status: Optional[DishStatus]) -> float:
+        """Pick how long to sleep before the next probe based on the latest status."""
+        if (
+            status is None
+            or not status.connected
+            or self.is_stable is not True
+            or status.obstructed
+            or status.ping_drop_rate >= self.degraded_drop_rate
+        ):
+            return self.min_interval
+        return min(self.interval * self.backoff, self.max_interval)
 
     async def _loop(self):
         while self.running:
+            status = None
             try:
-                await self._check_connection()
+                with PROFILER.span('dish.check'):
+                    status = await self._check_connection()
             except CommunicationError:
                 self.debug("Failed communication - marked as failure")
+                await self._check_reachable()
             finally:
                 self.stats['attempts'] += 1
-            await asyncio.sleep(0.25)  # TODO: Configure
-            
+            self.interval = self._next_interval(status)
+            await asyncio.sleep(self.interval)
 
-    async def _check_connection(self):
+    async def _check_connection(self) -> DishStatus:
+        started = self._now()
         status = await self.starlink.fetch_status()
+        now = self._now()
+        DISH_FETCH_SECONDS.observe(now - started)
+        self.last_response_at = now
+        self.history.append_status(now, status)
         self.stats['responses'] += 1
         self.stats['connected'] += 1 if status.connected else 0
-        
+
         if self.is_stable is None:
             prefix = 'un' if not status.connected else ''
-            self.debug(f"Initial check made. Marking conneciton as {prefix}stable")
-            self.is_stable = status.connected
-        
-        elif not status.connected:
-            self.connected_since = None
-            if self.is_stable is True:
+            self.debug("Initial check made. Marking conneciton as %sstable", prefix)
+            if status.connected:
+                await self._handle_stable()
+            else:
                 await self._handle_unstable()
-            
-        elif status.connected and self.is_stable is False:
-            if self.connected_since is None:
-                self.debug("Got first connectected response")
-                self.connected_since = datetime.now()
-            elif datetime.now() - self.connected_since >= timedelta(seconds=15):  # TODO: Make configurable
+
+        else:
+            stable = self.policy.decide(status, self._now(), self.history, self.is_stable)
+            if stable is False and self.is_stable is True:
+                await self._handle_unstable()
+            elif stable is True and self.is_stable is False:
                 await self._handle_stable()
-                
+
+        return status
+
+    async def _check_reachable(self):
+        """Treat a dish we haven't heard from in `unreachable_after` seconds as an outage."""
+        # A failed request isn't a healthy one, so any stability window starts over
+        self.policy.reset()
+        # Before the first response, count from when monitoring started
+        heard_at = self.last_response_at if self.last_response_at is not None else self.started_at
+        if (
+            self.is_stable is not False
+            and heard_at is not None
+            and self._now() - heard_at >= self.unreachable_after
+        ):
+            self.warning("No response from the dish in %.1fs", self._now() - heard_at)
+            await self._handle_unstable()
+
+    def _mark_changed(self):
+        self.changed_at = self._now()
+        self.state_changed.set()
+        self.first_check.set()
 
     async def _handle_unstable(self):
         self.debug("Conneciton became unstable.")
         self.is_stable = False
-        await self._check_pending()
-        if len(self.unstable_actions) == 0:
-            self.debug("No unstable actions to run.")
-        else:
-            self.debug(f"Running {len(self.unstable_actions)} unstable actions")
-            self.pending = asyncio.gather(*[action() for action in self.unstable_actions])
+        self._mark_changed()
+        self.dispatcher.request(False)
 
     async def _handle_stable(self):
         self.debug("Connection became stable.")
         self.is_stable = True
-        await self._check_pending()
-        if len(self.stable_actions) == 0:
-            self.debug("No stable actions to run.")
-        else:
-            self.debug(f"Running {len(self.stable_actions)} stable actions")
-            self.pending = asyncio.gather(*[action() for action in self.stable_actions])
-
-    async def _check_pending(self):
-        if self.pending is not None and not self.pending.done():
-            self.warning("The previous connection change task is still running.")
-            self.pending.cancel()
-        elif self.pending is not None:
-            # Raise any exceptions
-            await self.pending
-            self.pending = None
-        
\ No newline at end of file
+        self._mark_changed()
+        self.dispatcher.request(True)
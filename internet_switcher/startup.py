@@ -0,0 +1,37 @@
+# SPDX-License-Identifier: Unlicense
+
+"""How long the switcher takes to start protecting the connection.
+
+`python -m internet_switcher` imports this module first, so `PROCESS_STARTED` is as close to the
+start of the process as our own code gets.
+"""
+
+import time
+from typing import Dict, Optional
+
+from internet_switcher.metrics import STARTUP_SECONDS
+from internet_switcher.util.logging import LoggingMixin
+
+# On the same clock as the default event loop
+PROCESS_STARTED = time.monotonic()
+
+FIRST_PROBE = 'first_probe'
+READY = 'ready'
+
+
+class StartupTimer(LoggingMixin):
+    """Records when each startup milestone was first reached, in seconds after `origin`.
+
+    - `first_probe`: the dish monitor has made its first decision, so an outage will be noticed
+    - `ready`: the router is connected and its WAN rules are loaded, so a decision can be applied
+    """
+    def __init__(self, origin: Optional[float] = None):
+        self.origin = origin
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, phase: str, now: float):
+        if phase in self.marks or self.origin is None:
+            return
+        elapsed = self.marks[phase] = now - self.origin
+        STARTUP_SECONDS.set(elapsed, phase=phase)
+        self.info("Startup: %s after %.3fs", phase, elapsed, phase=phase, seconds=elapsed)
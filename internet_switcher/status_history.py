@@ -0,0 +1,112 @@
+# SPDX-License-Identifier: Unlicense
+
+from array import array
+from bisect import bisect_left
+from typing import Iterator, Optional, Tuple
+
+from spacex.starlink import DishStatus
+
+
+class StatusHistory:
+    """A fixed-size ring buffer of dish status samples.
+
+    Each field lives in its own typed `array`, so a sample costs 18 bytes and memory never grows past
+    `capacity` samples. Once full, new samples overwrite the oldest ones.
+
+    Windowed queries take a `window` in seconds, counted back from the newest sample. Timestamps must
+    be appended in increasing order (the monitor uses the event loop clock), so windows are found by
+    binary search.
+    """
+    def __init__(self, capacity: int = 200_000):
+        self.capacity = capacity
+        self._time = array('d', bytes(8 * capacity))
+        self._connected = array('b', bytes(capacity))
+        self._latency = array('f', bytes(4 * capacity))
+        self._drop_rate = array('f', bytes(4 * capacity))
+        self._obstructed = array('b', bytes(capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, connected: bool, latency: float, drop_rate: float, obstructed: bool):
+        if self._size < self.capacity:
+            ix = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            ix = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._time[ix] = timestamp
+        self._connected[ix] = connected
+        self._latency[ix] = latency
+        self._drop_rate[ix] = drop_rate
+        self._obstructed[ix] = obstructed
+
+    def append_status(self, timestamp: float, status: DishStatus):
+        self.append(timestamp, status.connected, status.ping_latency, status.ping_drop_rate, status.obstructed)
+
+    def latest(self) -> Optional[Tuple[float, bool, float, float, bool]]:
+        """The newest sample as `(timestamp, connected, latency, drop_rate, obstructed)`."""
+        if self._size == 0:
+            return None
+        ix = (self._start + self._size - 1) % self.capacity
+        return (self._time[ix], bool(self._connected[ix]), self._latency[ix], self._drop_rate[ix],
+                bool(self._obstructed[ix]))
+
+    def _first_in_window(self, window: Optional[float]) -> int:
+        if window is None or self._size == 0:
+            return 0
+        cutoff = self._time[(self._start + self._size - 1) % self.capacity] - window
+        return bisect_left(range(self._size), cutoff, key=lambda i: self._time[(self._start + i) % self.capacity])
+
+    def _segments(self, window: Optional[float]) -> Iterator[Tuple[int, int]]:
+        """Yield the contiguous `[lo, hi)` ranges of the underlying arrays covering the window."""
+        first = self._first_in_window(window)
+        lo = (self._start + first) % self.capacity
+        count = self._size - first
+        if count <= 0:
+            return
+        if lo + count <= self.capacity:
+            yield lo, lo + count
+        else:
+            yield lo, self.capacity
+            yield 0, lo + count - self.capacity
+
+    def count(self, window: Optional[float] = None) -> int:
+        return self._size - self._first_in_window(window)
+
+    def uptime(self, window: Optional[float] = None) -> Optional[float]:
+        """The fraction of samples in the window where the dish was connected."""
+        total = self.count(window)
+        if total == 0:
+            return None
+        return sum(sum(self._connected[lo:hi]) for lo, hi in self._segments(window)) / total
+
+    def obstructed_fraction(self, window: Optional[float] = None) -> Optional[float]:
+        total = self.count(window)
+        if total == 0:
+            return None
+        return sum(sum(self._obstructed[lo:hi]) for lo, hi in self._segments(window)) / total
+
+    def mean_drop_rate(self, window: Optional[float] = None) -> Optional[float]:
+        total = self.count(window)
+        if total == 0:
+            return None
+        return sum(sum(self._drop_rate[lo:hi]) for lo, hi in self._segments(window)) / total
+
+    def latency_percentile(self, percentile: float, window: Optional[float] = None) -> Optional[float]:
+        """The latency percentile (0-100) over connected samples in the window, in milliseconds."""
+        latencies = array('f')
+        for lo, hi in self._segments(window):
+            latencies.extend(latency for latency, connected in zip(self._latency[lo:hi], self._connected[lo:hi])
+                             if connected)
+        if len(latencies) == 0:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+    def outage_count(self, window: Optional[float] = None) -> int:
+        """The number of times the dish went from connected to disconnected within the window."""
+        connected = b''.join(self._connected[lo:hi].tobytes() for lo, hi in self._segments(window))
+        return connected.count(b'\x01\x00')
@@ -0,0 +1,118 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+import os
+import random
+from typing import Dict, List
+
+from cradlepoint.api import CradlepointRouter
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher, stop_on_sigterm
+from internet_switcher.leader import default_lock_path
+from internet_switcher.metrics import SITE, Instrumentation
+from internet_switcher.util.logging import LoggingMixin
+
+
+class Supervisor(LoggingMixin):
+    """Runs one `InternetSwitcher` per site, all on one event loop.
+
+    Every site's router shares one connection pool, while each router still caps its own in-flight
+    requests at its `cradlepoint_pool_size`, so a slow site can't take every connection. The pool
+    itself is tuned by the first site's config. A site that fails is closed and restarted with
+    jittered exponential backoff without affecting the others.
+
+    Metrics recorded by a site's switcher are labelled with its name, and in HA file mode each site
+    gets its own lease file unless one is configured. Process-wide settings (metrics server,
+    profiling) come from the environment, since there's no single config file for them.
+    """
+    def __init__(self, sites: Dict[str, Config], restart_delay: float = 1.0, max_restart_delay: float = 60.0):
+        self.sites = sites
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.connector = None
+        self.switchers: Dict[str, InternetSwitcher] = {}
+        self.failures = {name: 0 for name in sites}
+        self.check_shared_settings()
+
+    # Settings of the shared connection pool, which only the first site's config can set
+    CONNECTOR_FIELDS = ('cradlepoint_dns_cache_ttl', 'cradlepoint_force_close', 'cradlepoint_keepalive_timeout')
+
+    def check_shared_settings(self):
+        sites = list(self.sites.items())
+        first_name, first = sites[0]
+        for name, config in sites[1:]:
+            for field in self.CONNECTOR_FIELDS:
+                if getattr(config, field) != getattr(first, field):
+                    self.warning("[%s] %s is ignored: the shared connection pool uses %s's %r", name, field,
+                                 first_name, getattr(first, field), site=name)
+        lease_paths = {}
+        for name, config in sites:
+            if config.ha_mode == 'file':
+                path = config.ha_lease_path or default_lock_path(name)
+                other = lease_paths.setdefault(path, name)
+                if other != name:
+                    raise ValueError(f"Sites {other} and {name} share the HA lease {path}, "
+                                     f"so only one of them could ever lead")
+
+    @classmethod
+    def from_config_files(cls, paths: List[str]) -> 'Supervisor':
+        """Load one site per config file, named after the file."""
+        sites = {}
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            sites[name] = Config.from_config(path)
+        return cls(sites)
+
+    @classmethod
+    async def main(cls, paths: List[str]):
+        cls.info("Loading site configs")
+        supervisor = cls.from_config_files(paths)
+        instrumentation = Instrumentation(Config.from_env())
+        stop_on_sigterm()
+        try:
+            await instrumentation.start()
+            cls.info("Supervising %d sites", len(supervisor.sites))
+            await supervisor.run()
+        finally:
+            await instrumentation.stop()
+
+    def make_switcher(self, name: str, config: Config) -> InternetSwitcher:
+        return InternetSwitcher(config, cradlepoint=CradlepointRouter(config, connector=self.connector))
+
+    async def run(self):
+        configs = list(self.sites.values())
+        if configs:
+            self.connector = CradlepointRouter.make_connector(
+                configs[0], limit=sum(config.cradlepoint_pool_size for config in configs))
+        tasks = [asyncio.create_task(self.run_site(name, config), name=f"site-{name}")
+                 for name, config in self.sites.items()]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.connector is not None:
+                await self.connector.close()
+
+    async def run_site(self, name: str, config: Config):
+        """Run a site's switcher, restarting it whenever it stops or fails."""
+        # Inherited by every task the switcher starts, so its metrics are labelled with the site
+        SITE.set(name)
+        delay = self.restart_delay
+        while True:
+            switcher = self.switchers[name] = self.make_switcher(name, config)
+            try:
+                await switcher.connect()
+                delay = self.restart_delay
+                await switcher.run()
+                self.warning("[%s] Switcher stopped", name, site=name)
+            except Exception as e:
+                self.failures[name] += 1
+                self.error("[%s] Switcher failed: %r", name, e, exc_info=True, site=name)
+            finally:
+                await switcher.close()
+            wait = delay * random.uniform(0.5, 1.0)
+            self.info("[%s] Restarting in %.1fs", name, wait, site=name)
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, self.max_restart_delay)
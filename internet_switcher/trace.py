@@ -0,0 +1,129 @@
+# SPDX-License-Identifier: Unlicense
+
+"""Recording dish statuses and router requests to a trace file, and reading them back.
+
+Traces are gzip-compressed JSON lines, one record per line, written and read as a stream so a
+long trace never has to fit in memory. Every record has a timestamp `t` (seconds) and a kind `k`:
+
+- `dish`: a status sample, with `c` (connected), `o` (obstructed), `d` (drop rate) and `l` (latency)
+- `dish_error`: a failed status request
+- `router`: a router request, with `m` (method), `p` (path), `v` (value, for PUTs) and `r` (response)
+
+The writer sync-flushes the gzip stream every `flush_interval` seconds, so if the process dies
+without closing it, everything up to the last flush can still be read back: `read_trace` stops at
+the truncated tail instead of failing.
+"""
+
+import gzip
+import io
+import json
+import logging
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+from spacex.starlink import CommunicationError, DishStatus
+
+if TYPE_CHECKING:
+    from spacex.starlink.aio import AsyncStarlinkDish
+
+logger = logging.getLogger(__name__)
+
+
+class RecordedStatus:
+    """A dish status read back from a trace, with the same fields the switcher reads from `DishStatus`."""
+    __slots__ = ('connected', 'obstructed', 'ping_drop_rate', 'ping_latency')
+
+    def __init__(self, connected=True, obstructed=False, ping_drop_rate=0.0, ping_latency=40.0):
+        self.connected = connected
+        self.obstructed = obstructed
+        self.ping_drop_rate = ping_drop_rate
+        self.ping_latency = ping_latency
+
+    @classmethod
+    def from_record(cls, record: dict) -> 'RecordedStatus':
+        return cls(bool(record['c']), bool(record['o']), record['d'], record['l'])
+
+
+class TraceWriter:
+    def __init__(self, path: str, clock=time.time, flush_interval: float = 5.0):
+        self.path = path
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.gzip = gzip.GzipFile(path, 'wb')
+        self.file = io.TextIOWrapper(self.gzip, encoding='utf-8')
+        self.flushed_at = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _write(self, record: dict):
+        self.file.write(json.dumps(record, separators=(',', ':')))
+        self.file.write('\n')
+        if time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Make everything written so far readable, even if the file is never closed."""
+        self.file.flush()
+        self.gzip.flush(zlib.Z_SYNC_FLUSH)
+        self.flushed_at = time.monotonic()
+
+    def write_status(self, status: DishStatus, timestamp: Optional[float] = None):
+        self._write({
+            't': self.clock() if timestamp is None else timestamp,
+            'k': 'dish',
+            'c': int(status.connected),
+            'o': int(status.obstructed),
+            'd': round(status.ping_drop_rate, 4),
+            'l': round(status.ping_latency, 2),
+        })
+
+    def write_dish_error(self, timestamp: Optional[float] = None):
+        self._write({'t': self.clock() if timestamp is None else timestamp, 'k': 'dish_error'})
+
+    def write_router(self, method: str, path: str, value: Any, response: Any, timestamp: Optional[float] = None):
+        record = {'t': self.clock() if timestamp is None else timestamp, 'k': 'router', 'm': method, 'p': path}
+        if value is not None:
+            record['v'] = value
+        record['r'] = response
+        self._write(record)
+
+    def close(self):
+        self.file.close()
+
+
+def read_trace(path: str) -> Iterator[dict]:
+    """Stream the records of a trace, in order, up to where it was cut off if it wasn't closed."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if not line.endswith('\n'):
+                    logger.warning("Ignoring a partial record at the end of %s", path)
+                    return
+                if line.strip():
+                    yield json.loads(line)
+        except EOFError:
+            logger.warning("%s ends abruptly; it was probably not closed", path)
+
+
+class RecordingDish:
+    """Wraps a dish client and records every status it fetches."""
+    def __init__(self, dish: 'AsyncStarlinkDish', writer: TraceWriter):
+        self.dish = dish
+        self.writer = writer
+
+    def __getattr__(self, name):
+        return getattr(self.dish, name)
+
+    async def fetch_status(self) -> DishStatus:
+        try:
+            status = await self.dish.fetch_status()
+        except CommunicationError:
+            self.writer.write_dish_error()
+            raise
+        self.writer.write_status(status)
+        return status
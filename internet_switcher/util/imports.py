@@ -0,0 +1,12 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+import importlib
+from types import ModuleType
+
+
+async def import_module(name: str) -> ModuleType:
+    """Import a module on a worker thread, so a heavy import (like aiohttp) doesn't stall the event loop.
+
+    The import still competes for the GIL, but the loop keeps getting turns to answer probes."""
+    return await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, name)
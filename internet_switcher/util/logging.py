@@ -1,17 +1,36 @@
 # SPDX-License-Identifier: Unlicense
 
+import json
 import logging
+import logging.handlers
+import queue
+import sys
+
+
+def _level_method(logger: logging.Logger, level: int):
+    """A log method that checks the level before doing anything else.
+
+    Call it like `self.debug("Fetched %s in %.3fs", path, elapsed, router=name)`: the message is only
+    %-formatted if a handler will actually see it, and keyword arguments are attached to the record
+    as structured `fields`."""
+    def log(msg, *args, exc_info=None, **fields):
+        if logger.isEnabledFor(level):
+            logger.log(level, msg, *args, exc_info=exc_info, extra={'fields': fields} if fields else None,
+                       stacklevel=2)
+    return staticmethod(log)
+
 
 class LoggingMeta(type):
     def __new__(cls, name, bases, dct):
         logger = logging.getLogger(f"{__name__}.{name}")
         dct.update({
-            'debug': logger.debug,
-            'info': logger.info,
-            'warning': logger.warning,
-            'error': logger.error,
-            'critical': logger.critical,
+            'debug': _level_method(logger, logging.DEBUG),
+            'info': _level_method(logger, logging.INFO),
+            'warning': _level_method(logger, logging.WARNING),
+            'error': _level_method(logger, logging.ERROR),
+            'critical': _level_method(logger, logging.CRITICAL),
             'log': logger.log,
+            'isEnabledFor': logger.isEnabledFor,
             '_logger': logger
         })
         mixin = super().__new__(cls, name, bases, dct)
@@ -19,3 +38,66 @@ class LoggingMeta(type):
 
 class LoggingMixin(object, metaclass=LoggingMeta):
     pass
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one line of JSON, including any structured `fields`."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            't': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name.rsplit('.', 1)[-1],
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=repr)
+
+
+class TextFormatter(logging.Formatter):
+    """The usual one-line text format, with any structured `fields` appended as `key=value`."""
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f"{key}={value!r}" for key, value in fields.items())
+        return message
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the stock handler, don't run the formatter here: just resolve what can't safely cross
+        # threads (the arguments and the traceback) and leave the rest to the listener. The record
+        # isn't copied, since this is the only handler that sees it.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = 'INFO', format: str = 'json', stream=None) -> logging.handlers.QueueListener:
+    """Send all logging through a queue to a background thread that formats and writes it.
+
+    The event loop only pays for putting the record on the queue. Returns the listener, which
+    should be stopped on exit to flush what's left."""
+    formatter = JsonFormatter() if format == 'json' else TextFormatter()
+    output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    output.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(level.upper())
+    listener.start()
+    return listener
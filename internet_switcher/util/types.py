@@ -1,4 +1,11 @@
 def try_bool(value, default=None):
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ('1', 'true', 'yes', 'on'):
+            return True
+        if lowered in ('0', 'false', 'no', 'off', ''):
+            return False
+        return default
     try:
         return bool(value)
     except ValueError:
@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+from typing import TYPE_CHECKING, List, Optional
+
+from internet_switcher.util.logging import LoggingMixin
+
+if TYPE_CHECKING:
+    from cradlepoint.mirror import RouterMirror
+    from cradlepoint.wan import WanDevice
+
+
+class WanRuleSnapshot(LoggingMixin):
+    """A locally cached copy of the ethernet and cellular WAN rule priorities.
+
+    Cradlepoint prefers the WAN rule with the *lower* priority value. Every local write bumps
+    `version`, so a refresh that was in flight while we wrote is discarded instead of overwriting
+    the cache with a stale value.
+
+    With `follow`, the priorities are kept up to date from a `RouterMirror` of `config/wan/rules2`
+    instead, and `drifted` tells whether the router's preference has moved away from the one we last
+    asked for.
+    """
+    def __init__(self, ethernet: 'WanDevice', cellular: 'WanDevice', offset: float = 1.1):
+        self.ethernet = ethernet
+        self.cellular = cellular
+        self.offset = offset
+        self.eth_priority: Optional[float] = None
+        self.cell_priority: Optional[float] = None
+        self.version = 0
+        self.refreshed_at: Optional[float] = None
+        self.desired_cellular: Optional[bool] = None
+        self.written_at: Optional[float] = None
+        self.mirror: Optional['RouterMirror'] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.eth_priority is not None and self.cell_priority is not None
+
+    @property
+    def cellular_preferred(self) -> bool:
+        return self.cell_priority < self.eth_priority
+
+    @property
+    def drifted(self) -> bool:
+        """Whether the router prefers a different WAN than we last asked for."""
+        return self.desired_cellular is not None and self.loaded and self.cellular_preferred != self.desired_cellular
+
+    def retarget(self, ethernet: 'WanDevice', cellular: 'WanDevice'):
+        """Point the snapshot at (possibly re-enumerated) devices and forget the cached priorities."""
+        self.ethernet = ethernet
+        self.cellular = cellular
+        self.eth_priority = self.cell_priority = None
+        self.version += 1
+
+    def follow(self, mirror: 'RouterMirror'):
+        """Take the priorities from `mirror`'s copy of the WAN rules whenever they change."""
+        api = self.cellular.api
+        self.mirror = mirror
+        mirror.watch(api.config.wan.rules2, self.apply_rules)
+
+    async def apply_rules(self, rules: List[dict]):
+        """Update the priorities from a freshly fetched `config/wan/rules2`."""
+        if self.written_at is not None and self.mirror.sweep_started_at < self.written_at:
+            # The sweep may have read the rules before our own write landed
+            self.debug("Discarding mirrored WAN rules that raced a local write")
+            return
+        priorities = {rule.get('_id_'): rule.get('priority') for rule in rules}
+        self._update(priorities.get(self.ethernet.id), priorities.get(self.cellular.id))
+
+    async def refresh(self) -> bool:
+        """Re-read both priorities from the router.
+
+        Returns False if the result was discarded because of a concurrent local write."""
+        version = self.version
+        api = self.cellular.api
+        async with api.batch() as batch:
+            eth_future = batch.get(api.config.wan.rules2[self.ethernet.id].priority)
+            cell_future = batch.get(api.config.wan.rules2[self.cellular.id].priority)
+        if version != self.version:
+            self.debug("Discarding WAN rule refresh that raced a local write")
+            return False
+        self._update(eth_future.result(), cell_future.result())
+        return True
+
+    def _update(self, eth_priority: Optional[float], cell_priority: Optional[float]):
+        if self.loaded and (eth_priority, cell_priority) != (self.eth_priority, self.cell_priority):
+            self.warning("WAN rules changed on the router: eth=%s, cell=%s", eth_priority, cell_priority)
+        if (eth_priority, cell_priority) != (self.eth_priority, self.cell_priority):
+            self.eth_priority, self.cell_priority = eth_priority, cell_priority
+            self.version += 1
+        self.refreshed_at = asyncio.get_running_loop().time()
+
+    async def prioritize(self, cellular: bool) -> bool:
+        """Make cellular (or ethernet) the preferred WAN with at most one PUT.
+
+        Returns whether a write was needed."""
+        self.desired_cellular = cellular
+        if not self.loaded:
+            await self.refresh()
+        self.debug("Priority: eth=%s, cell=%s", self.eth_priority, self.cell_priority)
+        if self.cellular_preferred == cellular:
+            return False
+
+        target = self.eth_priority - self.offset if cellular else self.eth_priority + self.offset
+        self.version += 1
+        try:
+            await self.cellular.priority(target)
+        except BaseException:
+            # We no longer know what the router has; reload before the next switch.
+            self.cell_priority = None
+            raise
+        finally:
+            self.version += 1
+            self.written_at = asyncio.get_running_loop().time()
+        self.cell_priority = target
+        return True
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+
+from benchmarks.fakes import FakeDish
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher
+from internet_switcher.policies import ConnectedPolicy, PredictivePolicy
+from internet_switcher.starlink_monitor import StarlinkMonitor
+
+
+def make_switcher() -> InternetSwitcher:
+    config = Config()
+    config.config_watch_interval = 0
+    switcher = InternetSwitcher(config, starlink=FakeDish([]))
+    switcher.monitor = StarlinkMonitor(switcher.starlink, policy=ConnectedPolicy())
+    return switcher
+
+
+def reloaded(**fields) -> Config:
+    config = Config()
+    config.config_watch_interval = 0
+    for field, value in fields.items():
+        setattr(config, field, value)
+    return config
+
+
+def test_valid_config_is_applied():
+    switcher = make_switcher()
+    config = reloaded(decision_policy='predictive', starlink_max_interval=0.75)
+    asyncio.run(switcher.apply_config(config))
+    assert switcher.config is config
+    assert isinstance(switcher.monitor.policy, PredictivePolicy)
+    assert switcher.monitor.max_interval == 0.75
+
+
+def test_unknown_policy_keeps_the_running_config():
+    switcher = make_switcher()
+    old, policy = switcher.config, switcher.monitor.policy
+    asyncio.run(switcher.apply_config(reloaded(decision_policy='nope', starlink_max_interval=0.75)))
+    assert switcher.config is old
+    assert switcher.monitor.policy is policy
+    assert switcher.monitor.max_interval == old.starlink_max_interval
+
+
+def test_invalid_intervals_keep_the_running_config():
+    switcher = make_switcher()
+    old = switcher.config
+    for fields in ({'probe_interval': -1.0}, {'starlink_min_interval': 2.0, 'starlink_max_interval': 1.0},
+                   {'probe_targets': 'bogus:1.1.1.1'}, {'rule_refresh_interval': 0.0},
+                   {'discovery_interval': 0.0}, {'history_flush_interval': 0.0}):
+        asyncio.run(switcher.apply_config(reloaded(**dict({'rule_refresh_interval': 1.0}, **fields))))
+        assert switcher.config is old
+        assert switcher.watcher.interval == old.config_watch_interval
+
+
+def test_zero_watch_interval_stops_the_watcher():
+    async def reload_with_zero(switcher: InternetSwitcher):
+        switcher.watcher.interval = 5.0
+        switcher.watcher.start()
+        await switcher.apply_config(reloaded(config_watch_interval=0))
+        return switcher.watcher.task
+
+    switcher = make_switcher()
+    assert asyncio.run(reload_with_zero(switcher)) is None
+    assert switcher.config.config_watch_interval == 0
@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from benchmarks.stub_router import StubRouter
+from cradlepoint.api import CradlepointRouter
+from cradlepoint.batch import _slice
+from internet_switcher.config import Config
+
+
+class CountingStubRouter(StubRouter):
+    """Records the paths requested and how many requests were in flight at once."""
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency=latency)
+        self.paths = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.paths.append((request.method, request.match_info['path'].strip('/')))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super().handle(request)
+        finally:
+            self.in_flight -= 1
+
+
+async def with_router(test, latency: float = 0.0):
+    stub = await CountingStubRouter(latency).start()
+    config = Config()
+    config.cradlepoint_ip_address = '127.0.0.1'
+    config.cradlepoint_port = str(stub.port)
+    router = CradlepointRouter(config)
+    try:
+        return await test(router), stub
+    finally:
+        await router.close()
+        await stub.stop()
+
+
+def test_parent_and_child_gets_are_coalesced():
+    async def test(api):
+        async with api.batch() as batch:
+            rule = batch.get(api.config.wan.rules2['00000001-mdm'].priority)
+            rules = batch.get(api.config.wan.rules2)
+            first = batch.get(api.config.wan.rules2[0])
+        return rules.result(), first.result(), rule.result()
+
+    (rules, first, priority), stub = asyncio.run(with_router(test))
+    assert stub.paths == [('GET', 'config/wan/rules2')]
+    assert first == rules[0]
+    assert priority == next(rule['priority'] for rule in rules if rule['_id_'] == '00000001-mdm')
+
+
+def test_missing_child_fails_only_its_own_future():
+    async def test(api):
+        batch = api.batch()
+        rules = batch.get(api.config.wan.rules2)
+        missing = batch.get(api.config.wan.rules2['nope'])
+        with pytest.raises(KeyError):
+            await batch.run()
+        return rules.result(), missing
+
+    (rules, missing), stub = asyncio.run(with_router(test))
+    assert rules and isinstance(missing.exception(), KeyError)
+
+
+def test_concurrency_is_capped():
+    async def test(api):
+        async with api.batch(limit=2) as batch:
+            futures = [batch.put(api.config.wan.rules2[n].priority, float(n)) for n in range(2)]
+            futures += [batch.get(api.status.product_info), batch.get(api.status.wan.devices),
+                        batch.get(api.config.wan.rules2)]
+        return futures
+
+    futures, stub = asyncio.run(with_router(test, latency=0.05))
+    assert all(future.done() and future.exception() is None for future in futures)
+    assert stub.max_in_flight == 2
+    # All GETs go out before any PUT
+    assert [method for method, _ in stub.paths] == ['GET'] * 3 + ['PUT'] * 2
+    assert [rule['priority'] for rule in stub.tree['config']['wan']['rules2'][:2]] == [0.0, 1.0]
+
+
+def test_slice():
+    data = {'rules': [{'_id_': 'a', 'priority': 1}, {'_id_': 'b', 'priority': 2}]}
+    assert _slice(data, '') is data
+    assert _slice(data, 'rules/1/priority') == 2
+    assert _slice(data, 'rules/a') == data['rules'][0]
+    with pytest.raises(KeyError):
+        _slice(data, 'rules/c')
+    with pytest.raises(IndexError):
+        _slice(data, 'rules/2')
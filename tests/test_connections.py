@@ -0,0 +1,58 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+
+from benchmarks.fakes import FakeDish
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher
+from internet_switcher.simulator import SimulatedRouter, VirtualClockLoop
+
+
+class FlakyRouter(SimulatedRouter):
+    """Times out the first time `failing` is requested."""
+    def __init__(self, failing: str):
+        super().__init__()
+        self.failing = failing
+        self.failed = False
+
+    async def request(self, method: str, path, value=None):
+        if not self.failed and str(path).strip('/') == self.failing:
+            self.failed = True
+            await asyncio.sleep(self.latency)
+            raise asyncio.TimeoutError()
+        return await super().request(method, path, value)
+
+
+async def run_through_outage(router: SimulatedRouter) -> InternetSwitcher:
+    config = Config()
+    config.config_watch_interval = 0
+    switcher = InternetSwitcher(config, starlink=FakeDish([(1.0, 60.0)]), cradlepoint=router)
+    await switcher.connect()
+    run_task = asyncio.create_task(switcher.run())
+    try:
+        await asyncio.sleep(10)
+        assert not run_task.done()
+    finally:
+        run_task.cancel()
+        await asyncio.gather(run_task, return_exceptions=True)
+        await switcher.close()
+    return switcher
+
+
+def cellular_preferred(router: SimulatedRouter) -> bool:
+    priorities = {rule['_id_']: rule['priority'] for rule in router.tree['config']['wan']['rules2']}
+    return priorities['00000001-mdm'] < priorities['00000000-eth']
+
+
+def test_setup_failure_is_retried():
+    for failing in ('status/wan/devices', 'config/wan/rules2'):
+        router = FlakyRouter(failing)
+        loop = VirtualClockLoop()
+        try:
+            switcher = loop.run_until_complete(run_through_outage(router))
+        finally:
+            loop.close()
+        assert router.failed, failing
+        assert router.writes, failing
+        assert cellular_preferred(router), failing
+        assert switcher.connections.done() and switcher.connections.exception() is None
@@ -0,0 +1,102 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import FakeDish
+from internet_switcher.dispatcher import ActionDispatcher
+from internet_switcher.simulator import VirtualClockLoop
+from internet_switcher.starlink_monitor import StarlinkMonitor
+
+
+def run(coroutine):
+    loop = VirtualClockLoop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_gives_up_after_max_retries():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        raise asyncio.TimeoutError()
+
+    async def main():
+        dispatcher = ActionDispatcher(retry_delay=1.0, max_retries=3)
+        dispatcher.add_action(False, fail)
+        dispatcher.start()
+        dispatcher.request(False)
+        await asyncio.wait_for(dispatcher.task, 60)
+
+    with pytest.raises(asyncio.TimeoutError):
+        run(main())
+    assert len(calls) == 4
+
+
+def test_success_resets_the_failure_count():
+    outcomes = [False, False, True, False, False, True]
+
+    async def flaky():
+        if not outcomes.pop(0):
+            raise ConnectionError()
+
+    async def main():
+        dispatcher = ActionDispatcher(retry_delay=1.0, max_retries=2)
+        dispatcher.add_action(True, flaky)
+        dispatcher.add_action(False, flaky)
+        dispatcher.start()
+        dispatcher.request(True)
+        await asyncio.sleep(10)
+        dispatcher.request(False)
+        await asyncio.sleep(10)
+        assert not dispatcher.task.done()
+        return dispatcher.applied
+
+    assert run(main()) is False
+    assert outcomes == []
+
+
+def test_monitor_wait_raises_when_the_dispatcher_gives_up():
+    async def fail():
+        raise ConnectionError()
+
+    async def main():
+        dish = FakeDish([(1.0, 60.0)])
+        await dish.connect()
+        monitor = StarlinkMonitor(dish, stable_after=0)
+        monitor.dispatcher.retry_delay = 0.5
+        monitor.dispatcher.max_retries = 2
+        monitor.on_unstable(fail)
+        monitor.start()
+        try:
+            await monitor.wait(30)
+        finally:
+            monitor.stop()
+
+    with pytest.raises(ConnectionError):
+        run(main())
+
+
+def test_reassert_while_running_runs_again():
+    calls = []
+
+    async def slow():
+        calls.append(asyncio.get_running_loop().time())
+        await asyncio.sleep(1.0)
+
+    async def main():
+        dispatcher = ActionDispatcher()
+        dispatcher.add_action(True, slow)
+        dispatcher.start()
+        dispatcher.request(True)
+        await asyncio.sleep(0.5)
+        dispatcher.reassert()
+        await asyncio.sleep(5)
+        return dispatcher.applied
+
+    assert run(main()) is True
+    assert len(calls) == 2
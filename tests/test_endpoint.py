@@ -0,0 +1,35 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+
+from benchmarks.endpoint_paths import NullRouter
+from cradlepoint.api import Endpoint
+
+
+def test_any_segment_name_is_a_child():
+    api = NullRouter()
+    for name in ('url', '_child', '_children', '_api', '_url', '_endpoint_path', '_id_'):
+        child = getattr(api.config.foo, name)
+        assert isinstance(child, Endpoint), name
+        assert str(child) == 'config/foo/' + name
+        assert child.__url__ == '/api/config/foo/' + name
+
+
+def test_children_are_cached_per_name():
+    api = NullRouter()
+    rules = api.config.wan.rules2
+    assert rules[0] is rules[0]
+    assert rules._0 is rules._0
+    assert str(rules._0) == str(rules[0]) == 'config/wan/rules2/0'
+
+
+def test_calling_a_child_named_like_an_attribute_puts_to_it():
+    requests = []
+
+    class RecordingRouter(NullRouter):
+        async def request(self, method: str, path, value=None):
+            requests.append((method, str(path), value))
+            return value
+
+    asyncio.run(RecordingRouter().config.foo.url('x'))
+    assert requests == [('PUT', 'config/foo/url', 'x')]
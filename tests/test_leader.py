@@ -0,0 +1,99 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+
+from benchmarks.fakes import FakeDish
+from internet_switcher.config import Config
+from internet_switcher.core import InternetSwitcher
+from internet_switcher.leader import APPDATA_NAME, APPDATA_PATH, LeaderElection, RouterLease
+from internet_switcher.simulator import SimulatedRouter, VirtualClockLoop
+
+
+def run(coroutine):
+    loop = VirtualClockLoop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def router_election(router: SimulatedRouter, instance_id: str, ttl: float = 30.0) -> LeaderElection:
+    """The election the switcher would run in router HA mode."""
+    config = Config()
+    config.ha_mode = 'router'
+    config.ha_ttl = ttl
+    config.ha_instance_id = instance_id
+    switcher = InternetSwitcher(config, starlink=FakeDish([]), cradlepoint=router)
+    return switcher.make_election()
+
+
+def appdata(router: SimulatedRouter) -> list:
+    return router.tree['config']['system']['sdk']['appdata']
+
+
+def test_router_lease_renews_every_third_of_the_ttl():
+    router = SimulatedRouter(latency=0.01)
+
+    async def main():
+        election = router_election(router, 'a')
+        assert election.interval == 10.0
+        election.start()
+        await asyncio.sleep(65)
+        await election.stop()
+        return election
+
+    election = run(main())
+    assert not election.leading
+    beats = [t for t, path, value in router.writes if path.endswith('/value') and value]
+    assert len(beats) == 7
+    assert all(abs(b - a - 10.0) < 0.1 for a, b in zip(beats, beats[1:]))
+    # Released on stop
+    assert router.writes[-1][2] == ''
+
+
+def test_standby_takes_over_after_the_ttl():
+    router = SimulatedRouter(latency=0.01)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        leader = router_election(router, 'a', ttl=6.0)
+        standby = router_election(router, 'b', ttl=6.0)
+        elected_at = []
+
+        async def elected():
+            elected_at.append(loop.time())
+
+        standby.on_elected = elected
+        leader.start()
+        await asyncio.sleep(1)
+        standby.start()
+        await asyncio.sleep(20)
+        assert leader.leading and not standby.leading
+        # The leader dies without releasing the lease
+        leader.task.cancel()
+        died_at = loop.time()
+        await asyncio.sleep(20)
+        await standby.stop()
+        return elected_at[0] - died_at
+
+    takeover = run(main())
+    # Between the TTL less one interval and the TTL plus two
+    assert 6.0 - 2.0 <= takeover <= 6.0 + 4.0
+
+
+def test_router_lease_lives_in_its_own_app_data_entry():
+    router = SimulatedRouter(latency=0.01)
+    appdata(router).append({'name': 'other-app', 'value': 'x'})
+
+    async def main():
+        lease = RouterLease(router, instance_id='a')
+        assert await lease.acquire()
+        # Another app's entry moving ours doesn't lose the lease
+        appdata(router).insert(0, {'name': 'newer-app', 'value': 'y'})
+        assert await lease.acquire()
+
+    run(main())
+    assert [entry['name'] for entry in appdata(router)] == ['newer-app', 'other-app', APPDATA_NAME]
+    assert appdata(router)[2]['value'] == 'a:2'
+    assert {entry['value'] for entry in appdata(router)[:2]} == {'x', 'y'}
+    assert all(path.startswith(APPDATA_PATH) for _, path, _ in router.writes)
@@ -0,0 +1,79 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+import os
+import shutil
+import sqlite3
+
+from internet_switcher.outage_store import OutageStore
+
+
+def record_outages(store: OutageStore):
+    """Cellular from 100 to 130, 200 to 260 and 300 onwards."""
+    for at, stable, ack in ((100.0, False, 1.0), (130.0, True, None), (200.0, False, 3.0), (260.0, True, None),
+                            (300.0, False, 2.0)):
+        store.record(stable, at=at, ack_seconds=ack)
+
+
+def test_opens_in_wal_mode(tmp_path):
+    path = str(tmp_path / 'outages.db')
+
+    async def main():
+        store = OutageStore(path)
+        await store.open()
+        record_outages(store)
+        await store.flush()
+        # Another process can read while the switcher holds the database open
+        with sqlite3.connect(path) as reader:
+            mode = reader.execute('PRAGMA journal_mode').fetchone()[0]
+            count = reader.execute('SELECT COUNT(*) FROM transitions').fetchone()[0]
+        await store.close()
+        return mode, count
+
+    assert asyncio.run(main()) == ('wal', 5)
+
+
+def test_reopens_after_an_unclean_close(tmp_path):
+    path = str(tmp_path / 'outages.db')
+    killed = str(tmp_path / 'killed.db')
+
+    async def write():
+        store = OutageStore(path)
+        await store.open()
+        record_outages(store)
+        await store.flush()
+        store.record(True, at=400.0)
+        # What's on disk if the process were killed now: the flushed rows, still in the WAL
+        assert os.path.exists(path + '-wal')
+        for suffix in ('', '-wal'):
+            shutil.copy(path + suffix, killed + suffix)
+        await store.close()
+
+    async def reopen():
+        store = OutageStore(killed)
+        await store.open()
+        try:
+            return store.last_state, store.last_at, await store.outage_count(0.0)
+        finally:
+            await store.close()
+
+    asyncio.run(write())
+    assert asyncio.run(reopen()) == (False, 300.0, 3)
+
+
+def test_queries_by_time_range(tmp_path):
+    async def main():
+        store = OutageStore(str(tmp_path / 'outages.db'))
+        await store.open()
+        record_outages(store)
+        try:
+            return ([await store.outage_count(since) for since in (0.0, 150.0, 250.0, 350.0)],
+                    [await store.mean_time_to_failover(since) for since in (0.0, 150.0, 350.0)],
+                    [await store.cellular_seconds(since, now=330.0) for since in (0.0, 120.0, 220.0, 320.0)])
+        finally:
+            await store.close()
+
+    counts, means, cellular = asyncio.run(main())
+    assert counts == [3, 2, 1, 0]
+    assert means == [2.0, 2.5, None]
+    assert cellular == [120.0, 100.0, 70.0, 10.0]
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: Unlicense
+
+from internet_switcher.policies import ConnectedPolicy
+from internet_switcher.probes import ProbeWindow
+from internet_switcher.status_history import StatusHistory
+from internet_switcher.trace import RecordedStatus
+
+CONNECTED = RecordedStatus(connected=True)
+DOWN = RecordedStatus(connected=False, ping_drop_rate=1.0)
+
+
+def make_policy(stable_after: float = 5):
+    window = ProbeWindow(window=10)
+    policy = ConnectedPolicy(stable_after)
+    policy.use_probes(window, loss=0.5, recover_loss=0.1)
+    return policy, window, StatusHistory(100)
+
+
+def probe(window: ProbeWindow, now: float, **targets):
+    for target, ok in targets.items():
+        window.record(now, 0.02 if ok else None, target)
+
+
+def test_dish_outage_fails_over_and_recovers():
+    policy = ConnectedPolicy(stable_after=5)
+    history = StatusHistory(100)
+    assert policy.decide(DOWN, 0, history, True) is False
+    decisions = [policy.decide(CONNECTED, t, history, False) for t in range(1, 8)]
+    assert True in decisions
+    assert decisions.index(True) == 5
+
+
+def test_one_dead_probe_target_does_not_fail_over():
+    policy, window, history = make_policy()
+    for t in range(10):
+        probe(window, t, resolver=False, web=True)
+        assert policy.decide(CONNECTED, t, history, True) is None
+
+
+def test_majority_of_probe_targets_dead_fails_over():
+    policy, window, history = make_policy()
+    decisions = []
+    for t in range(5):
+        probe(window, t, resolver=False, web=False, other=True)
+        decisions.append(policy.decide(CONNECTED, t, history, True))
+    assert False in decisions
+
+
+def test_switches_back_while_one_probe_target_stays_dead():
+    policy, window, history = make_policy(stable_after=5)
+    for t in range(5):
+        probe(window, t, resolver=False, web=False)
+    assert policy.decide(CONNECTED, 4, history, True) is False
+
+    # The path comes back, except for a resolver that stays blocked
+    decisions = []
+    for t in range(5, 40):
+        probe(window, t, resolver=False, web=True)
+        decisions.append(policy.decide(CONNECTED, t, history, False))
+    assert True in decisions
+
+
+def test_too_few_probes_are_ignored():
+    policy, window, history = make_policy()
+    probe(window, 0, web=False)
+    assert policy.decide(CONNECTED, 0, history, True) is None
@@ -0,0 +1,94 @@
+# SPDX-License-Identifier: Unlicense
+
+import asyncio
+
+from benchmarks.fakes import LoopbackDnsServer, LoopbackTcpServer
+from internet_switcher import probes
+from internet_switcher.probes import ProbeEngine, ProbeTarget, ProbeWindow
+
+
+def test_window_forgets_old_results():
+    window = ProbeWindow(window=10)
+    window.record(0.0, None, 'a')
+    window.record(5.0, 0.02, 'a')
+    window.record(11.0, 0.02, 'a')
+    assert len(window) == 2
+    assert window.loss_rate == 0.0
+
+
+def test_one_dead_target_of_two_is_not_quorum_loss():
+    window = ProbeWindow()
+    for t in range(5):
+        window.record(t, 0.02, 'tcp:1.1.1.1:443')
+        window.record(t, None, 'dns:10.0.0.53:53')
+    assert window.loss_rate == 0.5
+    assert window.quorum_loss == 0.0
+
+
+def test_majority_of_targets_dead_is_quorum_loss():
+    window = ProbeWindow()
+    for t in range(5):
+        window.record(t, 0.02, 'a')
+        window.record(t, None, 'b')
+        window.record(t, None, 'c')
+    assert window.quorum_loss == 1.0
+
+
+def test_quorum_loss_of_a_single_target_is_its_loss():
+    window = ProbeWindow()
+    window.record(0, None, 'a')
+    window.record(1, 0.02, 'a')
+    assert window.quorum_loss == 0.5
+    assert ProbeWindow().quorum_loss is None
+
+
+async def _probe_loopback():
+    tcp, dns = LoopbackTcpServer(), LoopbackDnsServer()
+    await tcp.up()
+    await dns.up()
+    engine = ProbeEngine({'starlink': None}, [ProbeTarget('tcp', '127.0.0.1', tcp.port),
+                                              ProbeTarget('dns', '127.0.0.1', dns.port)], timeout=0.2)
+    window = engine.windows['starlink']
+    try:
+        await engine.probe_round()
+        healthy = window.target_loss_rates()
+        dns.blackholed = True
+        window.results.clear()
+        await engine.probe_round()
+        dns_down = window.target_loss_rates()
+        await tcp.down()
+        window.results.clear()
+        await engine.probe_round()
+        all_down = window.quorum_loss
+    finally:
+        dns.close()
+    return healthy, dns_down, all_down
+
+
+def test_engine_against_loopback_servers():
+    healthy, dns_down, all_down = asyncio.run(_probe_loopback())
+    assert set(healthy.values()) == {0.0}
+    assert sorted(dns_down.values()) == [0.0, 1.0]
+    assert all_down == 1.0
+
+
+async def _run_with_broken_probe(monkeypatch):
+    calls = []
+
+    async def broken(target, source=None):
+        calls.append(target)
+        raise RuntimeError("unexpected")
+
+    monkeypatch.setitem(probes.PROBES, 'tcp', broken)
+    engine = ProbeEngine({'starlink': None}, [ProbeTarget('tcp', '127.0.0.1', 9)], interval=0.01)
+    engine.start()
+    await asyncio.sleep(0.1)
+    running = not engine.task.done()
+    engine.stop()
+    return len(calls), running
+
+
+def test_engine_keeps_probing_after_an_unexpected_error(monkeypatch):
+    calls, running = asyncio.run(_run_with_broken_probe(monkeypatch))
+    assert running
+    assert calls > 1
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: Unlicense
+
+from typing import Dict, List, Optional
+
+from internet_switcher.ranking import plan_priorities
+
+
+def apply(current: Dict[str, Optional[float]], writes: Dict[str, float], rules: List[str]) -> List[str]:
+    """`rules` in the order the router prefers them once `writes` land."""
+    priorities = dict(current, **writes)
+    assert all(priorities.get(rule) is not None for rule in rules)
+    assert len({priorities[rule] for rule in rules}) == len(rules)
+    return sorted(rules, key=lambda rule: priorities[rule])
+
+
+def test_already_ordered_needs_no_writes():
+    current = {'a': 1.1, 'b': 2.2, 'c': 3.3}
+    assert plan_priorities(current, ['a', 'b', 'c']) == {}
+
+
+def test_full_reversal_keeps_one_rule():
+    current = {'a': 1.1, 'b': 2.2, 'c': 3.3, 'd': 4.4}
+    order = ['d', 'c', 'b', 'a']
+    writes = plan_priorities(current, order)
+    assert writes == {'c': 5.5, 'b': 6.6, 'a': 7.7}
+    assert apply(current, writes, order) == order
+
+
+def test_full_reversal_keeps_the_anchor():
+    current = {'a': 1.1, 'b': 2.2, 'c': 3.3, 'd': 4.4}
+    order = ['d', 'c', 'b', 'a']
+    writes = plan_priorities(current, order, anchor='b')
+    assert writes == {'d': 0.0, 'c': 1.1, 'a': 3.3}
+    assert apply(current, writes, order) == order
+
+
+def test_ties_are_split_with_one_write():
+    current = {'a': 1.0, 'b': 1.0, 'c': 2.0}
+    for order, moved in ((['a', 'b', 'c'], 'b'), (['b', 'a', 'c'], 'a')):
+        writes = plan_priorities(current, order)
+        assert writes == {moved: 1.5}
+        assert apply(current, writes, order) == order
+
+
+def test_new_rules_are_slotted_in_without_moving_the_rest():
+    current = {'a': 1.1, 'c': 2.2}
+    for order, priority in ((['new', 'a', 'c'], 0.0), (['a', 'new', 'c'], 1.65), (['a', 'c', 'new'], 3.3)):
+        writes = plan_priorities(current, order)
+        assert writes == {'new': priority}
+        assert apply(current, writes, order) == order
+
+
+def test_removed_rules_are_ignored():
+    current = {'a': 1.1, 'gone': 2.2, 'c': 3.3, 'b': 4.4}
+    order = ['a', 'b', 'c']
+    writes = plan_priorities(current, order)
+    assert len(writes) == 1 and 'gone' not in writes
+    assert apply(current, writes, order) == order
+
+
+def test_exhausted_gaps_renumber_everything():
+    current = {'a': 1.0, 'c': 1.000001}
+    order = ['a', 'b', 'c']
+    writes = plan_priorities(current, order)
+    assert writes == {'a': 1.1, 'b': 2.2, 'c': 3.3}
+    assert apply(current, writes, order) == order
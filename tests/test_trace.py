@@ -0,0 +1,46 @@
+# SPDX-License-Identifier: Unlicense
+
+import os
+import shutil
+
+from internet_switcher.trace import RecordedStatus, TraceWriter, read_trace
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'trace.gz')
+    with TraceWriter(path, clock=lambda: 1.0) as writer:
+        writer.write_status(RecordedStatus(ping_drop_rate=0.5))
+        writer.write_dish_error()
+        writer.write_router('PUT', 'config/wan/rules2/0/priority', 2.1, 2.1)
+    records = list(read_trace(path))
+    assert [record['k'] for record in records] == ['dish', 'dish_error', 'router']
+    assert records[0]['d'] == 0.5
+    assert records[2]['v'] == 2.1
+
+
+def test_unclosed_trace_reads_up_to_the_last_flush(tmp_path):
+    path = str(tmp_path / 'trace.gz')
+    writer = TraceWriter(path, clock=lambda: 1.0, flush_interval=3600)
+    for _ in range(3):
+        writer.write_dish_error()
+    writer.flush()
+    writer.write_dish_error()
+    # What's on disk if the process were killed now
+    copy = str(tmp_path / 'killed.gz')
+    shutil.copy(path, copy)
+    writer.close()
+    assert len(list(read_trace(copy))) == 3
+    assert len(list(read_trace(path))) == 4
+
+
+def test_truncated_trace_stops_at_the_cut(tmp_path):
+    path = str(tmp_path / 'trace.gz')
+    with TraceWriter(path, clock=lambda: 1.0) as writer:
+        for n in range(1000):
+            writer.write_router('GET', f'status/{n}', None, n)
+    size = os.path.getsize(path)
+    with open(path, 'rb+') as f:
+        f.truncate(size // 2)
+    records = list(read_trace(path))
+    assert 0 < len(records) < 1000
+    assert [record['r'] for record in records] == list(range(len(records)))